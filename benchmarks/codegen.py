@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of Daffy.
+#
+# Daffy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Daffy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Daffy.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Original Copyright (c) 2010, Lorenzo Pierfederici <lpierfederici@gmail.com>
+# Contributor(s): 
+#
+"""Compare evaluating a graph with the threaded scheduler and with the
+function generated by :func:`dvm_graph_compile`::
+
+    Usage: python benchmarks/codegen.py [size] [runs]
+
+The graph is a chain of `size` arithmetic operations reading a `value`
+operation `x`, evaluated `runs` times with a different value of `x`. The
+scheduler has to build and execute the whole graph for every run, the
+compiled function is generated once and then called in a loop.
+"""
+
+import sys, time
+from daffy.vm.scheduler import Scheduler, THREADS
+from daffy.vm.scheduler import dvm_scheduler_operation_add, dvm_scheduler_wait
+from daffy.vm.scheduler import dvm_scheduler_close
+from daffy.vm.codegen import dvm_graph_compile
+
+OPTYPES = ('add', 'mul', 'sub', 'div')
+
+def graph_chain(scheduler, size, x):
+    dvm_scheduler_operation_add('value', 'x', (('value', x), ), scheduler)
+    dvm_scheduler_operation_add('add', 'n0',
+                    (('a', 'x', 'value'), ('b', 'x', 'value')), scheduler)
+    for i in xrange(1, size):
+        dvm_scheduler_operation_add(OPTYPES[i % len(OPTYPES)], 'n%i' % i,
+                    (('a', 'n%i' % (i - 1), 'result'), ('b', 'x', 'value')),
+                    scheduler)
+
+def main(size=100, runs=100):
+    t = time.time()
+    for run in xrange(runs):
+        scheduler = Scheduler(executor=THREADS, fold=False)
+        graph_chain(scheduler, size, run + 1.0)
+        dvm_scheduler_wait(scheduler)
+        dvm_scheduler_close(scheduler)
+    threaded = time.time() - t
+
+    t = time.time()
+    scheduler = Scheduler(executor=THREADS, fold=False)
+    graph_chain(scheduler, size, 1.0)
+    dvm_scheduler_wait(scheduler)
+    graph = dvm_graph_compile(scheduler)
+    dvm_scheduler_close(scheduler)
+    compile_time = time.time() - t
+
+    t = time.time()
+    for run in xrange(runs):
+        graph(x=run + 1.0)
+    compiled = time.time() - t
+
+    print('%i operations, %i runs' % (size, runs))
+    print('%-10s %12s %12s' % ('', 'total (s)', 'usec/run'))
+    print('%-10s %12.4f %12.1f' % ('threads', threaded, threaded * 1e6 / runs))
+    print('%-10s %12.4f %12.1f' % ('compile', compile_time, compile_time * 1e6))
+    print('%-10s %12.4f %12.1f' % ('compiled', compiled, compiled * 1e6 / runs))
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
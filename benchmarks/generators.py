@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of Daffy.
+#
+# Daffy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Daffy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Daffy.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Original Copyright (c) 2010, Lorenzo Pierfederici <lpierfederici@gmail.com>
+# Contributor(s): 
+#
+"""Synthetic *daffy* programs for the benchmarks::
+
+    Usage: python benchmarks/generators.py shape size [seed]
+
+Each generator returns the source of a program of about `size` instructions,
+as a list of lines, with a given shape:
+
+chain
+    each operation reads the result of the previous one
+fanout
+    a single `value` operation read by all the others
+diamond
+    a chain of diamonds, two operations reading the same result and a third
+    one joining them
+random
+    operations reading two results picked at random among the previous ones
+prints
+    a chain where every other operation prints the current result
+
+All the literals are floats, and all programs are deterministic for a given
+`seed`. Called as a script, the program is written to standard output.
+"""
+
+import sys, random
+
+#: binary operation types used by the generators
+BINARY = ('add', 'sub', 'mul')
+
+def chain(size, seed=0):
+    """Return a program where each operation reads the previous one"""
+    lines = ['$n0: value(value=1.0)\n']
+    for i in xrange(1, size):
+        lines.append('$n%i: add(a=$n%i.%s, b=1.0)\n' % (
+                                i, i - 1, i == 1 and 'value' or 'result'))
+    return lines
+
+def fanout(size, seed=0):
+    """Return a program where a single value is read by all operations"""
+    lines = ['$n0: value(value=1.0)\n']
+    for i in xrange(1, size):
+        lines.append('$n%i: mul(a=$n0.value, b=%i.0)\n' % (i, i))
+    return lines
+
+def diamond(size, seed=0):
+    """Return a chain of diamonds, three operations for each diamond"""
+    lines = ['$n0: value(value=1.0)\n']
+    top = 'n0.value'
+    for i in xrange(1, size - 2, 3):
+        lines.append('$n%i: add(a=$%s, b=1.0)\n' % (i, top))
+        lines.append('$n%i: mul(a=$%s, b=0.5)\n' % (i + 1, top))
+        lines.append('$n%i: sub(a=$n%i.result, b=$n%i.result)\n' % (
+                                                        i + 2, i, i + 1))
+        top = 'n%i.result' % (i + 2)
+    return lines
+
+def random_dag(size, seed=0):
+    """Return a program whose operations read two random previous results"""
+    rand = random.Random(seed)
+    roots = max(1, size / 100)
+    lines = []
+    outputs = []
+    for i in xrange(roots):
+        lines.append('$n%i: value(value=%i.0)\n' % (i, i + 1))
+        outputs.append('n%i.value' % i)
+    for i in xrange(roots, size):
+        lines.append('$n%i: %s(a=$%s, b=$%s)\n' % (i, rand.choice(BINARY),
+                                                   rand.choice(outputs),
+                                                   rand.choice(outputs)))
+        outputs.append('n%i.result' % i)
+    return lines
+
+def prints(size, seed=0):
+    """Return a chain where every other operation prints a result"""
+    lines = ['$n0: value(value=1.0)\n']
+    last = 'n0.value'
+    for i in xrange(1, size):
+        if i % 2:
+            lines.append('$n%i: add(a=$%s, b=1.0)\n' % (i, last))
+            last = 'n%i.result' % i
+        else:
+            lines.append('$n%i: print(value=$%s)\n' % (i, last))
+    return lines
+
+#: generators by shape name
+SHAPES = {
+    'chain': chain,
+    'fanout': fanout,
+    'diamond': diamond,
+    'random': random_dag,
+    'prints': prints,
+}
+
+def main(shape, size, seed=0):
+    sys.stdout.writelines(SHAPES[shape](int(size), int(seed)))
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
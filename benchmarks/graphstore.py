@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of Daffy.
+#
+# Daffy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Daffy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Daffy.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Original Copyright (c) 2010, Lorenzo Pierfederici <lpierfederici@gmail.com>
+# Contributor(s): 
+#
+"""Measure memory and throughput of array-backed graphs, compared with
+:class:`Operation` objects in the :class:`Scheduler`::
+
+    Usage: python benchmarks/graphstore.py [sizes] [width] [objects_max]
+
+`sizes` is a comma separated list of numbers of operations (default:
+1000000,10000000,50000000). The graph is made of layers of `width`
+operations (default: 1000), alternately `add` and `mul`, each reading two
+operations of the previous layer; the first layer reads literals.
+
+For each size the graph is built in a :class:`GraphStore` with
+:func:`dvm_graphstore_add_many` and run with :func:`dvm_graphstore_run`,
+reporting the bytes per operation (of the arrays, and of the resident memory
+of the process) and the operations executed per second. Up to `objects_max`
+operations (default: 1000000) the same graph is also built and run with the
+``serial`` scheduler.
+"""
+
+import sys, time, gc
+import numpy
+from daffy.vm.graphstore import GraphStore
+from daffy.vm.graphstore import dvm_graphstore_literals, dvm_graphstore_add_many
+from daffy.vm.graphstore import dvm_graphstore_outputs, dvm_graphstore_run
+from daffy.vm.scheduler import Scheduler, SERIAL
+from daffy.vm.scheduler import dvm_scheduler_operation_add, dvm_scheduler_wait
+
+OPTYPES = ('add', 'mul')
+
+def rss():
+    """Return the resident memory of the process, in bytes"""
+    f = open('/proc/self/statm')
+    pages = int(f.read().split()[1])
+    f.close()
+    return pages * 4096
+
+def graph_store(size, width):
+    store = GraphStore(capacity=size)
+    prev = dvm_graphstore_literals(store, numpy.linspace(0.5, 1.5, width))
+    layer = 0
+    while store.size < size:
+        n = min(width, size - store.size)
+        shifted = numpy.roll(prev, 1)
+        nodes = dvm_graphstore_add_many(store, OPTYPES[layer % 2],
+                                        [prev[:n], shifted[:n]], n)
+        prev = dvm_graphstore_outputs(store, nodes)
+        layer += 1
+    return store
+
+def graph_objects(scheduler, size, width):
+    for i in xrange(width):
+        dvm_scheduler_operation_add('value', 'v%i' % i,
+                                    (('value', 0.5 + float(i) / width), ),
+                                    scheduler)
+    prev = ['v%i.value' % i for i in xrange(width)]
+    count = 0
+    layer = 0
+    while count < size:
+        n = min(width, size - count)
+        names = []
+        for i in xrange(n):
+            name = 'n%i' % (count + i)
+            a = prev[i].split('.')
+            b = prev[i - 1].split('.')
+            dvm_scheduler_operation_add(OPTYPES[layer % 2], name,
+                        (('a', a[0], a[1]), ('b', b[0], b[1])), scheduler)
+            names.append(name + '.result')
+        prev = names
+        count += n
+        layer += 1
+
+def main(sizes='1000000,10000000,50000000', width=1000, objects_max=1000000):
+    width = int(width)
+    objects_max = int(objects_max)
+    print('%-8s %10s %10s %10s %10s %12s' % ('graph', 'ops', 'build (s)',
+                                'run (s)', 'bytes/op', 'ops/s'))
+    for size in [int(s) for s in sizes.split(',')]:
+        gc.collect()
+        base = rss()
+        t = time.time()
+        store = graph_store(size, width)
+        build = time.time() - t
+        t = time.time()
+        dvm_graphstore_run(store)
+        run = time.time() - t
+        used = rss() - base
+        print('%-8s %10i %10.2f %10.2f %10.1f %12.0f' % ('arrays', size,
+                            build, run, float(used) / size, size / run))
+        print('%-8s %10s %10s %10s %10.1f' % ('', '', '', '(arrays)',
+                                        float(store.nbytes()) / size))
+        del store
+
+        if size > objects_max:
+            continue
+        gc.collect()
+        base = rss()
+        t = time.time()
+        scheduler = Scheduler(executor=SERIAL, fold=False, cse=False)
+        graph_objects(scheduler, size, width)
+        dvm_scheduler_wait(scheduler)
+        elapsed = time.time() - t
+        used = rss() - base
+        print('%-8s %10i %21.2f %10.1f %12.0f' % ('objects', size, elapsed,
+                                            float(used) / size, size / elapsed))
+        del scheduler
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
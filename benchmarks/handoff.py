@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of Daffy.
+#
+# Daffy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Daffy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Daffy.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Original Copyright (c) 2010, Lorenzo Pierfederici <lpierfederici@gmail.com>
+# Contributor(s): 
+#
+"""Measure the scheduling overhead per operation with batched hand-offs::
+
+    Usage: python benchmarks/handoff.py [size] [handoff,...]
+
+Programs of `size` cheap arithmetic operations (see :mod:`generators`) are
+run with the ``threads`` executor and each :attr:`Scheduler.handoff
+<daffy.vm.scheduler.Scheduler.handoff>` value, with both completion modes.
+For each configuration the best of three runs is kept, and the overhead per
+operation is the time per operation minus the time per operation of the
+``serial`` executor, that executes the same operations without any queue
+hand-off.
+"""
+
+import os, sys, time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generators import SHAPES
+from daffy.vm.scheduler import Scheduler, SERIAL, THREADS, COMPLETIONS
+from daffy.vm.scheduler import dvm_scheduler_close
+from daffy.vm.interpreter import dvm_program_compile, dvm_instructions_run
+
+def per_op(instructions, repeat=3, **kwargs):
+    """Return the best time per operation of `repeat` runs, in
+    microseconds
+    """
+    best = None
+    for i in xrange(repeat):
+        scheduler = Scheduler(fold=False, **kwargs)
+        start = time.time()
+        dvm_instructions_run(instructions, scheduler)
+        elapsed = time.time() - start
+        dvm_scheduler_close(scheduler)
+        if best is None or elapsed < best:
+            best = elapsed
+    return best * 1e6 / len(instructions)
+
+def main(size=20000, handoffs='1,4,16,64'):
+    handoffs = [int(h) for h in handoffs.split(',')]
+    print('%8s %10s %8s %12s %14s' % ('shape', 'completion', 'handoff',
+                                      'usec/op', 'overhead usec'))
+    for shape in ('fanout', 'random', 'chain'):
+        instructions = dvm_program_compile(SHAPES[shape](int(size)))
+        serial = per_op(instructions, executor=SERIAL)
+        print('%8s %10s %8s %12.2f %14s' % (shape, '-', SERIAL, serial, '-'))
+        for completion in COMPLETIONS:
+            for handoff in handoffs:
+                t = per_op(instructions, executor=THREADS,
+                           completion=completion, handoff=handoff)
+                print('%8s %10s %8i %12.2f %14.2f' % (shape, completion,
+                                                    handoff, t, t - serial))
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of Daffy.
+#
+# Daffy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Daffy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Daffy.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Original Copyright (c) 2010, Lorenzo Pierfederici <lpierfederici@gmail.com>
+# Contributor(s): 
+#
+"""Measure :func:`dvm_scheduler_operation_add` as the opstable grows::
+
+    Usage: python benchmarks/opstable.py [total] [step]
+
+Operations are added in blocks of `step`; for each block the mean time per
+added operation is printed. With an indexed opstable the figures stay flat
+no matter how many operations are already in the table.
+
+The scheduler uses the ``threads`` executor and doesn't fold operations, so
+that adding an operation only queues it, as the workers execute it.
+"""
+
+import sys, time, random
+from daffy.vm.scheduler import Scheduler, THREADS
+from daffy.vm.scheduler import dvm_scheduler_operation_add, dvm_scheduler_wait
+from daffy.vm.scheduler import dvm_scheduler_close
+
+def block_add(scheduler, start, count):
+    """Add `count` operations, alternating `value` operations and `add`
+    operations reading two of the values already in the table
+    """
+    for i in xrange(start, start + count):
+        if i % 2 == 0:
+            dvm_scheduler_operation_add('value', 'n%i' % i,
+                                        (('value', float(i)), ), scheduler)
+        else:
+            args = (('a', 'n%i' % (i - 1), 'value'),
+                    ('b', 'n%i' % (random.randrange(0, i, 2)), 'value'))
+            dvm_scheduler_operation_add('add', 'n%i' % i, args, scheduler)
+
+def main(total=200000, step=20000):
+    scheduler = Scheduler(executor=THREADS, fold=False)
+    print('%10s %14s' % ('ops', 'usec/op'))
+    for start in xrange(0, total, step):
+        t = time.time()
+        block_add(scheduler, start, step)
+        elapsed = time.time() - t
+        print('%10i %14.2f' % (start + step, elapsed * 1e6 / step))
+    dvm_scheduler_wait(scheduler)
+    dvm_scheduler_close(scheduler)
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
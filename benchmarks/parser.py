@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of Daffy.
+#
+# Daffy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Daffy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Daffy.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Original Copyright (c) 2010, Lorenzo Pierfederici <lpierfederici@gmail.com>
+# Contributor(s): 
+#
+"""Measure the parser throughput in instructions per second::
+
+    Usage: python benchmarks/parser.py [instructions]
+
+The same generated program is parsed with :func:`instruction_parse` and with
+the character by character state machine :func:`instruction_parse_fsm`.
+"""
+
+import sys, time
+from daffy.vm.interpreter import instruction_parse, instruction_parse_fsm
+
+def program(size):
+    """Return a list of `size` instructions of mixed shapes"""
+    lines = ['$v0: value(value=1.0)\n']
+    for i in xrange(1, size):
+        if i % 3 == 0:
+            line = '$v%i: value(value=%i.25) a literal\n' % (i, i)
+        elif i % 3 == 1:
+            line = '$v%i: add(a=$v%i.value, b=$v%i.value)\n' % (i, i - 1, i - 1)
+        else:
+            line = '$v%i: mul(a=$v%i.result,  b=42)\n' % (i, i - 1)
+        lines.append(line)
+    return lines
+
+def throughput(parse, lines):
+    start = time.time()
+    for line in lines:
+        parse(line)
+    return len(lines) / (time.time() - start)
+
+def main(size=100000):
+    lines = program(size)
+    print('%24s %16s' % ('parser', 'instructions/s'))
+    for parse in (instruction_parse_fsm, instruction_parse):
+        print('%24s %16i' % (parse.__name__, throughput(parse, lines)))
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
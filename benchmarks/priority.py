@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of Daffy.
+#
+# Daffy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Daffy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Daffy.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Original Copyright (c) 2010, Lorenzo Pierfederici <lpierfederici@gmail.com>
+# Contributor(s): 
+#
+"""Compare the makespan of the priority policies on a graph with a long
+critical path::
+
+    Usage: python benchmarks/priority.py [chain] [side] [cost] [executor]
+
+The graph is a chain of `chain` operations, each reading the result of the
+previous one, interleaved with `side` operations reading only a constant.
+Every operation sleeps for `cost` milliseconds, so that operations run in
+parallel on the :class:`Worker` threads whatever the number of cores.
+
+With the ``fifo`` policy each step of the chain is queued behind the side
+operations added before it, and the chain finishes last; with ``depth`` or
+``cost`` the chain goes first and the side operations fill the other
+workers, so the makespan approaches the length of the chain alone (or the
+total work divided by the number of workers, whichever is larger).
+"""
+
+import sys, time
+from daffy.vm.operations import OperationType, InputSocketType, OutputSocketType
+from daffy.vm.operations import dvm_input_value_get, dvm_output_socket
+from daffy.vm.optypes import dvm_operation_type_register
+from daffy.vm.scheduler import Scheduler, PRIORITIES, WORKERS
+from daffy.vm.scheduler import dvm_scheduler_close
+from daffy.vm.interpreter import dvm_program_compile, dvm_instructions_run
+
+def execfunc(self):
+    time.sleep(dvm_input_value_get(self, 'cost') / 1000.0)
+    dvm_output_socket(self, 'result').value = dvm_input_value_get(self, 'a') + 1
+
+# an operation type doing no work but taking time, like an operation releasing
+# the interpreter lock (I/O, large NumPy arrays)
+dvm_operation_type_register(OperationType(
+    name='work',
+    inputs=[InputSocketType('a', 0.0), InputSocketType('cost', 0.0)],
+    outputs=[OutputSocketType('result')],
+    execfunc=execfunc
+))
+
+def program(chain, side, cost):
+    """Return a chain of operations interleaved with side operations"""
+    lines = ['$c0: work(a=0.0, cost=%f)\n' % cost]
+    per_step = float(side) / max(chain - 1, 1)
+    added = 0
+    for i in xrange(1, chain):
+        lines.append('$c%i: work(a=$c%i.result, cost=%f)\n' % (i, i - 1, cost))
+        while added < per_step * i:
+            lines.append('$s%i: work(a=%i.0, cost=%f)\n' % (added, added,
+                                                           cost))
+            added += 1
+    return lines
+
+def main(chain=50, side=150, cost=4.0, executor='threads'):
+    chain, side, cost = int(chain), int(side), float(cost)
+    instructions = dvm_program_compile(program(chain, side, cost))
+    bound = max(chain * cost, (chain + side) * cost / WORKERS)
+    print('%i operations, %i workers, lower bound %.0f ms' % (
+                                len(instructions), WORKERS, bound))
+    print('%8s %14s' % ('policy', 'makespan ms'))
+    for priority in PRIORITIES:
+        scheduler = Scheduler(executor=executor, priority=priority,
+                              costs={'work': cost / 1000.0})
+        start = time.time()
+        dvm_instructions_run(instructions, scheduler)
+        print('%8s %14.0f' % (priority, (time.time() - start) * 1000))
+        dvm_scheduler_close(scheduler)
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of Daffy.
+#
+# Daffy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Daffy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Daffy.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Original Copyright (c) 2010, Lorenzo Pierfederici <lpierfederici@gmail.com>
+# Contributor(s): 
+#
+"""Measure the memory used by each :class:`Operation` object and the time
+taken to create operations and to read their inputs::
+
+    Usage: python benchmarks/sockets.py [ops] [reads]
+
+`ops` `add` operations reading the output of a `value` operation are
+created, the size of one of them is computed adding up the sizes of the
+operation, of its sockets and of the containers and attribute dicts they
+own. Then the inputs are read `reads` times with
+:func:`dvm_input_value_get`, the way `execfunc` does, and all at once with
+:func:`dvm_input_values_get`.
+"""
+
+import sys, time
+from daffy.vm.optypes import dvm_operation_type_find
+from daffy.vm.operations import Operation
+from daffy.vm.operations import dvm_input_value_get, dvm_input_values_get
+from daffy.vm.ops import dvm_value_create
+
+def sizeof(obj):
+    """Return the size of an object, including its attribute dict"""
+    size = sys.getsizeof(obj)
+    if hasattr(obj, '__dict__'):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+def operation_size(op):
+    """Return the bytes used by an operation and by the sockets it owns"""
+    size = sizeof(op) + sizeof(op.inputs) + sizeof(op.outputs)
+    size += sizeof(op.blocking)
+    for sock in op.inputs + op.outputs:
+        size += sizeof(sock)
+    return size
+
+def main(ops=100000, reads=1000000):
+    optype = dvm_operation_type_find('add')
+    value = dvm_value_create('v', 1.0)
+
+    t = time.time()
+    table = [Operation(optype, 'n%i' % i,
+                       [('a', value, 'value'), ('b', value, 'value')])
+             for i in xrange(ops)]
+    create = time.time() - t
+
+    op = table[-1]
+    t = time.time()
+    for i in xrange(reads):
+        dvm_input_value_get(op, 'b')
+    read = time.time() - t
+
+    t = time.time()
+    for i in xrange(reads):
+        dvm_input_values_get(op)
+    read_all = time.time() - t
+
+    print('%-28s %10i' % ('bytes per operation', operation_size(op)))
+    print('%-28s %10.0f' % ('ns per operation created', create * 1e9 / ops))
+    print('%-28s %10.0f' % ('ns per input read', read * 1e9 / reads))
+    print('%-28s %10.0f' % ('ns per inputs list', read_all * 1e9 / reads))
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of Daffy.
+#
+# Daffy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Daffy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Daffy.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Original Copyright (c) 2010, Lorenzo Pierfederici <lpierfederici@gmail.com>
+# Contributor(s): 
+#
+"""Compare the ``threads`` and ``stealing`` executors as the number of
+workers grows::
+
+    Usage: python benchmarks/stealing.py [size] [workers,...]
+
+Two graphs are run with each executor:
+
+cheap
+    a random graph of `size` arithmetic operations (see :mod:`generators`),
+    where the time goes into the scheduling overhead; the figure is the
+    number of operations per second
+tree
+    a binary tree of 1023 operations sleeping for a millisecond each, every
+    operation releasing two more when it finishes, so that operations run in
+    parallel whatever the number of cores; the figure is the makespan
+"""
+
+import os, sys, time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generators import random_dag
+from daffy.vm.operations import OperationType, InputSocketType, OutputSocketType
+from daffy.vm.operations import dvm_input_value_get, dvm_output_socket
+from daffy.vm.optypes import dvm_operation_type_register
+from daffy.vm.scheduler import Scheduler, THREADS, STEALING
+from daffy.vm.scheduler import dvm_scheduler_close
+from daffy.vm.interpreter import dvm_program_compile, dvm_instructions_run
+
+def execfunc(self):
+    time.sleep(0.001)
+    dvm_output_socket(self, 'result').value = dvm_input_value_get(self, 'a')
+
+# an operation type doing no work but taking time, like an operation releasing
+# the interpreter lock (I/O, large NumPy arrays)
+dvm_operation_type_register(OperationType(
+    name='sleep',
+    inputs=[InputSocketType('a', 0.0)],
+    outputs=[OutputSocketType('result')],
+    execfunc=execfunc
+))
+
+def tree(size=1023):
+    """Return a binary tree of `sleep` operations"""
+    lines = ['$n1: sleep(a=1.0)\n']
+    for i in xrange(2, size + 1):
+        lines.append('$n%i: sleep(a=$n%i.result)\n' % (i, i / 2))
+    return lines
+
+def elapsed(instructions, executor, workers):
+    scheduler = Scheduler(executor=executor, workers=workers, fold=False)
+    start = time.time()
+    dvm_instructions_run(instructions, scheduler)
+    elapsed = time.time() - start
+    dvm_scheduler_close(scheduler)
+    return elapsed
+
+def main(size=20000, workers='1,2,4,8,16,32,64'):
+    cheap = dvm_program_compile(random_dag(int(size)))
+    sleeps = dvm_program_compile(tree())
+    print('%8s %14s %14s %12s %12s' % ('workers', 'threads ops/s',
+                    'stealing ops/s', 'threads ms', 'stealing ms'))
+    for n in [int(w) for w in workers.split(',')]:
+        row = [n]
+        for instructions in (cheap, sleeps):
+            for executor in (THREADS, STEALING):
+                t = elapsed(instructions, executor, n)
+                row.append(instructions is cheap and len(cheap) / t or t * 1000)
+        print('%8i %14i %14i %12.0f %12.0f' % tuple(row))
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
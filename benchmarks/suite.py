@@ -0,0 +1,295 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of Daffy.
+#
+# Daffy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Daffy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Daffy.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Original Copyright (c) 2010, Lorenzo Pierfederici <lpierfederici@gmail.com>
+# Contributor(s): 
+#
+"""Run the generated programs of :mod:`generators` on each executor and
+record the results::
+
+    Usage: python benchmarks/suite.py [options]
+
+    Options:
+      -s SHAPES, --shapes=SHAPES
+                            comma separated program shapes [default:
+                            chain,fanout,diamond,random,prints]
+      -n SIZES, --sizes=SIZES
+                            comma separated program sizes [default: 1000,10000]
+      -e EXECUTORS, --executors=EXECUTORS
+                            comma separated executors [default:
+                            serial,threads,processes,stealing,auto]
+      -j WORKERS, --workers=WORKERS
+                            number of worker threads or processes [default: 4]
+      --fold                evaluate operations with constant inputs ahead of
+                            time
+      --cse                 merge equivalent operations
+      --completion=MODE     which thread updates the dependencies of executed
+                            operations: updater or worker [default: updater]
+      -o FILE, --output=FILE
+                            write the results to FILE, as JSON
+      --compare=FILE        compare the run times with the results in FILE
+      --threshold=PERCENT   slowdown reported as a regression [default: 10]
+
+Each case (a shape, a size and an executor) runs in its own process, so that
+the peak memory of one doesn't hide the others, and reports separately:
+
+parse
+    seconds spent by :func:`dvm_program_compile` on the source
+build
+    seconds spent adding the parsed instructions to a scheduler that has no
+    workers and no updater thread, so that nothing is executed (unless `fold`
+    is set, as folded operations are evaluated while they are added)
+run
+    seconds from the first instruction added to a scheduler with the
+    selected executor until :func:`dvm_scheduler_wait` returns, building the
+    graph and executing it
+execute
+    the run time minus the build time, spent executing the operations;
+    `ops/s` is the number of operations divided by this time. The ``serial``
+    and ``auto`` executors run cheap operations while they are added, so
+    for them this is within the noise of the build time, and can be 0
+peak memory
+    the resident set size high-water mark of the process after the run,
+    minus the one before parsing; the worker processes of the ``processes``
+    executor are not included
+
+Folding is disabled by default: all the literals of the generated programs
+are constants, and the whole program would be evaluated while it is built.
+So is merging equivalent operations, that changes the number of operations
+executed.
+Prints are sent to ``/dev/null``.
+
+The results file holds the list of cases along with the interpreter and the
+git revision, so that results saved by different releases can be compared
+with ``--compare``: cases that got slower than ``--threshold`` percent are
+flagged, and the script exits with status 1. Only the results of the same
+case, run with the same options, are compared.
+"""
+
+import os, sys, json, time, platform, resource, subprocess
+from optparse import OptionParser
+from cStringIO import StringIO
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generators import SHAPES
+from daffy.vm.scheduler import Scheduler, THREADS, WORKERS
+from daffy.vm.scheduler import COMPLETIONS, UPDATER, WORKER
+from daffy.vm.scheduler import dvm_scheduler_operation_add, dvm_scheduler_close
+from daffy.vm.interpreter import dvm_program_compile, dvm_instructions_run
+
+#: version of the results file format
+FORMAT = 2
+
+#: metrics compared with ``--compare``
+COMPARED = ('parse_s', 'build_s', 'run_s', 'execute_s')
+
+#: fields identifying a case: results are only compared with the results
+#: of the same case
+CASE = ('shape', 'size', 'executor', 'workers', 'fold', 'cse', 'completion')
+
+def peak_rss():
+    """Return the peak resident set size of this process, in kB"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def case_run(shape, size, executor, workers, fold, cse, completion):
+    """Measure a single case in this process and return its results"""
+    lines = SHAPES[shape](size)
+    base = peak_rss()
+
+    start = time.time()
+    instructions = dvm_program_compile(StringIO(''.join(lines)))
+    parse = time.time() - start
+
+    scheduler = Scheduler(executor=executor, workers=workers, fold=fold,
+                          cse=cse, completion=completion)
+    start = time.time()
+    dvm_instructions_run(instructions, scheduler)
+    run = time.time() - start
+    peak = peak_rss()
+
+    dvm_scheduler_close(scheduler)
+    del scheduler
+    scheduler = Scheduler(executor=THREADS, workers=0, fold=fold, cse=cse,
+                          completion=WORKER)
+    start = time.time()
+    for optype, name, args in instructions:
+        dvm_scheduler_operation_add(optype, name, args, scheduler)
+    build = time.time() - start
+    dvm_scheduler_close(scheduler)
+    execute = max(run - build, 0.0)
+
+    return {
+        'shape': shape,
+        'size': size,
+        'executor': executor,
+        'workers': workers,
+        'fold': fold,
+        'cse': cse,
+        'completion': completion,
+        'ops': len(instructions),
+        'parse_s': parse,
+        'build_s': build,
+        'run_s': run,
+        'execute_s': execute,
+        'ops_per_s': execute and len(instructions) / execute or None,
+        'peak_kb': peak - base,
+    }
+
+def case_spawn(shape, size, executor, options):
+    """Measure a single case in a new process and return its results"""
+    cmd = [sys.executable, os.path.abspath(__file__), '--case',
+           '%s,%i,%s' % (shape, size, executor), '-j', str(options.workers)]
+    if options.fold:
+        cmd.append('--fold')
+    if options.cse:
+        cmd.append('--cse')
+    cmd.append('--completion=%s' % options.completion)
+    return json.loads(subprocess.check_output(cmd))
+
+def revision():
+    """Return the git revision of the working tree, or ``None``"""
+    try:
+        with open(os.devnull, 'w') as null:
+            return subprocess.check_output(
+                            ['git', 'describe', '--always', '--dirty'],
+                            cwd=os.path.dirname(os.path.abspath(__file__)),
+                            stderr=null).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def case_key(result):
+    """Return the values of the :data:`CASE` fields of a result"""
+    return tuple(result.get(field) for field in CASE)
+
+def results_compare(results, filename, threshold):
+    """Print the change of each metric against the results in `filename`, and
+    return the number of regressions
+    """
+    with open(filename) as f:
+        old = json.load(f)
+    cases = dict((case_key(r), r) for r in old['results'])
+    print('\ncompared with %s (%s)' % (filename, old.get('revision')))
+    print('%8s %7s %10s %10s %10s %10s %10s' % (
+                                ('shape', 'size', 'executor') + COMPARED))
+    regressions = 0
+    for r in results:
+        o = cases.get(case_key(r))
+        if o is None:
+            continue
+        changes = []
+        flagged = False
+        for metric in COMPARED:
+            if not o.get(metric):
+                # not in the results of older formats
+                changes.append('%10s' % '-')
+                continue
+            change = (r[metric] / o[metric] - 1) * 100
+            changes.append('%+9.1f%%' % change)
+            flagged = flagged or change > threshold
+        print('%8s %7i %10s %s%s' % (r['shape'], r['size'], r['executor'],
+                                     ' '.join(changes),
+                                     flagged and '  REGRESSION' or ''))
+        regressions += flagged
+    return regressions
+
+def main():
+    parser = OptionParser(usage="usage: %prog [options]")
+    parser.add_option("-s", "--shapes",
+                      default='chain,fanout,diamond,random,prints',
+                      help="comma separated program shapes "
+                           "[default: %default]")
+    parser.add_option("-n", "--sizes",
+                      default='1000,10000',
+                      help="comma separated program sizes [default: %default]")
+    parser.add_option("-e", "--executors",
+                      default='serial,threads,processes,stealing,auto',
+                      help="comma separated executors [default: %default]")
+    parser.add_option("-j", "--workers",
+                      type="int", default=WORKERS,
+                      help="number of worker threads or processes "
+                           "[default: %default]")
+    parser.add_option("--fold",
+                      action="store_true", default=False,
+                      help="evaluate operations with constant inputs ahead "
+                           "of time")
+    parser.add_option("--cse",
+                      action="store_true", default=False,
+                      help="merge equivalent operations")
+    parser.add_option("--completion",
+                      type="choice", choices=COMPLETIONS, default=UPDATER,
+                      metavar="MODE",
+                      help="which thread updates the dependencies of "
+                           "executed operations: %s [default: %%default]"
+                                                % ' or '.join(COMPLETIONS))
+    parser.add_option("-o", "--output",
+                      metavar="FILE",
+                      help="write the results to FILE, as JSON")
+    parser.add_option("--compare",
+                      metavar="FILE",
+                      help="compare the run times with the results in FILE")
+    parser.add_option("--threshold",
+                      type="float", metavar="PERCENT", default=10,
+                      help="slowdown reported as a regression "
+                           "[default: %default]")
+    parser.add_option("--case",
+                      help="run a single case, given as shape,size,executor, "
+                           "and print its results")
+    (options, args) = parser.parse_args()
+
+    if options.case:
+        shape, size, executor = options.case.split(',')
+        # prints must not mix with the results
+        out = sys.stdout
+        sys.stdout = open(os.devnull, 'w')
+        result = case_run(shape, int(size), executor, options.workers,
+                          options.fold, options.cse, options.completion)
+        out.write(json.dumps(result))
+        return 0
+
+    results = []
+    print('%8s %7s %10s %9s %9s %9s %9s %10s %10s' % ('shape', 'size',
+                'executor', 'parse s', 'build s', 'run s', 'execute s',
+                'ops/s', 'peak kB'))
+    for shape in options.shapes.split(','):
+        for size in [int(s) for s in options.sizes.split(',')]:
+            for executor in options.executors.split(','):
+                r = case_spawn(shape, size, executor, options)
+                print('%8s %7i %10s %9.3f %9.3f %9.3f %9.3f %10s %10i' % (
+                        shape, size, executor, r['parse_s'], r['build_s'],
+                        r['run_s'], r['execute_s'],
+                        r['ops_per_s'] and '%i' % r['ops_per_s'] or '-',
+                        r['peak_kb']))
+                results.append(r)
+
+    if options.output:
+        with open(options.output, 'w') as f:
+            json.dump({'format': FORMAT,
+                       'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                       'revision': revision(),
+                       'python': platform.python_version(),
+                       'platform': platform.platform(),
+                       'results': results}, f, indent=1, sort_keys=True)
+
+    if options.compare:
+        if results_compare(results, options.compare, options.threshold):
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of Daffy.
+#
+# Daffy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Daffy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Daffy.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Original Copyright (c) 2010, Lorenzo Pierfederici <lpierfederici@gmail.com>
+# Contributor(s): 
+#
+"""Measure the time the :class:`Updater` thread spends on each finished
+operation::
+
+    Usage: python benchmarks/updater.py [max_size]
+
+Two graph shapes are built with growing sizes:
+
+wide
+    a single `add` operation with all the others reading its result
+deep
+    a chain where each `add` operation reads the result of the previous one
+
+For each graph the time spent in :func:`op_set_as_finished` by the
+:class:`Updater` thread is divided by the number of executed operations;
+the figure should not depend on the size of the graph.
+
+The scheduler always uses the ``threads`` executor, as the others have no
+:class:`Updater` thread, and neither folds nor merges operations, as all of
+them would be evaluated while they are added (or be merged into one).
+"""
+
+import sys, time
+from threading import currentThread
+import daffy.vm.scheduler
+from daffy.vm.scheduler import Scheduler, THREADS
+from daffy.vm.scheduler import dvm_scheduler_operation_add, dvm_scheduler_wait
+from daffy.vm.scheduler import dvm_scheduler_close
+
+# time spent by the Updater thread, patched in op_set_as_finished
+updater_time = [0.0]
+op_set_as_finished = daffy.vm.scheduler.op_set_as_finished
+
+def timed_op_set_as_finished(op, scheduler):
+    t = time.time()
+    op_set_as_finished(op, scheduler)
+    if currentThread() is scheduler._updater:
+        updater_time[0] += time.time() - t
+
+daffy.vm.scheduler.op_set_as_finished = timed_op_set_as_finished
+
+def graph_wide(scheduler, size):
+    dvm_scheduler_operation_add('value', 'v', (('value', 1.0), ), scheduler)
+    dvm_scheduler_operation_add('add', 'root',
+                    (('a', 'v', 'value'), ('b', 'v', 'value')), scheduler)
+    for i in xrange(size - 1):
+        dvm_scheduler_operation_add('add', 'n%i' % i,
+                    (('a', 'root', 'result'), ('b', 'v', 'value')), scheduler)
+
+def graph_deep(scheduler, size):
+    dvm_scheduler_operation_add('value', 'v', (('value', 1.0), ), scheduler)
+    dvm_scheduler_operation_add('add', 'n0',
+                    (('a', 'v', 'value'), ('b', 'v', 'value')), scheduler)
+    for i in xrange(1, size):
+        dvm_scheduler_operation_add('add', 'n%i' % i,
+                    (('a', 'n%i' % (i - 1), 'result'), ('b', 'v', 'value')),
+                    scheduler)
+
+def main(max_size=32000):
+    print('%6s %10s %12s %16s' % ('graph', 'ops', 'total (s)',
+                                                    'updater usec/op'))
+    for shape, build in (('wide', graph_wide), ('deep', graph_deep)):
+        size = 1000
+        while size <= max_size:
+            scheduler = Scheduler(executor=THREADS, fold=False, cse=False)
+            updater_time[0] = 0.0
+            t = time.time()
+            build(scheduler, size)
+            dvm_scheduler_wait(scheduler)
+            elapsed = time.time() - t
+            dvm_scheduler_close(scheduler)
+            print('%6s %10i %12.3f %16.2f' % (shape, size, elapsed,
+                                            updater_time[0] * 1e6 / size))
+            size *= 2
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
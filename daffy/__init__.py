@@ -0,0 +1,2 @@
+#: version of the daffy package, also part of the digest of cached results
+__version__ = '0.1'
@@ -24,15 +24,121 @@
     Usage: daffy [options] [ -c cmd | file ]
 
     Options:
-      -h, --help         show this help message and exit
-      -v, --verbose      print debug messages to stderr
-      -c CMD, --cmd=CMD  a single instruction
+      -h, --help            show this help message and exit
+      -v, --verbose         print debug messages to stderr
+      -c CMD, --cmd=CMD     a single instruction
+      -e EXECUTOR, --executor=EXECUTOR
+                            how operations are executed: auto or serial or threads
+                            or processes or stealing [default: auto]
+      -j WORKERS, --workers=WORKERS
+                            number of worker threads or processes [default: 4]
+      --compile             compile the file to a .dfyc file next to it, without
+                            running it
+      -b PARAMS, --batch=PARAMS
+                            run the file once for each row of a table of
+                            parameters (CSV or NPY), bound to value operations
+      -o OUTPUT, --output=OUTPUT
+                            write the results of a batch run to a file (CSV or
+                            NPY) instead of standard output
+      --fold                evaluate operations with constant inputs ahead of
+                            time
+      --cse                 merge equivalent operations
+      --fuse                evaluate chains of arithmetic operations as single
+                            operations
+      --cache-dir=DIR       load the results of operations from a cache in
+                            DIR, and store new ones there
+      --cache-size=MB       size limit of the results cache (default: 256)
+      --reclaim=POLICY      remove finished operations from the table: keep,
+                            anonymous or the number of recently used names
+                            that stay addressable (default: keep)
+      --arrays              run the file on an array-backed graph, for very
+                            large programs working on floats
+      --trace=FILE          write a trace of the execution of operations to
+                            FILE, in the Chrome trace event format
+      --profile             print execution statistics by operation type to
+                            stderr
+      --profile-json=FILE   write execution statistics to FILE, as JSON
+      --priority=POLICY     order of execution of runnable operations: fifo or
+                            depth or cost [default: fifo]
+      --costs=FILE          estimated costs of the operation types for the cost
+                            priority policy, from a --profile-json report
+      --completion=MODE     which thread updates the dependencies of executed
+                            operations: updater or worker [default: updater]
+      --handoff=N           move up to N operations at a time between threads
+                            [default: 1]
+
+When running a file, the parsed program is cached in a ``.dfyc`` file next to
+it and reused by the following runs, as long as the source doesn't change.
+Compiled ``.dfyc`` files can also be run directly.
+
+When `file` is ``-`` instructions are read from standard input and run as
+they arrive; use ``--reclaim`` to keep memory bounded on endless streams.
+
+An instruction that can't be added, for instance because it reads a name
+that was never defined or, with ``--reclaim=N``, that is no longer among the
+last `N` names used, stops the program with an error.
+
+Options that don't apply to how the program is run are rejected: for
+instance ``--batch`` and ``--arrays`` only run files, and ``--arrays`` doesn't
+use a scheduler, so it can't be combined with the scheduler options such as
+``--executor``, ``--trace`` or ``--profile``.
+
+With ``--trace`` the trace is written once the program has finished, and can
+be opened in ``chrome://tracing`` or Perfetto (see :mod:`daffy.vm.trace`).
+``--profile`` prints, for each operation type, how many operations were
+executed, their total, mean, median and 99th percentile execution times and
+how long they waited in the queue, followed by the time each thread spent
+executing operations and the time spent updating dependencies (see
+:mod:`daffy.vm.stats`).
+
+``--priority`` selects how the worker threads pick runnable operations:
+``depth`` and ``cost`` run first the operations with the longest chain of
+work depending on them, which shortens programs limited by a critical path
+(see :ref:`priority scheduling <priority>`). The ``cost`` policy weighs each
+operation with the mean execution time of its type in the report saved by a
+previous ``--profile-json`` run.
+
+With ``--completion=worker`` the worker threads update the dependencies of
+the operations they execute, instead of handing them to the single updater
+thread (see :ref:`completion <completion>`).
+
+``--handoff`` moves operations between the threads in groups, which lowers
+the scheduling overhead of programs made of many cheap operations (see
+:ref:`batched hand-offs <handoff>`).
+
+In a batch run each column of the parameters table replaces the literal of
+the `value` operation with the same name, and the outputs of all named
+operations are written as columns, one row for each row of parameters (see
+:mod:`daffy.vm.batch`). ``--fuse`` can't be used in batch runs, as the
+operations fused into others are not in the results (see
+:mod:`daffy.vm.fusion`).
 """
 
-import sys, logging
+import sys, json, logging
 from optparse import OptionParser
-from daffy.vm.scheduler import Scheduler
+from cStringIO import StringIO
+from daffy.vm.scheduler import Scheduler, EXECUTORS, AUTO, WORKERS, KEEP
+from daffy.vm.scheduler import ReclaimPolicyError, PRIORITIES, FIFO
+from daffy.vm.scheduler import COMPLETIONS, UPDATER
+from daffy.vm.scheduler import DependencyError, OperationNotFoundError
+from daffy.vm.scheduler import OperationAlreadyExistsError, WrongArgumentError
+from daffy.vm.scheduler import dvm_scheduler_close
+from daffy.vm.operations import OperationError
+from daffy.vm.optypes import OperationTypeNotFoundError
 from daffy.vm.interpreter import dvm_program_run, dvm_instruction_run
+from daffy.vm.interpreter import dvm_program_compile, dvm_instructions_run
+from daffy.vm.interpreter import dvm_instructions_batch_run
+from daffy.vm.interpreter import ParserSyntaxError
+from daffy.vm.bytecode import BytecodeError, dvm_bytecode_is_compiled
+from daffy.vm.bytecode import dvm_bytecode_loads, dvm_bytecode_cached
+from daffy.vm.bytecode import dvm_bytecode_cache
+from daffy.vm.batch import BatchError, dvm_batch_load, dvm_batch_save
+from daffy.vm.fusion import dvm_instructions_fuse
+from daffy.vm.resultcache import ResultCache, CACHE_SIZE
+from daffy.vm.graphstore import GraphStoreError, dvm_graphstore_load
+from daffy.vm.graphstore import dvm_graphstore_run
+from daffy.vm.trace import Tracer, dvm_trace_write
+from daffy.vm.stats import Stats, dvm_stats_report, dvm_stats_table
 
 parser = OptionParser(usage="usage: %prog [options] [ -c cmd | file ]")
 parser.add_option("-v", "--verbose",
@@ -41,32 +147,343 @@ parser.add_option("-v", "--verbose",
 parser.add_option("-c", "--cmd",
                   default=None,
                   help="a single instruction")
+parser.add_option("-e", "--executor",
+                  type="choice", choices=EXECUTORS, default=AUTO,
+                  help="how operations are executed: %s [default: %%default]"
+                                                    % ' or '.join(EXECUTORS))
+parser.add_option("-j", "--workers",
+                  type="int", default=WORKERS,
+                  help="number of worker threads or processes "
+                       "[default: %default]")
+parser.add_option("--compile",
+                  action="store_true", default=False,
+                  help="compile the file to a .dfyc file next to it, without "
+                       "running it")
+parser.add_option("-b", "--batch",
+                  dest="params", default=None,
+                  help="run the file once for each row of a table of "
+                       "parameters (CSV or NPY), bound to value operations")
+parser.add_option("-o", "--output",
+                  default=None,
+                  help="write the results of a batch run to a file (CSV or "
+                       "NPY) instead of standard output")
+parser.add_option("--fold",
+                  action="store_true", dest="fold", default=False,
+                  help="evaluate operations with constant inputs ahead of "
+                       "time")
+parser.add_option("--cse",
+                  action="store_true", dest="cse", default=False,
+                  help="merge equivalent operations")
+parser.add_option("--fuse",
+                  action="store_true", dest="fuse", default=False,
+                  help="evaluate chains of arithmetic operations as single "
+                       "operations")
+parser.add_option("--cache-dir",
+                  dest="cache_dir", metavar="DIR",
+                  help="load the results of operations from a cache in DIR, "
+                       "and store new ones there")
+parser.add_option("--cache-size",
+                  type="int", dest="cache_size", metavar="MB",
+                  default=CACHE_SIZE / (1024 * 1024),
+                  help="size limit of the results cache (default: %default)")
+parser.add_option("--reclaim",
+                  dest="reclaim", metavar="POLICY", default=KEEP,
+                  help="remove finished operations from the table: keep, "
+                       "anonymous or the number of recently used names "
+                       "that stay addressable (default: %default)")
+parser.add_option("--arrays",
+                  action="store_true", dest="arrays", default=False,
+                  help="run the file on an array-backed graph, for very "
+                       "large programs working on floats")
+parser.add_option("--trace",
+                  dest="trace", metavar="FILE",
+                  help="write a trace of the execution of operations to "
+                       "FILE, in the Chrome trace event format")
+parser.add_option("--profile",
+                  action="store_true", default=False,
+                  help="print execution statistics by operation type to "
+                       "stderr")
+parser.add_option("--profile-json",
+                  dest="profile_json", metavar="FILE",
+                  help="write execution statistics to FILE, as JSON")
+parser.add_option("--priority",
+                  type="choice", choices=PRIORITIES, default=FIFO,
+                  help="order of execution of runnable operations: %s "
+                       "[default: %%default]" % ' or '.join(PRIORITIES))
+parser.add_option("--costs",
+                  metavar="FILE",
+                  help="estimated costs of the operation types for the cost "
+                       "priority policy, from a --profile-json report")
+parser.add_option("--completion",
+                  type="choice", choices=COMPLETIONS, default=UPDATER,
+                  metavar="MODE",
+                  help="which thread updates the dependencies of executed "
+                       "operations: %s [default: %%default]"
+                                                % ' or '.join(COMPLETIONS))
+parser.add_option("--handoff",
+                  type="int", default=1, metavar="N",
+                  help="move up to N operations at a time between threads "
+                       "[default: %default]")
 
 (options, args) = parser.parse_args()
 
+# options that only apply to files, and options of the scheduler, that
+# --arrays doesn't use, as (dest, flag) pairs
+FILE_OPTIONS = (('compile', '--compile'), ('params', '--batch'),
+                ('fuse', '--fuse'), ('arrays', '--arrays'))
+SCHEDULER_OPTIONS = (('params', '--batch'), ('executor', '--executor'),
+                     ('workers', '--workers'), ('fold', '--fold'),
+                     ('cse', '--cse'), ('cache_dir', '--cache-dir'),
+                     ('reclaim', '--reclaim'), ('trace', '--trace'),
+                     ('profile', '--profile'),
+                     ('profile_json', '--profile-json'),
+                     ('priority', '--priority'), ('costs', '--costs'),
+                     ('completion', '--completion'),
+                     ('handoff', '--handoff'))
+
 loglevel = options.verbose and logging.DEBUG or logging.NOTSET
 logging.basicConfig(stream=sys.stderr, level=loglevel)
 
+tracer = options.trace and Tracer() or None
+stats = (options.profile or options.profile_json) and Stats() or None
+
+# schedulers created by scheduler_create, closed when main returns
+schedulers = []
+
+# errors in the instructions of a program, reported by main
+PROGRAM_ERRORS = (DependencyError, OperationNotFoundError,
+                  OperationAlreadyExistsError, WrongArgumentError,
+                  OperationError, OperationTypeNotFoundError)
+
+def program_compile(filename, source):
+    """Compile the source of a *daffy* file and cache it next to the file"""
+    try:
+        instructions = dvm_program_compile(StringIO(source))
+    except ParserSyntaxError, error:
+        print("daffy: can't compile file '%s': SyntaxError: %s" % (
+                                                            filename, error))
+        return 1
+    if not dvm_bytecode_cache(filename, source, instructions):
+        print("daffy: can't write compiled file for '%s'" % filename)
+        return 1
+    return 0
+
+def program_load(filename, source):
+    """Return the parsed instructions of a *daffy* file, using the compiled
+    cache when possible, or ``None`` if the source has syntax errors
+    """
+    if dvm_bytecode_is_compiled(source):
+        digest, instructions = dvm_bytecode_loads(source)
+        return instructions
+
+    instructions = dvm_bytecode_cached(filename, source)
+    if instructions is None:
+        try:
+            instructions = dvm_program_compile(StringIO(source))
+        except ParserSyntaxError:
+            return None
+        dvm_bytecode_cache(filename, source, instructions)
+    return instructions
+
+def program_batch_run(filename, source, instructions, scheduler):
+    """Run the parsed instructions of a *daffy* file over the table of
+    parameters given with ``--batch`` and write the results"""
+    if instructions is None:
+        try:
+            dvm_program_compile(StringIO(source))
+        except ParserSyntaxError, error:
+            print("daffy: can't run file '%s': SyntaxError: %s" % (
+                                                            filename, error))
+            return 1
+    try:
+        params = dvm_batch_load(options.params)
+        results = dvm_instructions_batch_run(instructions, params, scheduler)
+        dvm_batch_save(options.output or sys.stdout, results)
+    except (BatchError, IOError, ValueError), error:
+        print("daffy: batch run failed: %s" % error)
+        return 1
+    return 0
+
+def program_arrays_run(filename, source, instructions):
+    """Run the parsed instructions of a *daffy* file on a
+    :class:`GraphStore <daffy.vm.graphstore.GraphStore>`"""
+    if instructions is None:
+        try:
+            dvm_program_compile(StringIO(source))
+        except ParserSyntaxError, error:
+            print("daffy: can't run file '%s': SyntaxError: %s" % (
+                                                            filename, error))
+            return 1
+    try:
+        store, slots = dvm_graphstore_load(instructions)
+        dvm_graphstore_run(store)
+    except GraphStoreError, error:
+        print("daffy: can't run file '%s': %s" % (filename, error))
+        return 1
+    except PROGRAM_ERRORS, error:
+        print("daffy: can't run file '%s': %s: %s" % (filename,
+                                                    type(error).__name__,
+                                                    error))
+        return 1
+    return 0
+
+def results_cache():
+    """Return the results cache selected with ``--cache-dir``, or ``None``"""
+    if not options.cache_dir:
+        return None
+    return ResultCache(options.cache_dir, options.cache_size * 1024 * 1024)
+
+def costs_load():
+    """Return the mean execution time of each operation type in the report
+    selected with ``--costs``, or ``None``
+    """
+    if not options.costs:
+        return None
+    with open(options.costs) as f:
+        report = json.load(f)
+    return dict((str(name), s['mean_s'])
+                for name, s in report['optypes'].items())
+
+def scheduler_create():
+    """Return a :class:`Scheduler <daffy.vm.scheduler.Scheduler>` object set
+    up with the command line options, or ``None`` if they are not valid
+    """
+    reclaim = options.reclaim
+    if reclaim.isdigit():
+        reclaim = int(reclaim)
+    try:
+        costs = costs_load()
+    except (IOError, ValueError, KeyError), error:
+        print("daffy: can't load costs '%s': %s" % (options.costs, error))
+        return None
+    try:
+        scheduler = Scheduler(loglevel=loglevel, executor=options.executor,
+                              workers=options.workers, fold=options.fold,
+                              cse=options.cse, cache=results_cache(),
+                              reclaim=reclaim, trace=tracer, stats=stats,
+                              priority=options.priority, costs=costs,
+                              completion=options.completion,
+                              handoff=options.handoff)
+    except ReclaimPolicyError, error:
+        print("daffy: invalid reclaim policy '%s'" % error)
+        return None
+    schedulers.append(scheduler)
+    return scheduler
+
+def profile_write(report):
+    """Print a statistics report to stderr and write it to the file selected
+    with ``--profile-json``, as requested
+    """
+    if options.profile:
+        sys.stderr.write(dvm_stats_table(report) + '\n')
+    if options.profile_json:
+        with open(options.profile_json, 'w') as f:
+            json.dump(report, f, indent=1, sort_keys=True)
+
+def option_is_set(dest):
+    """Check if the option stored in `dest` was given a value other than
+    its default
+    """
+    return getattr(options, dest) != parser.defaults[dest]
+
+def options_check():
+    """Exit with an error if options that don't apply to the program being
+    run, or that can't be used together, were given
+    """
+    if options.cmd or len(args) != 1 or args == ['-']:
+        for dest, flag in FILE_OPTIONS:
+            if option_is_set(dest):
+                parser.error("%s can only be used to run a file" % flag)
+    if options.arrays:
+        for dest, flag in SCHEDULER_OPTIONS:
+            if option_is_set(dest):
+                parser.error("%s can't be used with --arrays" % flag)
+    if options.fuse and options.params:
+        parser.error("--fuse can't be used with --batch: fused operations "
+                     "are not in the results")
+    if options.output and not options.params:
+        parser.error("--output can only be used with --batch")
+
 def main():
     """Parse args, setup a :class:`Scheduler <daffy.vm.scheduler.Scheduler>`
     object, and use
     :func:`dvm_program_run() <daffy.vm.interpreter.dvm_program_run>` to feed it
     the contents of a *daffy* file.
+
+    Files are run from their compiled version when possible, see
+    :func:`dvm_instructions_run() <daffy.vm.interpreter.dvm_instructions_run>`
+
+    The schedulers are closed with
+    :func:`dvm_scheduler_close() <daffy.vm.scheduler.dvm_scheduler_close>`
+    before returning, and the trace and statistics requested with
+    ``--trace``, ``--profile`` and ``--profile-json`` are written even if
+    the program fails. Errors in the instructions are reported, like the
+    other errors, without a traceback.
     """
-    scheduler = Scheduler(loglevel=loglevel)
+    options_check()
+    try:
+        return run()
+    except PROGRAM_ERRORS, error:
+        print("daffy: can't run program: %s: %s" % (type(error).__name__,
+                                                    error))
+        return 1
+    finally:
+        for scheduler in schedulers:
+            dvm_scheduler_close(scheduler)
+        if tracer is not None:
+            dvm_trace_write(tracer, options.trace)
+        if stats is not None:
+            profile_write(dvm_stats_report(stats))
 
+def run():
+    """Run the instruction, stream or file given on the command line, as
+    described in :func:`main`
+    """
     if options.cmd and len(args) == 0:          # called with -c
+        scheduler = scheduler_create()
+        if scheduler is None:
+            return 1
         retval = dvm_instruction_run(options.cmd, scheduler)
         return retval
+    elif not options.cmd and args == ['-']:     # called with a stream
+        scheduler = scheduler_create()
+        if scheduler is None:
+            return 1
+        # read line by line, without waiting for the input buffer to fill
+        return dvm_program_run(iter(sys.stdin.readline, ''), scheduler)
     elif not options.cmd and len(args) == 1:    # called with a file
         filename = args[0]
         try:
-            f = open(filename)
+            f = open(filename, 'rb')
+            source = f.read()
+            f.close()
         except IOError, error:
             print("daffy: can't open file '%s': %s" % (filename, error))
             return 1
-        retval = dvm_program_run(f, scheduler)
-        f.close()
+
+        if options.compile:
+            return program_compile(filename, source)
+
+        try:
+            instructions = program_load(filename, source)
+        except BytecodeError, error:
+            print("daffy: can't load file '%s': %s" % (filename, error))
+            return 1
+        if options.fuse and instructions is not None:
+            instructions = dvm_instructions_fuse(instructions)
+        if options.arrays:
+            return program_arrays_run(filename, source, instructions)
+
+        scheduler = scheduler_create()
+        if scheduler is None:
+            return 1
+        if options.params:
+            return program_batch_run(filename, source, instructions, scheduler)
+        elif instructions is not None:
+            retval = dvm_instructions_run(instructions, scheduler)
+        else:
+            # report all syntax errors, running the valid instructions
+            retval = dvm_program_run(StringIO(source), scheduler)
         return retval
     else:
         parser.print_help()
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Daffy.
+#
+# Daffy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Daffy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Daffy.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Original Copyright (c) 2010, Lorenzo Pierfederici <lpierfederici@gmail.com>
+# Contributor(s): 
+#
+"""Batch runs
+
+A batch run evaluates the same program over a table of parameters, where
+each column of the table is named after a `value` operation of the program
+and each row is a set of input values.
+
+Instead of running the program once for every row, the literals of the bound
+`value` operations are replaced by NumPy arrays holding whole columns, so
+that the graph is built and executed only once and each operation processes
+all the rows in a single call. The results are collected as columns too, one
+for each output of the named operations in the table.
+
+Batch runs need NumPy, and operations that handle array values element-wise,
+as all the arithmetic operations do.
+"""
+
+from collections import OrderedDict
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Exceptions
+class BatchError(Exception):
+    """Error in a batch run"""
+
+
+# API
+def dvm_batch_load(filename):
+    """Load a table of parameters from a file and return a dict mapping
+    column names to arrays
+
+    ``.npy`` files must contain a structured array, any other file is read as
+    CSV with a header row holding the column names
+    """
+    if numpy is None:
+        raise BatchError('batch runs need NumPy')
+    if filename.endswith('.npy'):
+        table = numpy.load(filename)
+    else:
+        table = numpy.genfromtxt(filename, delimiter=',', names=True,
+                                                                dtype=float)
+    table = numpy.atleast_1d(table)
+    if table.dtype.names is None:
+        raise BatchError('%s: the table has no column names' % filename)
+    return OrderedDict((name, numpy.asarray(table[name], dtype=float))
+                                                for name in table.dtype.names)
+
+def dvm_batch_save(filename, results):
+    """Save the results of a batch run to a file, in NumPy format for
+    ``.npy`` files and as CSV otherwise. `filename` can also be a file object
+    """
+    names = results.keys()
+    columns = [results[name] for name in names]
+    if isinstance(filename, basestring) and filename.endswith('.npy'):
+        table = numpy.rec.fromarrays(columns, names=names)
+        numpy.save(filename, table)
+    else:
+        numpy.savetxt(filename, numpy.column_stack(columns), fmt='%.17g',
+                      delimiter=',', header=','.join(names), comments='')
+
+def dvm_batch_rows(params):
+    """Return the number of rows of a table of parameters"""
+    lengths = set(len(column) for column in params.itervalues())
+    if len(lengths) != 1:
+        raise BatchError('all columns must have the same length')
+    return lengths.pop()
+
+def dvm_batch_bind(instructions, params):
+    """Return a copy of a list of parsed instructions where the literals of
+    the `value` operations named in `params` are replaced by the columns of
+    the table
+    """
+    if numpy is None:
+        raise BatchError('batch runs need NumPy')
+    bound = set()
+    result = []
+    for optype, name, args in instructions:
+        if optype == 'value' and name in params:
+            arg_name = args and args[0][0] or 'value'
+            args = [(arg_name, numpy.asarray(params[name], dtype=float))]
+            bound.add(name)
+        result.append((optype, name, args))
+    missing = set(params) - bound
+    if missing:
+        raise BatchError('no value operation named %s' %
+                                                    ', '.join(sorted(missing)))
+    return result
+
+def dvm_batch_results(scheduler, rows):
+    """Collect the outputs of all the named operations in the
+    :attr:`opstable <daffy.vm.scheduler.Scheduler.opstable>` of a scheduler,
+    as columns of `rows` values. Constant outputs are repeated for each row,
+    outputs that don't fit a column are skipped
+    """
+    results = OrderedDict()
+    for name, op in scheduler.opstable.items():
+        if name.startswith('_'):
+            continue    # literals created by the scheduler
+        for sock in op.outputs:
+            if sock.value is None:
+                continue
+            value = numpy.asarray(sock.value, dtype=float)
+            if value.shape not in ((), (rows, )):
+                continue
+            column = numpy.broadcast_to(value, (rows, ))
+            results['%s.%s' % (name, sock.name)] = column
+    return results
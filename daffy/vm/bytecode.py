@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Daffy.
+#
+# Daffy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Daffy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Daffy.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Original Copyright (c) 2010, Lorenzo Pierfederici <lpierfederici@gmail.com>
+# Contributor(s): 
+#
+"""Compiled *daffy* programs
+
+A compiled program is the list of parsed instructions of a *daffy* program,
+as returned by :func:`instruction_parse <daffy.vm.interpreter.instruction_parse>`,
+serialized with :mod:`marshal` so that it can be loaded without parsing the
+source again. The file starts with a header::
+
+    MAGIC | SHA-1 digest of the source | marshalled list of instructions
+
+Much like Python does with ``.pyc`` files, the compiled version of
+``program.dfy`` is cached as ``program.dfyc`` in the same directory, and is
+used instead of the source as long as the digest in its header matches the
+digest of the source.
+"""
+
+import marshal, hashlib, gc
+
+# Exceptions
+class BytecodeError(Exception):
+    """The file is not a valid compiled *daffy* program"""
+
+
+#: the first bytes of a compiled program, including the format version
+MAGIC = 'DFYC\x01'
+
+# length of the source digest in the header
+DIGEST_SIZE = hashlib.sha1().digest_size
+
+# API
+def dvm_bytecode_digest(source):
+    """Return the digest of a program source, as stored in the header"""
+    return hashlib.sha1(source).digest()
+
+def dvm_bytecode_path(filename):
+    """Return the path of the compiled program cached for a source file"""
+    return filename + 'c'
+
+def dvm_bytecode_is_compiled(data):
+    """Check if `data` is the content of a compiled program"""
+    return data.startswith(MAGIC)
+
+def instruction_intern(instruction):
+    """Intern all the strings of a parsed instruction: :mod:`marshal` writes
+    interned strings only once, referencing them after the first time
+    """
+    optype, name, args = instruction
+    args = [tuple(isinstance(a, str) and intern(a) or a for a in arg)
+                                                            for arg in args]
+    return intern(optype), intern(name), args
+
+def dvm_bytecode_dumps(instructions, digest):
+    """Serialize a list of parsed instructions"""
+    instructions = [instruction_intern(i) for i in instructions]
+    return MAGIC + digest + marshal.dumps(instructions)
+
+def dvm_bytecode_loads(data):
+    """Deserialize a compiled program, return the digest of its source and
+    the list of parsed instructions
+    """
+    if not dvm_bytecode_is_compiled(data):
+        raise BytecodeError('bad magic number')
+    start = len(MAGIC)
+    digest = data[start:start + DIGEST_SIZE]
+    # loading creates lots of containers at once, that would trigger the
+    # garbage collector over and over again
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        instructions = marshal.loads(data[start + DIGEST_SIZE:])
+    except (EOFError, ValueError, TypeError), error:
+        raise BytecodeError(error)
+    finally:
+        if enabled:
+            gc.enable()
+    return digest, instructions
+
+def dvm_bytecode_write(filename, instructions, digest):
+    """Write a compiled program to `filename`"""
+    f = open(filename, 'wb')
+    try:
+        f.write(dvm_bytecode_dumps(instructions, digest))
+    finally:
+        f.close()
+
+def dvm_bytecode_cached(filename, source):
+    """Return the list of instructions cached for the source file `filename`
+    with content `source`, or ``None`` if there is no valid cache
+    """
+    try:
+        f = open(dvm_bytecode_path(filename), 'rb')
+    except IOError:
+        return None
+    try:
+        data = f.read()
+    finally:
+        f.close()
+    try:
+        digest, instructions = dvm_bytecode_loads(data)
+    except BytecodeError:
+        return None
+    if digest != dvm_bytecode_digest(source):
+        return None
+    return instructions
+
+def dvm_bytecode_cache(filename, source, instructions):
+    """Cache the compiled version of the source file `filename`; as with
+    ``.pyc`` files, failing to write the cache is not an error
+    """
+    try:
+        dvm_bytecode_write(dvm_bytecode_path(filename), instructions,
+                                                dvm_bytecode_digest(source))
+    except (IOError, OSError):
+        return False
+    return True
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Daffy.
+#
+# Daffy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Daffy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Daffy.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Original Copyright (c) 2010, Lorenzo Pierfederici <lpierfederici@gmail.com>
+# Contributor(s): 
+#
+"""Graph compilation
+
+A graph that is evaluated many times with different inputs doesn't need to go
+through the scheduler every time: once the :attr:`Scheduler.opstable
+<daffy.vm.scheduler.Scheduler.opstable>` is built, the order of evaluation
+and the connections between operations never change.
+
+:func:`dvm_graph_compile` generates the source of a single Python function
+that computes all the operations in the table, in the order they were added,
+keeping every output in a local variable. Named `value` operations become
+parameters of the function, defaulting to their current values; operations
+whose type gives an :attr:`expr <daffy.vm.operations.OperationType.expr>` are
+inlined, the others are run through
+:func:`dvm_operation_exec_values() <daffy.vm.operations.dvm_operation_exec_values>`.
+The function returns a dict mapping ``name.attr`` strings to output values.
+
+For instance::
+
+    $x: value(v=1)
+    $y: add(a=$x.value, b=2)
+
+is compiled to::
+
+    def graph(x=_c0):
+        _v0_0 = x
+        _v1_0 = _c1
+        _v2_0 = (_v0_0) + (_v1_0)
+        return {'x.value': _v0_0, 'y.result': _v2_0}
+
+Names generated by the compiler start with an underscore, so they never
+clash with the names of the operations.
+
+Operations folded by the scheduler don't read their inputs from the other
+operations anymore (see :ref:`constant folding <folding>`), so the scheduler
+must not fold operations, the default, for the `value` operations to be real
+parameters.
+"""
+
+from keyword import iskeyword
+from daffy.vm.operations import dvm_operation_exec_values
+
+# Exceptions
+class CodegenError(Exception):
+    """Error generating the code of a graph"""
+
+
+# Internal functions
+def op_variable(index, out_index):
+    """Return the name of the local variable holding an output"""
+    return '_v%i_%i' % (index, out_index)
+
+def op_input_expression(sock, variables, namespace):
+    """Return the expression reading the value of an input socket"""
+    if sock.op is None:
+        return op_constant(sock.value, namespace)
+    try:
+        return variables[sock.op.name, sock.attr]
+    except KeyError:
+        raise CodegenError('%s.%s is not in the graph' % (sock.op.name,
+                                                          sock.attr))
+
+def op_constant(value, namespace):
+    """Add a constant to the namespace of the generated code and return its
+    name
+    """
+    name = '_c%i' % (len(namespace) - 1)
+    namespace[name] = value
+    return name
+
+def op_code(op, index, variables, namespace, params):
+    """Return the lines of code computing the outputs of an operation"""
+    targets = [op_variable(index, i) for i in range(len(op.outputs))]
+    optype = op.typeinfo
+
+    if optype.name == 'value':
+        if op.name.startswith('_'):
+            return ['%s = %s' % (targets[0],
+                                 op_constant(op.outputs[0].value, namespace))]
+        if iskeyword(op.name):
+            raise CodegenError("can't use '%s' as parameter" % op.name)
+        params.append('%s=%s' % (op.name,
+                                 op_constant(op.outputs[0].value, namespace)))
+        return ['%s = %s' % (targets[0], op.name)]
+
+    values = dict((sock.name, '(%s)' % op_input_expression(sock, variables,
+                                                           namespace))
+                  for sock in op.inputs)
+    if optype.expr is not None:
+        return ['%s = %s' % (target, optype.expr[sock.name] % values)
+                for target, sock in zip(targets, op.outputs)]
+
+    args = ', '.join(values[sock.name] for sock in op.inputs)
+    call = '_exec_values(%s, [%s])' % (op_constant(optype, namespace), args)
+    if not targets:
+        # e.g. print, run for its side effects
+        return [call]
+    return ['%s, = %s' % (', '.join(targets), call)]
+
+
+# API
+def dvm_graph_source(scheduler):
+    """Return the source of the function computing the graph of a scheduler,
+    and the namespace it must be executed in
+    """
+    namespace = {'_exec_values': dvm_operation_exec_values}
+    variables = {}
+    params = []
+    body = []
+    for index, op in enumerate(scheduler.opstable):
+        body.extend(op_code(op, index, variables, namespace, params))
+        for i, sock in enumerate(op.outputs):
+            variables[op.name, sock.name] = op_variable(index, i)
+
+    results = []
+    for name, op in scheduler.opstable.items():
+        if name.startswith('_'):
+            continue    # literals created by the scheduler
+        for sock in op.outputs:
+            results.append("'%s.%s': %s" % (name, sock.name,
+                                            variables[op.name, sock.name]))
+    body.append('return {%s}' % ', '.join(results))
+
+    source = 'def graph(%s):\n    %s\n' % (', '.join(params),
+                                           '\n    '.join(body))
+    return source, namespace
+
+def dvm_graph_compile(scheduler):
+    """Compile the graph of a scheduler to a Python function
+
+    all the operations must already be in the :attr:`Scheduler.opstable
+    <daffy.vm.scheduler.Scheduler.opstable>`, they don't need to be executed.
+    Raise :exc:`CodegenError` if the graph can't be compiled.
+    """
+    source, namespace = dvm_graph_source(scheduler)
+    try:
+        code = compile(source, '<daffy graph>', 'exec')
+    except SyntaxError, error:
+        # e.g. more than 255 parameters
+        raise CodegenError(error)
+    exec code in namespace
+    return namespace['graph']
@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Daffy.
+#
+# Daffy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Daffy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Daffy.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Original Copyright (c) 2010, Lorenzo Pierfederici <lpierfederici@gmail.com>
+# Contributor(s): 
+#
+"""Operation fusion
+
+Every operation goes through a full scheduling round trip: it is queued when
+its inputs are ready, executed by a worker and marked as finished before its
+dependents can be queued in turn. For long chains of small operations, such
+as ``add -> mul -> sub -> div``, this overhead dominates the actual work.
+
+Fusion is a pass over a list of parsed instructions (see
+:func:`dvm_program_compile() <daffy.vm.interpreter.dvm_program_compile>`)
+that merges every :attr:`pure <daffy.vm.operations.OperationType.pure>`
+operation whose outputs are read by a single other pure operation into its
+consumer. Only operation types giving an :attr:`expr
+<daffy.vm.operations.OperationType.expr>` are fused. Each group of merged
+operations is replaced by one instruction of a synthesized *fused* type,
+whose `execfunc` is a :class:`FusedKernel`: a Python function generated
+from the `expr` of each operation of the group, that evaluates the whole
+group in a single call, so the group is scheduled only once. Groups have at
+most :data:`MAX_GROUP` operations, longer chains are split in several
+groups.
+
+The fused operation takes the name of the last operation of the group and has
+the same outputs, so the rest of the program is unaffected; the intermediate
+operations are not added to the table at all, so their outputs are not
+available to :mod:`batch <daffy.vm.batch>` runs either. `value` operations
+are never fused, to keep them available as parameters.
+
+Fused types are named after a digest of the code of their kernel, for
+instance ``fused:3c1f9a0e5b7d2468``, so that groups with the same shape share
+the same type. They are not registered in the :data:`optypes
+<daffy.vm.optypes.optypes>` list, but kept in :data:`fused_types`, and the
+fused instructions hold the type object itself instead of its name (see
+:func:`dvm_operation_type_get() <daffy.vm.optypes.dvm_operation_type_get>`).
+"""
+
+from hashlib import sha1
+from daffy.vm.operations import OperationType, InputSocketType
+from daffy.vm.operations import dvm_input_values_get, dvm_output_values_set
+from daffy.vm.optypes import dvm_operation_type_find, dvm_operation_type_get
+from daffy.vm.optypes import OperationTypeNotFoundError
+
+#: maximum number of operations fused together
+MAX_GROUP = 32
+
+#: fused types created so far, by name
+fused_types = {}
+
+#: kernel functions compiled so far, by source; worker processes of the
+#: ``processes`` executor have their own
+kernels = {}
+
+
+class FusedKernel(object):
+    """The `execfunc` of a fused operation type
+
+    `source` is the code of a ``kernel`` function taking the input values of
+    the fused operation, in order, and returning the list of its output
+    values. Kernels are pickled as their source, and compiled again where
+    they are unpickled.
+    """
+    def __init__(self, source):
+        self.source = source
+        self.func = kernel_compile(source)
+
+    def __getstate__(self):
+        return self.source
+
+    def __setstate__(self, source):
+        self.__init__(source)
+
+    def __call__(self, op):
+        dvm_output_values_set(op, self.func(*dvm_input_values_get(op)))
+
+
+# Internal functions
+def kernel_compile(source):
+    """Return the ``kernel`` function defined by `source`, compiling it only
+    the first time
+    """
+    try:
+        return kernels[source]
+    except KeyError:
+        namespace = {}
+        exec compile(source, '<fused kernel>', 'exec') in namespace
+        return kernels.setdefault(source, namespace['kernel'])
+
+def instruction_type(type):
+    """Return the optype of an instruction, or ``None`` if it's unknown"""
+    try:
+        return dvm_operation_type_get(type)
+    except OperationTypeNotFoundError:
+        return None
+
+def instruction_is_fusable(optype, args):
+    """Check if an instruction can be part of a fused operation"""
+    if optype is None or not optype.pure or optype.expr is None or \
+                                                    optype.name == 'value':
+        return False
+    return all(arg[0] in optype.input_index for arg in args)
+
+def instructions_fuse_into(instructions):
+    """Return a dict mapping the names of the operations that can be fused to
+    the name of their consumer
+
+    Groups are limited to :data:`MAX_GROUP` operations: walking the
+    instructions in order, an operation whose group would grow too large
+    leaves the remaining producers out of it.
+    """
+    definitions = {}
+    positions = {}
+    consumers = {}
+    for position, (type, name, args) in enumerate(instructions):
+        definitions[name] = definitions.get(name, 0) + 1
+        positions[name] = position
+        for arg in args:
+            if len(arg) == 3:
+                consumers.setdefault(arg[1], {}).setdefault(name, set()).add(
+                                                                        arg[2])
+
+    fusable = {}
+    for type, name, args in instructions:
+        optype = instruction_type(type)
+        if definitions[name] == 1 and instruction_is_fusable(optype, args):
+            fusable[name] = optype
+
+    into = {}
+    for name, optype in fusable.iteritems():
+        users = consumers.get(name, {})
+        if len(users) != 1:
+            continue
+        consumer, attrs = users.items()[0]
+        if (consumer in fusable and positions[name] < positions[consumer] and
+                all(attr in optype.output_index for attr in attrs)):
+            into[name] = consumer
+
+    # producers come before their consumer, so the size of their groups is
+    # known when the consumer is reached
+    sizes = {}
+    for producer, consumer in producers_get(instructions, into):
+        size = sizes.get(consumer, 1) + sizes.get(producer, 1)
+        if size > MAX_GROUP:
+            del into[producer]
+        else:
+            sizes[consumer] = size
+    return into
+
+def producers_get(instructions, into):
+    """Return the ``(producer, consumer)`` pairs of `into`, in the order the
+    producers appear in `instructions`
+    """
+    return [(name, into[name]) for type, name, args in instructions
+                                                            if name in into]
+
+def instruction_fuse(root, instructions, into, producers):
+    """Build the fused instruction for the group of operations ending with
+    `root`
+
+    `producers` maps each operation to the list of operations fused into it.
+    The group is walked depth first without recursion, and each operation
+    becomes a step of the kernel once the operations fused into it have
+    been.
+    """
+    fused_args = []
+    in_types = []
+    lines = []
+    variables = {}
+    index = 0
+
+    pending = [(root, False)]
+    while pending:
+        name, ready = pending.pop()
+        if not ready:
+            pending.append((name, True))
+            for producer in reversed(producers.get(name, ())):
+                pending.append((producer, False))
+            continue
+
+        type, name, args = instructions[name]
+        optype = dvm_operation_type_find(type)
+        values = {}
+        for arg in args:
+            if len(arg) == 3 and into.get(arg[1]) == name:
+                values[arg[0]] = variables[arg[1], arg[2]]
+            else:
+                values[arg[0]] = 'in%i' % len(fused_args)
+                in_types.append(optype.inputs[optype.input_index[arg[0]]])
+                fused_args.append(('in%i' % len(fused_args),) + arg[1:])
+        for in_type in optype.inputs:
+            if in_type.name not in values:
+                # unconnected, the fused operation keeps the default value
+                values[in_type.name] = 'in%i' % len(fused_args)
+                in_types.append(in_type)
+                fused_args.append(('in%i' % len(fused_args),
+                                   in_type.default))
+        for in_name in values:
+            values[in_name] = '(%s)' % values[in_name]
+        for out_type in optype.outputs:
+            variable = '_s%i_%s' % (index, out_type.name)
+            lines.append('%s = %s' % (variable,
+                                      optype.expr[out_type.name] % values))
+            variables[name, out_type.name] = variable
+        index += 1
+
+    outputs = optype.outputs
+    lines.append('return [%s]' % ', '.join(variables[root, out_type.name]
+                                           for out_type in outputs))
+    source = 'def kernel(%s):\n    %s\n' % (
+                        ', '.join('in%i' % i for i in range(len(in_types))),
+                        '\n    '.join(lines))
+    optype = fused_type_get(source, in_types, outputs)
+    return optype, root, fused_args
+
+def fused_type_get(source, in_types, outputs):
+    """Return the fused type evaluating the kernel `source`, creating it if
+    needed
+    """
+    digest = sha1(source)
+    digest.update(repr([out_type.name for out_type in outputs]))
+    name = 'fused:%s' % digest.hexdigest()[:16]
+    try:
+        return fused_types[name]
+    except KeyError:
+        pass
+    optype = OperationType(
+        name=name,
+        inputs=[InputSocketType('in%i' % i, in_type.default)
+                for i, in_type in enumerate(in_types)],
+        outputs=outputs,
+        execfunc=FusedKernel(source),
+        pure=True
+    )
+    return fused_types.setdefault(name, optype)
+
+
+# API
+def dvm_instructions_fuse(instructions):
+    """Return a new list of instructions where the groups of pure operations
+    that can be evaluated together are replaced by fused operations
+
+    `instructions` is a list of parsed instructions, as returned by
+    :func:`dvm_program_compile() <daffy.vm.interpreter.dvm_program_compile>`,
+    and is left unchanged. Instructions that can't be added to a scheduler,
+    with an unknown type or input, are never fused, so they report the same
+    errors. Errors raised while executing an operation, such as a
+    division by zero, are raised by the :class:`FusedKernel` of its group
+    instead, when the fused operation named after the last operation of the
+    group is executed. The type of a fused instruction is the fused
+    :class:`OperationType <daffy.vm.operations.OperationType>` itself.
+    """
+    into = instructions_fuse_into(instructions)
+    if not into:
+        return list(instructions)
+
+    by_name = dict((name, (type, name, args))
+                   for type, name, args in instructions)
+    producers = {}
+    for producer, consumer in producers_get(instructions, into):
+        producers.setdefault(consumer, []).append(producer)
+    roots = set(into.itervalues()) - set(into)
+
+    fused = []
+    for type, name, args in instructions:
+        if name in into:
+            continue
+        elif name in roots:
+            fused.append(instruction_fuse(name, by_name, into, producers))
+        else:
+            fused.append((type, name, args))
+    return fused
@@ -0,0 +1,352 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Daffy.
+#
+# Daffy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Daffy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Daffy.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Original Copyright (c) 2010, Lorenzo Pierfederici <lpierfederici@gmail.com>
+# Contributor(s): 
+#
+"""Array-backed graph storage
+
+Each :class:`Operation <daffy.vm.operations.Operation>` object, with its
+sockets and its lists of dependents, takes several hundred bytes: with
+millions of operations the objects, rather than the values, fill the memory.
+A :class:`GraphStore` keeps the same graph as a few flat NumPy arrays, with
+operations and their outputs identified by integer indices:
+
+`type_id`
+    the type of each operation, an index in :attr:`GraphStore.types`
+`in_ptr`, `in_src`
+    the inputs of operation ``i`` are ``in_src[in_ptr[i]:in_ptr[i + 1]]``, in
+    the order of the inputs of its type; each input is the index of the
+    *slot* it reads
+`out_slot`
+    the outputs of operation ``i`` are in consecutive slots, starting from
+    ``out_slot[i]``
+`values`, `slot_node`
+    a slot is a float value, either an output (``slot_node`` holds the index
+    of the operation computing it) or a literal (``slot_node`` is ``-1``)
+
+When the graph is run (see :func:`dvm_graphstore_run`) the ``waiting_on``
+counter of each operation becomes an array, and the dependents of each
+operation are stored in compressed sparse row form (``dep_ptr``,
+``dep_idx``). Operations are then executed in waves: all the operations
+whose inputs are ready are executed together, grouped by type, and the
+counters of their dependents are decreased at once. Types with an
+:attr:`expr <daffy.vm.operations.OperationType.expr>` are evaluated on whole
+arrays of inputs with NumPy (so division by zero gives ``inf`` instead of
+raising an error), the others are executed one operation at a time through
+:func:`dvm_operation_exec_values() <daffy.vm.operations.dvm_operation_exec_values>`.
+
+Only float values are supported, and operations are executed on the calling
+thread. Graphs can be built from parsed instructions with
+:func:`dvm_graphstore_load`, or directly with :func:`dvm_graphstore_add_many`
+to add many operations of the same type with a single call.
+"""
+
+from daffy.vm.optypes import dvm_operation_type_get
+from daffy.vm.operations import dvm_operation_exec_values
+from daffy.vm.scheduler import OperationAlreadyExistsError
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Exceptions
+class GraphStoreError(Exception):
+    """Error building or running a :class:`GraphStore`"""
+
+
+#: integer type of the indices stored in the arrays
+INDEX = 'int32'
+
+#: initial number of operations, inputs and slots of a new store
+CAPACITY = 1024
+
+
+class GraphStore(object):
+    """A graph of operations stored in flat arrays"""
+    def __init__(self, capacity=CAPACITY):
+        if numpy is None:
+            raise GraphStoreError('array-backed graphs need NumPy')
+
+        #: :class:`OperationType <daffy.vm.operations.OperationType>` objects
+        #: used in the graph, indexed by type id
+        self.types = []
+        self._type_ids = {}
+
+        #: number of operations, inputs and slots in the graph
+        self.size = 0
+        self.n_inputs = 0
+        self.n_slots = 0
+
+        self.type_id = numpy.empty(capacity, dtype='int16')
+        self.in_ptr = numpy.zeros(capacity + 1, dtype=INDEX)
+        self.out_slot = numpy.empty(capacity, dtype=INDEX)
+        self.in_src = numpy.empty(capacity, dtype=INDEX)
+        self.values = numpy.empty(capacity, dtype=float)
+        self.slot_node = numpy.empty(capacity, dtype=INDEX)
+
+    def nbytes(self):
+        """Return the bytes used by the arrays of the store"""
+        return sum(array.nbytes for array in (self.type_id, self.in_ptr,
+                        self.out_slot, self.in_src, self.values, self.slot_node))
+
+    def __len__(self):
+        return self.size
+
+    def __repr__(self):
+        return '<GraphStore: %i operations>' % self.size
+
+
+# Internal functions
+def array_grow(array, size):
+    """Return `array`, or a copy of it with room for at least `size` items"""
+    if len(array) >= size:
+        return array
+    grown = numpy.empty(max(size, 2 * len(array)), dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+def store_reserve(store, n_ops, n_inputs, n_slots):
+    """Make room for more operations, inputs and slots"""
+    if store.size + n_ops + 1 >= 2 ** 31 or \
+                                    store.n_slots + n_slots >= 2 ** 31:
+        raise GraphStoreError('too many operations')
+    store.type_id = array_grow(store.type_id, store.size + n_ops)
+    store.in_ptr = array_grow(store.in_ptr, store.size + n_ops + 1)
+    store.out_slot = array_grow(store.out_slot, store.size + n_ops)
+    store.in_src = array_grow(store.in_src, store.n_inputs + n_inputs)
+    store.values = array_grow(store.values, store.n_slots + n_slots)
+    store.slot_node = array_grow(store.slot_node, store.n_slots + n_slots)
+
+def store_type_id(store, optype):
+    """Return the type id of an operation type, adding it to the store"""
+    try:
+        return store._type_ids[optype.name]
+    except KeyError:
+        store.types.append(optype)
+        store._type_ids[optype.name] = len(store.types) - 1
+        return len(store.types) - 1
+
+def store_dependents(store):
+    """Return the ``waiting_on`` counters and the dependents of all the
+    operations of a store, as a ``(waiting, dep_ptr, dep_idx)`` tuple
+    """
+    n = store.size
+    in_counts = numpy.diff(store.in_ptr[:n + 1])
+    consumer = numpy.repeat(numpy.arange(n, dtype=INDEX), in_counts)
+    producer = store.slot_node[store.in_src[:store.n_inputs]]
+    connected = producer >= 0
+    consumer = consumer[connected]
+    producer = producer[connected]
+    del connected
+
+    waiting = numpy.bincount(consumer, minlength=n).astype(INDEX)
+    dep_ptr = numpy.zeros(n + 1, dtype=INDEX)
+    numpy.cumsum(numpy.bincount(producer, minlength=n), out=dep_ptr[1:])
+    dep_idx = consumer[numpy.argsort(producer, kind='mergesort')]
+    return waiting, dep_ptr, dep_idx
+
+def store_kernel(optype):
+    """Return the code objects evaluating the `expr` of each output of an
+    operation type on arrays
+    """
+    names = dict((in_type.name, '_in%i' % i)
+                 for i, in_type in enumerate(optype.inputs))
+    return [compile(optype.expr[out_type.name] % names, optype.name, 'eval')
+            for out_type in optype.outputs]
+
+def store_execute(store, optype, nodes, kernels):
+    """Execute a group of operations of the same type"""
+    n_in = len(optype.inputs)
+    pos = store.in_ptr[nodes]
+    args = [store.values[store.in_src[pos + i]] for i in range(n_in)]
+    out = store.out_slot[nodes]
+
+    if optype.expr is not None:
+        if optype.name not in kernels:
+            kernels[optype.name] = store_kernel(optype)
+        env = dict(('_in%i' % i, arg) for i, arg in enumerate(args))
+        for i, code in enumerate(kernels[optype.name]):
+            store.values[out + i] = eval(code, env)
+        return
+
+    args = [arg.tolist() for arg in args]
+    for j in xrange(len(nodes)):
+        results = dvm_operation_exec_values(optype, [arg[j] for arg in args])
+        try:
+            store.values[out[j]:out[j] + len(results)] = results
+        except (TypeError, ValueError):
+            raise GraphStoreError('%s operations must output floats' %
+                                                                optype.name)
+
+def ranges_concat(starts, ends):
+    """Return the concatenation of the ranges ``[start, end)``"""
+    counts = ends - starts
+    total = counts.sum()
+    if total == 0:
+        return numpy.empty(0, dtype=INDEX)
+    offsets = numpy.repeat(starts - numpy.cumsum(counts) + counts, counts)
+    return offsets + numpy.arange(total, dtype=offsets.dtype)
+
+
+# API
+def dvm_graphstore_literal(store, value):
+    """Add a literal value to a store and return its slot"""
+    return dvm_graphstore_literals(store, [value])[0]
+
+def dvm_graphstore_literals(store, values):
+    """Add an array of literal values to a store and return their slots"""
+    values = numpy.asarray(values, dtype=float)
+    store_reserve(store, 0, 0, len(values))
+    first = store.n_slots
+    store.n_slots += len(values)
+    store.values[first:store.n_slots] = values
+    store.slot_node[first:store.n_slots] = -1
+    return numpy.arange(first, store.n_slots, dtype=INDEX)
+
+def dvm_graphstore_add(store, type, inputs):
+    """Add an operation to a store and return its index
+
+    `inputs` holds the slot read by each input of the operation type, in
+    order, or ``None`` to use the default value
+    """
+    inputs = [None if source is None else [source] for source in inputs]
+    return dvm_graphstore_add_many(store, type, inputs, 1)[0]
+
+def dvm_graphstore_add_many(store, type, inputs, n):
+    """Add `n` operations of the same type to a store and return their
+    indices
+
+    `inputs` holds an array of `n` slots for each input of the operation
+    type, in order, or ``None`` to use the default value for all the
+    operations
+    """
+    optype = dvm_operation_type_get(type)
+    if len(inputs) != len(optype.inputs):
+        raise GraphStoreError('%s operations have %i inputs' % (
+                                            optype.name, len(optype.inputs)))
+    sources = []
+    for in_type, source in zip(optype.inputs, inputs):
+        if source is None:
+            source = dvm_graphstore_literal(store, in_type.default)
+        sources.append(numpy.resize(numpy.asarray(source, dtype=INDEX), n))
+
+    n_in = len(optype.inputs)
+    n_out = len(optype.outputs)
+    store_reserve(store, n, n * n_in, n * n_out)
+    first, last = store.size, store.size + n
+    store.type_id[first:last] = store_type_id(store, optype)
+
+    in_first = store.n_inputs
+    for i, source in enumerate(sources):
+        store.in_src[in_first + i:in_first + n * n_in:n_in] = source
+    store.in_ptr[first + 1:last + 1] = in_first + n_in * numpy.arange(1,
+                                                        n + 1, dtype=INDEX)
+    out_first = store.n_slots
+    store.out_slot[first:last] = out_first + n_out * numpy.arange(n,
+                                                                dtype=INDEX)
+    store.slot_node[out_first:out_first + n * n_out] = numpy.repeat(
+                            numpy.arange(first, last, dtype=INDEX), n_out)
+    store.values[out_first:out_first + n * n_out] = numpy.nan
+
+    store.size = last
+    store.n_inputs += n * n_in
+    store.n_slots += n * n_out
+    return numpy.arange(first, last, dtype=INDEX)
+
+def dvm_graphstore_outputs(store, nodes, index=0):
+    """Return the slots of the output `index` of some operations"""
+    return store.out_slot[nodes] + index
+
+def dvm_graphstore_value(store, slot):
+    """Return the value held by a slot"""
+    return store.values[slot]
+
+def dvm_graphstore_run(store):
+    """Execute all the operations of a store, return how many waves of
+    operations were executed
+    """
+    waiting, dep_ptr, dep_idx = store_dependents(store)
+    kernels = {}
+    waves = 0
+    ready = numpy.flatnonzero(waiting == 0).astype(INDEX)
+    with numpy.errstate(all='ignore'):
+        while len(ready):
+            waves += 1
+            type_ids = store.type_id[ready]
+            if type_ids.min() == type_ids.max():
+                groups = [ready]
+            else:
+                ready = ready[numpy.argsort(type_ids, kind='mergesort')]
+                type_ids = store.type_id[ready]
+                bounds = numpy.flatnonzero(numpy.diff(type_ids)) + 1
+                groups = numpy.split(ready, bounds)
+            for nodes in groups:
+                optype = store.types[store.type_id[nodes[0]]]
+                store_execute(store, optype, nodes, kernels)
+
+            deps = dep_idx[ranges_concat(dep_ptr[ready], dep_ptr[ready + 1])]
+            deps, counts = numpy.unique(deps, return_counts=True)
+            waiting[deps] -= counts.astype(INDEX)
+            ready = deps[waiting[deps] == 0]
+    return waves
+
+def dvm_graphstore_load(instructions):
+    """Build a store from a list of parsed instructions, as returned by
+    :func:`dvm_program_compile() <daffy.vm.interpreter.dvm_program_compile>`
+
+    Return the store and a dict mapping ``name.attr`` strings to slots. Named
+    `value` operations become literal slots. As with a
+    :class:`Scheduler <daffy.vm.scheduler.Scheduler>`, a name defined twice
+    raises :exc:`OperationAlreadyExistsError
+    <daffy.vm.scheduler.OperationAlreadyExistsError>`.
+    """
+    store = GraphStore()
+    slots = {}
+    names = set()
+    for type, name, args in instructions:
+        if name in names:
+            raise OperationAlreadyExistsError(name)
+        names.add(name)
+        if type == 'value':
+            if len(args) != 1 or len(args[0]) != 2 or \
+                                        not isinstance(args[0][1], float):
+                raise GraphStoreError("'%s' is not a float value" % name)
+            slots['%s.value' % name] = dvm_graphstore_literal(store,
+                                                              args[0][1])
+            continue
+
+        optype = dvm_operation_type_get(type)
+        inputs = [None] * len(optype.inputs)
+        for arg in args:
+            try:
+                i = optype.input_index[arg[0]]
+            except KeyError:
+                raise GraphStoreError('%s has no input %s' % (optype.name,
+                                                              arg[0]))
+            if len(arg) == 2:
+                inputs[i] = dvm_graphstore_literal(store, arg[1])
+            else:
+                try:
+                    inputs[i] = slots['%s.%s' % arg[1:]]
+                except KeyError:
+                    raise GraphStoreError('%s.%s not found' % arg[1:])
+        node = dvm_graphstore_add(store, optype, inputs)
+        for i, out_type in enumerate(optype.outputs):
+            slots['%s.%s' % (name, out_type.name)] = store.out_slot[node] + i
+    return store, slots
@@ -21,9 +21,10 @@
 """A basic interpreter for *daffy* assembly code.
 The interpreter expects instructions in the form::
 
-    $name: optype([argname=$target.attr | <float value>], ...) comment
+    $name: optype([argname=$target.attr | <float value> | <array>], ...) comment
 
-one instruction per line.
+one instruction per line. Array literals are lists of float values between
+square brackets, like ``[1, 2.5, 3]``, and are turned into NumPy arrays.
 
 .. _parsing_state_machine:
 
@@ -34,8 +35,16 @@ Parsing state machine
 
 the parser is a simple state machine that goes over the instruction a
 character at a time and, depending on the input, goes through the different
-states until the instruction is succesfully parsed or an error occurs. Each
-instruction is distilled in a tuple::
+states until the instruction is succesfully parsed or an error occurs.
+
+Going through the state machine one character at a time is slow, so
+:func:`instruction_parse` first tries to match the whole instruction with a
+precompiled regular expression (:data:`INSTRUCTION_RE`) that accepts exactly
+the instructions the state machine parses successfully. Only when the
+expression doesn't match the instruction is handed to the state machine
+(:func:`instruction_parse_fsm`), that reports where the syntax error is.
+
+Each instruction is distilled in a tuple::
 
     (optype, name, args)
 
@@ -47,11 +56,13 @@ object and process it.
 and *args* is a list of arguments in the form::
 
     (arg_name, arg_target, arg_attribute) | (arg_name, <flot value>)
+                                          | (arg_name, [<float value>, ...])
 
 in the first case *arg_name* is the name one of the
 :attr:`Operation.inputs`, *arg_target* is the name indicating the operation
 connected to this input and *arg_attribute* is the name of the soket in
-:attr:`Operation.outputs` we are fetching the value from.
+:attr:`Operation.outputs` we are fetching the value from. Array literals are
+returned as lists of floats.
 
 Here is a list of the parser states:
 
@@ -74,6 +85,13 @@ ARGS_COMMA    12    received a "," character (and optionale whitespaces)
 ARGS_FLOAT    13    accumulating a string representing a floating number
 FLOAT_DOT     14    received a "." character while scanning a float
 FLOAT_DECIMAL 15    accumulating a string representing the decimal part
+ARRAY         16    received a "[" character (and optional whitespace)
+ARRAY_COMMA   17    received a "," character in an array (and optional
+                    whitespace)
+ARRAY_FLOAT   18    accumulating a string representing an array item
+ARRAY_DOT     19    received a "." character while scanning an array item
+ARRAY_DECIMAL 20    accumulating the decimal part of an array item
+ARRAY_END     21    received a "]" character
 ERROR         -1    an error occured
 FINISH        -2    instruction parsed succesfully
 ============= ===== ====================================================
@@ -82,6 +100,7 @@ FINISH        -2    instruction parsed succesfully
 import re, sys, logging
 from daffy.vm.optypes import optypes
 from daffy.vm.scheduler import dvm_scheduler_operation_add, dvm_scheduler_wait
+from daffy.vm.batch import dvm_batch_rows, dvm_batch_bind, dvm_batch_results
 
 logging.basicConfig(stream=sys.stderr, level=logging.ERROR)
 log = logging.getLogger(__name__)
@@ -112,13 +131,65 @@ ARGS_COMMA    = 12
 ARGS_FLOAT    = 13
 FLOAT_DOT     = 14
 FLOAT_DECIMAL = 15
+ARRAY         = 16
+ARRAY_COMMA   = 17
+ARRAY_FLOAT   = 18
+ARRAY_DOT     = 19
+ARRAY_DECIMAL = 20
+ARRAY_END     = 21
 ERROR         = -1
 FINISH        = -2
 
+# regular expressions for the parser fast path
+IDENTIFIER = r'[a-zA-Z][a-zA-Z0-9_]*'
+FLOAT = r'[0-9]+(?:\.[0-9]+)?'
+ARRAY_LITERAL = r'\[\s*(?:%s(?:,\s*%s)*)?\]' % (FLOAT, FLOAT)
+ARGUMENT = r'%s=(?:\$%s\.%s|%s|%s)' % (
+                    IDENTIFIER, IDENTIFIER, IDENTIFIER, FLOAT, ARRAY_LITERAL)
+
+#: a complete instruction: groups are the name, the optype and the arguments
+INSTRUCTION_RE = re.compile(r'\$(%s):\s*(%s)\(((?:%s(?:,\s*%s)*)?)\)' % (
+                            IDENTIFIER, IDENTIFIER, ARGUMENT, ARGUMENT))
+
+#: a single argument: groups are the name, the target, the attribute, the
+#: literal value and the array literal
+ARGUMENT_RE = re.compile(r'(%s)=(?:\$(%s)\.(%s)|(%s)|(%s))' % (
+                    IDENTIFIER, IDENTIFIER, IDENTIFIER, FLOAT, ARRAY_LITERAL))
+
+#: a single item of an array literal
+FLOAT_RE = re.compile(FLOAT)
+
 # internal use
 def instruction_parse(instr):
     """Parse an instruction
 
+    Well formed instructions are parsed by :data:`INSTRUCTION_RE`, everything
+    else goes through :func:`instruction_parse_fsm` to get the same results
+    and errors as the state machine.
+
+    .. seealso::
+        :ref:`parsing_state_machine` for details on the parsing process
+    """
+    match = INSTRUCTION_RE.match(instr)
+    if match is None:
+        return instruction_parse_fsm(instr)
+
+    name, optype, argstr = match.groups()
+    args = []
+    for arg_name, arg_target, arg_attr, arg_float, arg_array in \
+                                            ARGUMENT_RE.findall(argstr):
+        if arg_target:
+            args.append((arg_name, arg_target, arg_attr))
+        elif arg_float:
+            args.append((arg_name, float(arg_float)))
+        else:
+            args.append((arg_name,
+                            [float(f) for f in FLOAT_RE.findall(arg_array)]))
+    return optype, name, args
+
+def instruction_parse_fsm(instr):
+    """Parse an instruction with the state machine, one character at a time
+
     .. seealso::
         :ref:`parsing_state_machine` for details on the parsing process
     """
@@ -131,6 +202,7 @@ def instruction_parse(instr):
     arg_target = ''
     arg_attr = ''
     arg_float = ''
+    arg_array = []
 
     for i, c in enumerate(instr):
         if state == START:
@@ -201,6 +273,8 @@ def instruction_parse(instr):
             elif re.match(r'[0-9]', c):
                 arg_float += c
                 state = ARGS_FLOAT
+            elif c == '[':
+                state = ARRAY
             else:
                 pos = '%s^' % ('-' * i)
                 err = 'at char %i: expecting "$" or a literal value' % i
@@ -293,6 +367,82 @@ def instruction_parse(instr):
                 pos = '%s^' % ('-' * i)
                 err = 'at char %i: expecting a digit, "," or ")"' % i
                 raise ParserSyntaxError('\n%s\n%s\n%s' % (instr, pos, err))
+        elif state == ARRAY:
+            if re.match(r'\s', c):
+                pass    # ignore whitespace
+            elif re.match(r'[0-9]', c):
+                arg_float += c
+                state = ARRAY_FLOAT
+            elif c == ']':
+                state = ARRAY_END
+            else:
+                pos = '%s^' % ('-' * i)
+                err = 'at char %i: expecting a digit or "]"' % i
+                raise ParserSyntaxError('\n%s\n%s\n%s' % (instr, pos, err))
+        elif state == ARRAY_COMMA:
+            if re.match(r'\s', c):
+                pass    # ignore whitespace
+            elif re.match(r'[0-9]', c):
+                arg_float += c
+                state = ARRAY_FLOAT
+            else:
+                pos = '%s^' % ('-' * i)
+                err = 'at char %i: expecting a digit' % i
+                raise ParserSyntaxError('\n%s\n%s\n%s' % (instr, pos, err))
+        elif state == ARRAY_FLOAT:
+            if re.match(r'[0-9]', c):
+                arg_float += c
+            elif c == '.':
+                arg_float += c
+                state = ARRAY_DOT
+            elif c == ',':
+                arg_array.append(float(arg_float))
+                arg_float = ''
+                state = ARRAY_COMMA
+            elif c == ']':
+                arg_array.append(float(arg_float))
+                arg_float = ''
+                state = ARRAY_END
+            else:
+                pos = '%s^' % ('-' * i)
+                err = 'at char %i: expecting a digit, ".", "," or "]"' % i
+                raise ParserSyntaxError('\n%s\n%s\n%s' % (instr, pos, err))
+        elif state == ARRAY_DOT:
+            if re.match(r'[0-9]', c):
+                arg_float += c
+                state = ARRAY_DECIMAL
+            else:
+                pos = '%s^' % ('-' * i)
+                err = 'at char %i: expecting a digit' % i
+                raise ParserSyntaxError('\n%s\n%s\n%s' % (instr, pos, err))
+        elif state == ARRAY_DECIMAL:
+            if re.match(r'[0-9]', c):
+                arg_float += c
+            elif c == ',':
+                arg_array.append(float(arg_float))
+                arg_float = ''
+                state = ARRAY_COMMA
+            elif c == ']':
+                arg_array.append(float(arg_float))
+                arg_float = ''
+                state = ARRAY_END
+            else:
+                pos = '%s^' % ('-' * i)
+                err = 'at char %i: expecting a digit, "," or "]"' % i
+                raise ParserSyntaxError('\n%s\n%s\n%s' % (instr, pos, err))
+        elif state == ARRAY_END:
+            if c == ',':
+                args.append((arg_name, arg_array))
+                arg_name = ''
+                arg_array = []
+                state = ARGS_COMMA
+            elif c == ')':
+                args.append((arg_name, arg_array))
+                state = FINISH
+            else:
+                pos = '%s^' % ('-' * i)
+                err = 'at char %i: expecting "," or ")"' % i
+                raise ParserSyntaxError('\n%s\n%s\n%s' % (instr, pos, err))
         else:
             raise ParserUndefinedState(state)
 
@@ -326,6 +476,48 @@ def dvm_instruction_run(instruction, scheduler):
     dvm_scheduler_wait(scheduler)
     return retval
 
+def dvm_program_compile(program):
+    """Parse a Daffy program and return the list of parsed instructions
+
+    the program must be a sequence of lines, one instruction per line. Unlike
+    :func:`dvm_program_run` parsing stops at the first syntax error, raising
+    :exc:`ParserSyntaxError`
+    """
+    return [instruction_parse(instruction) for instruction in program]
+
+def dvm_instructions_run(instructions, scheduler):
+    """Run a list of already parsed instructions, as returned by
+    :func:`dvm_program_compile`
+    """
+    for optype, name, args in instructions:
+        dvm_scheduler_operation_add(optype, name, args, scheduler)
+    dvm_scheduler_wait(scheduler)
+    return 0
+
+def dvm_instructions_batch_run(instructions, params, scheduler):
+    """Run a list of already parsed instructions over a table of parameters,
+    and return the results
+
+    `params` maps names of `value` operations to columns of values, all of
+    the same length; the results map ``name.attr`` strings to columns of
+    output values, one for each row of `params`.
+
+    .. seealso::
+        :mod:`batch <daffy.vm.batch>` for details on batch runs
+    """
+    rows = dvm_batch_rows(params)
+    dvm_instructions_run(dvm_batch_bind(instructions, params), scheduler)
+    return dvm_batch_results(scheduler, rows)
+
+def dvm_program_batch_run(program, params, scheduler):
+    """Run a Daffy program over a table of parameters, and return the results
+
+    the program is parsed with :func:`dvm_program_compile`, then run with
+    :func:`dvm_instructions_batch_run`
+    """
+    instructions = dvm_program_compile(program)
+    return dvm_instructions_batch_run(instructions, params, scheduler)
+
 def dvm_program_run(program, scheduler):
     """Run a Daffy program
 
@@ -335,6 +527,6 @@ def dvm_program_run(program, scheduler):
     for instruction in program:
         result += instruction_schedule(instruction, scheduler)
     dvm_scheduler_wait(scheduler)
-    return result == 0 and 0 or 1
+    return result and 1 or 0
 
 
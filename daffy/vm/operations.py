@@ -20,6 +20,9 @@
 #
 """Operations module"""
 
+from threading import Lock
+from collections import OrderedDict
+
 # Exceptions
 class OperationError(Exception):
     """Operation error"""
@@ -44,10 +47,21 @@ class InputSocketType(object):
 
 
 class InputSocket(object):
+    """An input of an :class:`Operation`, connected to the output `attr` of
+    the operation `op`, or holding its own `value` if `op` is ``None``
+
+    `source` is the connected :class:`OutputSocket` itself, so that reading
+    the input doesn't need to look it up by name.
+    """
+    __slots__ = ('type', 'op', 'attr', 'source', 'name', 'value')
+
     def __init__(self, type, op, attr):
         self.type = type
         self.op = op
         self.attr = attr
+        self.source = None
+        if op is not None:
+            self.source = dvm_output_socket(op, attr)
         
         self.name = type.name
         self.value = type.default
@@ -67,6 +81,8 @@ class OutputSocketType(object):
 
 
 class OutputSocket(object):
+    __slots__ = ('type', 'name', 'value')
+
     def __init__(self, type):
         self.type = type
         
@@ -83,64 +99,245 @@ class OperationType(object):
     
     Operations must define their inputs and outputs and implement the
     :execfunc: method
+
+    Operations whose outputs only depend on their inputs, and that have no
+    side effects, can be declared `pure`: the scheduler is then free to
+    evaluate them ahead of time or to reuse their results
+
+    Simple operations can also give `expr`, a dict mapping the name of each
+    output to a Python expression computing it, where ``%(name)s`` stands for
+    the value of an input (e.g. ``{'result': '%(a)s + %(b)s'}``), so that
+    they can be inlined in generated code
+
+    Pure operations that are expensive and often see the same input values
+    can set `memoize` to the number of results to keep in a
+    :class:`MemoCache`, consulted by :func:`dvm_operation_exec` before
+    calling `execfunc`
+
+    `version` is part of the digest of the results of the operations of this
+    type stored in a :class:`ResultCache
+    <daffy.vm.resultcache.ResultCache>`: it must be changed whenever
+    `execfunc` starts computing different results, so that the results
+    cached before are not used anymore
+
+    The position of each input and output in the sockets lists of an
+    :class:`Operation` is kept in the `input_index` and `output_index` dicts,
+    so that sockets are found by name without scanning the lists
     """
-    def __init__(self, name, inputs, outputs, execfunc):
+    def __init__(self, name, inputs, outputs, execfunc, pure=False,
+                                        expr=None, memoize=0, version=1):
         self.name = name
         self.inputs = inputs
         self.outputs = outputs
         self.execfunc = execfunc
+        self.pure = pure
+        self.expr = expr
+        self.memoize = memoize
+        self.version = version
+
+        self.input_index = dict((in_type.name, i)
+                                for i, in_type in enumerate(inputs))
+        self.output_index = dict((out_type.name, i)
+                                 for i, out_type in enumerate(outputs))
 
     def __repr__(self):
         return '<OperationType: %s>' % self.name
 
 
 class Operation(object):
+    __slots__ = ('typeinfo', 'name', 'waiting_on', 'blocking', 'consumers',
+                 'queued', 'finished', 'constant', 'digest', 'csekey', 'refs',
+                 'pins', 'priority', 'inputs', 'outputs')
+
     def __init__(self, type, name, inputs=[]):
         self.typeinfo = type
         self.name = name
         self.waiting_on = 0
         self.blocking = []
+        self.consumers = []
+        self.queued = False
         self.finished = False
+        self.constant = False
+        self.digest = None
+        self.csekey = None
+        self.refs = 0
+        self.pins = 1
+        self.priority = None
         
-        self.inputs = []
-        for in_type in type.inputs:
-            sock = InputSocket(in_type, None, None)
-            self.inputs.append(sock)
-            for in_name, in_op, in_attr in inputs:
-                if in_name == sock.name:
-                    sock.op = in_op
-                    sock.attr = in_attr
+        connections = {}
+        for in_name, in_op, in_attr in inputs:
+            connections[in_name] = (in_op, in_attr)
+        self.inputs = [InputSocket(in_type, *connections.get(in_type.name,
+                                                             (None, None)))
+                       for in_type in type.inputs]
         
-        self.outputs = []
-        for out_type in type.outputs:
-            self.outputs.append(OutputSocket(out_type))
+        self.outputs = [OutputSocket(out_type) for out_type in type.outputs]
         
     def __repr__(self):
         return '<Operation: %s (%s)>' % (self.name, self.typeinfo.name)
 
 
+# Memoization
+class MemoCache(object):
+    """Cache of the results of an operation type, keyed by input values
+
+    The cache holds at most `size` results and evicts the least recently used
+    one when full. Caches are shared by all threads, and each worker process
+    has its own.
+    """
+    def __init__(self, size):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        """Return the output values stored for `key`, or ``None``"""
+        with self._lock:
+            try:
+                values = self._results.pop(key)
+            except KeyError:
+                self.misses += 1
+                return None
+            self._results[key] = values     # most recently used
+            self.hits += 1
+            return values
+
+    def put(self, key, values):
+        """Store the output values for `key`"""
+        with self._lock:
+            self._results.pop(key, None)
+            self._results[key] = values
+            if len(self._results) > self.size:
+                self._results.popitem(last=False)
+
+    def __len__(self):
+        return len(self._results)
+
+    def __repr__(self):
+        return '<MemoCache: %i/%i (%i hits, %i misses)>' % (
+                            len(self._results), self.size, self.hits,
+                            self.misses)
+
+
+#: :class:`MemoCache` objects by operation type name
+memo_caches = {}
+memo_lock = Lock()
+
+def memo_cache_get(optype):
+    """Return the :class:`MemoCache` of an operation type, creating it if
+    needed
+    """
+    try:
+        return memo_caches[optype.name]
+    except KeyError:
+        with memo_lock:
+            return memo_caches.setdefault(optype.name,
+                                          MemoCache(optype.memoize))
+
+def memo_key(values):
+    """Return a hashable key for a list of input values, or ``None`` if a
+    value can't be used in a key
+
+    Arrays are keyed by their type, shape and contents.
+    """
+    key = []
+    for value in values:
+        try:
+            hash(value)
+            key.append(value)
+        except TypeError:
+            tostring = getattr(value, 'tostring', None)
+            if tostring is None:
+                return None
+            key.append((value.dtype.str, value.shape, tostring()))
+    return tuple(key)
+
+
 # API
 def dvm_input_socket(op, name):
-    for socket in op.inputs:
-        if socket.name == name:
-            return socket
-    raise InputSocketNotFoundError(name)
+    try:
+        return op.inputs[op.typeinfo.input_index[name]]
+    except KeyError:
+        raise InputSocketNotFoundError(name)
 
 def dvm_input_value_get(op, name):
-    sock = dvm_input_socket(op, name)
-    if sock.op:
-        source = dvm_output_socket(sock.op, sock.attr)
+    try:
+        sock = op.inputs[op.typeinfo.input_index[name]]
+    except KeyError:
+        raise InputSocketNotFoundError(name)
+    source = sock.source
+    if source is not None:
         return source.value
-    else:
-        return sock.typeinfo.default
+    return sock.value
+
+def dvm_input_values_get(op):
+    """Return a list of the values of all the operation inputs"""
+    return [sock.source.value if sock.source is not None else sock.value
+            for sock in op.inputs]
+
+def dvm_input_disconnect(sock):
+    """Disconnect an input socket from the output it reads, the input keeps
+    its own value"""
+    sock.op = sock.attr = sock.source = None
 
 def dvm_output_socket(op, name):
-    for socket in op.outputs:
-        if socket.name == name:
-            return socket
-    raise OutputSocketNotFoundError(name)
+    try:
+        return op.outputs[op.typeinfo.output_index[name]]
+    except KeyError:
+        raise OutputSocketNotFoundError(name)
+
+def dvm_output_values_set(op, values):
+    """Set the values of all the operation outputs from a list"""
+    for sock, value in zip(op.outputs, values):
+        sock.value = value
 
 def dvm_operation_exec(op):
-    """Run the operation `execfunc`"""
-    op.typeinfo.execfunc(op)
+    """Run the operation `execfunc`
+
+    If the operation type is memoized, the output values are taken from its
+    :class:`MemoCache` when the same input values have been seen before
+    """
+    optype = op.typeinfo
+    if not optype.memoize:
+        optype.execfunc(op)
+        return
+
+    key = memo_key(dvm_input_values_get(op))
+    if key is None:
+        optype.execfunc(op)
+        return
+    cache = memo_cache_get(optype)
+    values = cache.get(key)
+    if values is None:
+        optype.execfunc(op)
+        cache.put(key, [sock.value for sock in op.outputs])
+    else:
+        dvm_output_values_set(op, values)
+
+def dvm_operation_memo_stats():
+    """Return a dict mapping the names of memoized operation types to their
+    ``(hits, misses)`` counters
+    """
+    return dict((name, (cache.hits, cache.misses))
+                for name, cache in memo_caches.items())
+
+def dvm_operation_memo_clear():
+    """Empty the caches of all memoized operation types"""
+    with memo_lock:
+        memo_caches.clear()
+
+def dvm_operation_exec_values(type, values):
+    """Run the `execfunc` of an :class:`OperationType` on a list of input
+    values, and return the list of output values
+
+    The operation is executed on a detached :class:`Operation` object, with
+    no connected inputs, so it doesn't need access to any other operation.
+    """
+    op = Operation(type, type.name)
+    for sock, value in zip(op.inputs, values):
+        sock.value = value
+    dvm_operation_exec(op)
+    return [sock.value for sock in op.outputs]
 
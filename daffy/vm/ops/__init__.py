@@ -1,3 +1,4 @@
 import value
-from value import dvm_value_create
+from value import dvm_value_create, dvm_value_is_literal, dvm_value_set
 import add, sub, mul, div, printval
+import arange, linspace
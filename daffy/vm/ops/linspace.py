@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Daffy.
+#
+# Daffy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Daffy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Daffy.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Original Copyright (c) 2010, Lorenzo Pierfederici <lpierfederici@gmail.com>
+# Contributor(s): 
+#
+"""`linspace` operation
+
+The `linspace` operation creates an array of `num` evenly spaced values from
+`start` to `stop`, both included. It is only available if NumPy is installed.
+Results are memoized, so operations with the same inputs share the same
+array.
+
+Inputs
+------
+start : value
+    the first value
+stop : value
+    the last value
+num : value
+    the number of values
+
+Outputs
+-------
+result : value
+    the array of values
+"""
+
+from daffy.vm.operations import OperationType, InputSocketType, OutputSocketType
+from daffy.vm.operations import dvm_input_value_get, dvm_output_socket
+from daffy.vm.optypes import dvm_operation_type_register
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# inputs and outputs
+inputs = [
+    InputSocketType('start', 0.0),
+    InputSocketType('stop', 1.0),
+    InputSocketType('num', 50.0),
+]
+
+outputs = [
+    OutputSocketType('result'),
+]
+
+# execfunc
+def execfunc(self):
+    start = dvm_input_value_get(self, 'start')
+    stop = dvm_input_value_get(self, 'stop')
+    num = dvm_input_value_get(self, 'num')
+    out_result = dvm_output_socket(self, 'result')
+
+    out_result.value = numpy.linspace(start, stop, int(num))
+
+# operation type definition
+op = OperationType(
+    name='linspace',
+    inputs=inputs,
+    outputs=outputs,
+    execfunc=execfunc,
+    pure=True,
+    memoize=32
+)
+
+# register the operation
+if numpy is not None:
+    dvm_operation_type_register(op)
@@ -21,6 +21,8 @@
 """`mul` operation
 
 The `mul` operation multiplies two values.
+Values can be floats or NumPy arrays, arrays are combined element-wise
+(with NumPy broadcasting rules).
 
 Inputs
 ------
@@ -62,7 +64,9 @@ op = OperationType(
     name='mul',
     inputs=inputs,
     outputs=outputs,
-    execfunc=execfunc
+    execfunc=execfunc,
+    pure=True,
+    expr={'result': '%(a)s * %(b)s'}
 )
 
 # register the operation
@@ -24,6 +24,9 @@
 literal values to the operations table.
 To create a `value` operation use the function :func:`dvm_value_create`
 
+Literal values are floats or, if NumPy is available, arrays. Arrays can be
+given as lists of floats and are converted to NumPy arrays.
+
 Inputs
 ------
 `none`
@@ -38,6 +41,11 @@ from daffy.vm.operations import OperationType, InputSocketType, OutputSocketType
 from daffy.vm.operations import Operation
 from daffy.vm.optypes import dvm_operation_type_register
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 # inputs and outputs
 inputs = []
 
@@ -50,13 +58,31 @@ op = OperationType(
     name='value',
     inputs=inputs,
     outputs=outputs,
-    execfunc=None
+    execfunc=None,
+    pure=True
 )
 
+# function to check if a value can be used as a literal
+def dvm_value_is_literal(val):
+    if isinstance(val, float):
+        return True
+    if numpy is None:
+        return False
+    if isinstance(val, list):
+        return all(isinstance(v, float) for v in val)
+    return isinstance(val, numpy.ndarray)
+
+# function to set the literal of a `value` operation
+def dvm_value_set(valueop, val):
+    if isinstance(val, list):
+        val = numpy.array(val, dtype=float)
+    valueop.outputs[0].value = val
+
 # function to create a `value` operation
 def dvm_value_create(name, val):
     newval = Operation(op, name)
-    newval.outputs[0].value = val
+    dvm_value_set(newval, val)
+    newval.constant = True
     return newval
 
 # register the operation
@@ -44,6 +44,16 @@ def dvm_operation_type_find(type):
             return optype
     raise OperationTypeNotFoundError(type)
 
+def dvm_operation_type_get(type):
+    """Return `type` itself if it is already an
+    :class:`OperationType <daffy.vm.operations.OperationType>`, as in the
+    instructions built by :mod:`fusion <daffy.vm.fusion>`, or the registered
+    type called `type`
+    """
+    if isinstance(type, basestring):
+        return dvm_operation_type_find(type)
+    return type
+
 
 # Load optypes and populate the list, beware of import dependency issue
 import daffy.vm.ops
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Daffy.
+#
+# Daffy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Daffy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Daffy.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Original Copyright (c) 2010, Lorenzo Pierfederici <lpierfederici@gmail.com>
+# Contributor(s): 
+#
+"""On-disk result cache
+
+Programs that are run again and again with few changes recompute the same
+results every time. A :class:`ResultCache` stores the output values of each
+executed operation in a directory, under a digest of everything the values
+depend on, so that the following runs (of the same program, or of any other
+program sharing part of its graph) can load them instead of executing the
+operation.
+
+The digest of an operation (see :func:`dvm_result_digest`) is computed from
+the version of daffy, its type and the :attr:`version
+<daffy.vm.operations.OperationType.version>` of the type, the names of its
+inputs and, for each input, either the literal value or the digest of the
+connected operation and the name of the output it reads. The digest
+therefore covers the whole subgraph the operation depends on, literals
+included: changing a literal changes the digest of all the operations
+downstream. Only :attr:`pure <daffy.vm.operations.OperationType.pure>`
+operations reading from pure operations are cached, as the results of the
+others can change between runs. Upgrading daffy, or changing the version of
+an operation type, leaves the results cached before unused, and they are
+eventually evicted.
+
+Each result is a pickled list of output values, stored in a file named after
+the digest. The cache keeps track of the total size of its files, and when it
+goes over the limit removes the least recently used ones (files are touched
+each time they are loaded). Results are written to a temporary file and
+renamed, so several processes can share the same directory. A file that
+can't be read back, for instance because it is truncated, is a miss.
+"""
+
+import os, hashlib, tempfile, cPickle
+from threading import Lock
+from daffy import __version__
+
+#: default size limit of the cache directory, in bytes
+CACHE_SIZE = 256 * 1024 * 1024
+
+# changing the format version invalidates all the cached results
+VERSION = '1'
+
+#: extension of the files holding cached results
+SUFFIX = '.dfyr'
+
+
+class ResultCache(object):
+    """Results stored in the directory `path`, using at most `max_size`
+    bytes
+    """
+    def __init__(self, path, max_size=CACHE_SIZE):
+        self.path = path
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._index = None      # digest -> [size, last use], loaded lazily
+        self._size = 0
+        self._lock = Lock()
+
+    def _filename(self, digest):
+        return os.path.join(self.path, digest[:2], digest + SUFFIX)
+
+    def _index_load(self):
+        """Scan the directory for cached results"""
+        self._index = {}
+        self._size = 0
+        for dirpath, dirnames, filenames in os.walk(self.path):
+            for filename in filenames:
+                if not filename.endswith(SUFFIX):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(dirpath, filename))
+                except OSError:
+                    continue
+                digest = filename[:-len(SUFFIX)]
+                self._index[digest] = [stat.st_size, stat.st_mtime]
+                self._size += stat.st_size
+
+    def _evict(self):
+        """Remove the least recently used results until the cache fits in
+        :attr:`max_size`
+        """
+        if self._size <= self.max_size:
+            return
+        entries = sorted(self._index.iteritems(), key=lambda e: e[1][1])
+        for digest, (size, used) in entries:
+            if self._size <= self.max_size:
+                break
+            try:
+                os.remove(self._filename(digest))
+            except OSError:
+                pass
+            del self._index[digest]
+            self._size -= size
+
+    def load(self, digest):
+        """Return the output values stored under `digest`, or ``None``"""
+        filename = self._filename(digest)
+        try:
+            f = open(filename, 'rb')
+            try:
+                values = cPickle.load(f)
+            finally:
+                f.close()
+            os.utime(filename, None)
+        except Exception:
+            # unpickling a truncated or corrupt file can raise almost
+            # anything
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+            if self._index is not None and digest in self._index:
+                self._index[digest][1] = os.path.getmtime(filename)
+        return values
+
+    def store(self, digest, values):
+        """Store the output values of an operation under `digest`"""
+        data = cPickle.dumps(values, cPickle.HIGHEST_PROTOCOL)
+        filename = self._filename(digest)
+        dirname = os.path.dirname(filename)
+        try:
+            if not os.path.isdir(dirname):
+                os.makedirs(dirname)
+            fd, tmpname = tempfile.mkstemp(dir=dirname)
+            f = os.fdopen(fd, 'wb')
+            try:
+                f.write(data)
+            finally:
+                f.close()
+            os.rename(tmpname, filename)
+        except (IOError, OSError):
+            return      # the cache is an optimization, never fail a run
+        with self._lock:
+            if self._index is None:
+                self._index_load()
+            else:
+                size, used = self._index.get(digest, (0, 0))
+                self._index[digest] = [len(data), os.path.getmtime(filename)]
+                self._size += len(data) - size
+            self._evict()
+
+    def __repr__(self):
+        return '<ResultCache: %s (%i hits, %i misses)>' % (self.path,
+                                                    self.hits, self.misses)
+
+
+# Internal functions
+def value_digest_data(value):
+    """Return a string identifying a literal value"""
+    if isinstance(value, float):
+        return repr(value)
+    tostring = getattr(value, 'tostring', None)
+    if tostring is not None:
+        return '%s%r%s' % (value.dtype.str, value.shape, tostring())
+    return cPickle.dumps(value, cPickle.HIGHEST_PROTOCOL)
+
+
+# API
+def dvm_result_digest(op):
+    """Return the hex digest identifying the results of an operation, or
+    ``None`` if they can't be cached
+
+    The digests of the connected operations are computed first, and all of
+    them are kept in the :attr:`Operation.digest` attribute.
+    """
+    if op.digest is not None:
+        return op.digest
+    optype = op.typeinfo
+    if not optype.pure:
+        return None
+
+    data = [VERSION, __version__, optype.name, str(optype.version)]
+    if optype.name == 'value':
+        data.append(value_digest_data(op.outputs[0].value))
+    for sock in op.inputs:
+        data.append(sock.name)
+        if sock.op is None:
+            data.append(value_digest_data(sock.value))
+        else:
+            source = dvm_result_digest(sock.op)
+            if source is None:
+                return None
+            data.extend((source, sock.attr))
+
+    # prefix each item with its length, as binary data can hold anything
+    data = ''.join('%i:%s' % (len(item), item) for item in data)
+    op.digest = hashlib.sha1(data).hexdigest()
+    return op.digest
@@ -36,13 +36,59 @@ inputs have already been executed), appends it to the
 execute them in parallel (as each runnable operation reads its inputs from
 operations that have already been written to the table, there is no possible
 racing on the values) and put them in the :attr:`Scheduler.finished_queue` when
-done.
+done. The threads run until the scheduler is closed with
+:func:`dvm_scheduler_close`.
+
+How operations are executed depends on the :attr:`Scheduler.executor`:
+
+``threads``
+    :class:`Worker` threads run the operations themselves. As the threads
+    share the interpreter lock, operations doing heavy computations in Python
+    code don't run in parallel.
+``processes``
+    :class:`Worker` threads ship the input values of each operation to a pool
+    of worker processes, wait for the operation to be executed there and copy
+    the output values back to the :class:`OutputSocket` objects. Everything
+    else (queues, dependencies, the :class:`Updater` thread) works as with
+    ``threads``. The operation types and their values must be picklable.
+    The worker processes are also stopped by :func:`dvm_scheduler_close`.
+``stealing``
+    each :class:`StealingWorker` thread owns a deque of runnable operations
+    instead of sharing the :attr:`Scheduler.runnable_queue`, and there is no
+    :class:`Updater` thread: the worker that executes an operation updates
+    its dependencies itself, and pushes the ones that became runnable on its
+    own deque, so that it executes next an operation reading the values it
+    has just computed. Workers with an empty deque steal the oldest
+    operations from the other workers' deques, and sleep when all of them
+    are empty. Operations set as runnable by the thread feeding the scheduler
+    are spread over the workers in turn. This executor always uses the
+    ``worker`` :ref:`completion <completion>` mode, and ignores the
+    :attr:`Scheduler.priority` policy.
+``serial``
+    no thread is started: each operation is executed on the thread feeding
+    the scheduler as soon as it is added (as operations can only read from
+    operations already in the table, this is a topological order). This avoids
+    all the queue hand-offs, and is the fastest option for small graphs and
+    cheap operations.
+``auto``
+    starts as ``serial`` and measures each execution: as soon as an operation
+    takes longer than :data:`AUTO_COST` the :class:`Worker` and
+    :class:`Updater` threads are started and the scheduler switches to
+    ``threads`` for the following operations.
 
 The :class:`Updater` thread picks operation from
 :attr:`Scheduler.finished_queue`, notifies all operations waiting or it that
 the output vaues are ready to use decreasing their :attr:`Scheduler.waiting_on`
 counter and removing the finished operation from their
-:attr:`Operation.blocking` list
+:attr:`Operation.blocking` list. Operations whose counter drops to zero are
+appended to the :attr:`Scheduler.runnable_queue` right away, so the cost of
+finishing an operation only depends on how many operations are waiting for it,
+not on the size of the table.
+
+The :attr:`Scheduler.lock` serializes the bookkeeping of dependencies between
+the thread feeding the scheduler and the :class:`Updater` thread, so that an
+operation can't finish while a new operation is registering itself as waiting
+on it.
 
 The thread syncronization mechanism works like this::
     
@@ -74,7 +120,9 @@ The thread syncronization mechanism works like this::
                  |                               execution engine, so waits
                  |                               for it on `finished_queue`,
                  |                               notify its dependencies,
-                 |                               and refresh the scheduler.
+                 |                               and append the ones that
+                 |                               became runnable to
+                 |                               `runnable_queue`.
                  |                               Then removes a `token` from
                  |                               `waiting_counter`
                  |                                         |
@@ -82,14 +130,215 @@ The thread syncronization mechanism works like this::
                  |
                  v
     `dvm_scheduler_wait` returns
+
+.. _folding:
+
+Constant folding
+----------------
+
+`value` operations are constant, and so is any operation of a
+:attr:`pure <daffy.vm.operations.OperationType.pure>` type whose inputs are
+all connected to constant operations or to literal values. When
+:attr:`Scheduler.fold` is enabled, constant operations are executed on the
+spot by :func:`dvm_scheduler_operation_add` instead of going through the
+execution engine: they are added to the table already finished, their inputs
+are disconnected and keep a copy of the values they read, and no `value`
+operation is created for their literal arguments. As the folded operation is
+constant itself, folding cascades through chains of constant operations.
+Folded operations keep their type, so their outputs are still available
+with the same names.
+
+Folding is disabled by default. Every graph is rooted in `value`
+operations, so a program whose operations are all pure would be evaluated
+entirely by the thread feeding the scheduler, whatever the executor, and its
+values could not be changed afterwards (see :ref:`incremental updates
+<incremental>`).
+
+.. _cse:
+
+Common subexpression elimination
+--------------------------------
+
+Two operations of the same :attr:`pure <daffy.vm.operations.OperationType.pure>`
+type reading the same outputs (or the same literal values) always produce the
+same results. When :attr:`Scheduler.cse` is enabled the scheduler keeps a
+table of the pure operations it has created, keyed by their type and inputs,
+and an equivalent operation added later is not created at all: its name
+becomes an alias of the existing operation in the :attr:`Scheduler.opstable`.
+
+Merging is disabled by default. Like folding it changes what reaches the
+execution engine: a graph whose operations all read the same inputs, such as
+many operations reading a single result, would be executed as a single
+operation, whatever the executor.
+
+Results of previous runs
+------------------------
+
+A scheduler created with a :attr:`Scheduler.cache` looks up the results of
+each operation in it before executing the operation, and stores them there
+afterwards (see :mod:`resultcache <daffy.vm.resultcache>`).
+
+.. _incremental:
+
+Incremental updates
+-------------------
+
+Each operation also keeps the list of its :attr:`Operation.consumers`, the
+operations reading its outputs, which unlike :attr:`Operation.blocking` is
+never emptied. Once a graph has been executed, the literal of a `value`
+operation can be changed with :func:`dvm_scheduler_value_set`: the operations
+reachable from it through their consumers are marked as not finished and
+executed again, in dependency order, while all the others keep the output
+values they already computed. This needs :attr:`Scheduler.fold` to be
+disabled, as folded operations don't read their inputs from other operations
+anymore, and operations not to be reclaimed.
+
+.. _reclaim:
+
+Reclaiming operations
+---------------------
+
+By default every operation stays in the table, with its output values, until
+the scheduler is discarded. When a long (or endless) stream of instructions
+is fed to the scheduler, the table and the memory it uses would grow without
+bounds: the :attr:`Scheduler.reclaim` policy says which operations can be
+removed from the table once they are not addressable anymore.
+
+``'keep'``
+    keep all operations, the default.
+``'anonymous'``
+    remove the `value` operations created by the scheduler for the literal
+    arguments of an operation: nothing else can refer to them.
+an integer `N`
+    also remove named operations that are not among the last `N` names added
+    or referenced by the instructions: later instructions can only refer to
+    operations used recently, such as the parameters read by every
+    instruction of a stream.
+
+Each operation counts its :attr:`Operation.refs`, the connected inputs of
+operations that haven't finished yet, and :attr:`Operation.pins`, the reasons
+it must stay addressable (being added, and each of its entries in the window
+of the last `N` names added or referenced). An operation is removed from the
+table (:func:`op_unpin`) when its last pin is dropped, and its output values
+and connections are released (:func:`op_release`) as soon as it has finished
+and its last reader has finished too. Readers finishing after an operation has
+left the table keep a copy of the values they read instead of their
+connection to it, so memory only depends on the window, on the operations
+still waiting to be executed and, with ``'anonymous'``, on the named
+operations.
+
+.. _completion:
+
+Completion
+----------
+
+With the default :attr:`Scheduler.completion` mode, ``'updater'``, every
+executed operation makes two more queue hand-offs, to the
+:attr:`Scheduler.finished_queue` and back from the ``waiting_counter``, and
+all the dependencies are updated by the single :class:`Updater` thread, that
+can become the bottleneck when many workers execute short operations. With
+``'worker'`` there is no :class:`Updater` thread: the worker that has
+executed an operation updates its dependencies itself and queues the ones
+that became runnable (:func:`op_complete`), and the operations in the
+execution engine are counted by an integer instead of the ``waiting_counter``
+queue. In both modes the :attr:`Operation.waiting_on` counters are only
+changed holding the :attr:`Scheduler.lock`, also taken by
+:func:`dvm_scheduler_operation_add` while it sets the requirements of a new
+operation, so a dependency can't be released twice or missed.
+
+.. _handoff:
+
+Batched hand-offs
+-----------------
+
+Each :meth:`put <Queue.Queue.put>`, :meth:`get <Queue.Queue.get>` and
+:meth:`task_done <Queue.Queue.task_done>` on the scheduler queues takes a lock
+and notifies a condition, several times for each operation. With a
+:attr:`Scheduler.handoff` greater than 1, operations are moved in groups
+instead, through the :meth:`BatchQueue.put_many` and
+:meth:`BatchQueue.get_many` methods of the queues:
+
+* the operations set as runnable, and the ``waiting_counter`` tokens of the
+  operations added, are buffered holding the :attr:`Scheduler.lock` and
+  queued together by :func:`op_handoff` once `handoff` runnable operations
+  have accumulated, when the :class:`Updater` thread or a worker has
+  finished updating dependencies, and in :func:`dvm_scheduler_wait`;
+* each :class:`Worker` takes up to `handoff` operations at a time from the
+  :attr:`Scheduler.runnable_queue`, but no more than its share of the
+  queued ones, so that the other workers are not left idle, executes them
+  and passes them on together;
+* the :class:`Updater` thread takes all the operations in the
+  :attr:`Scheduler.finished_queue`, and as many tokens, at once.
+
+Operations added to the scheduler can wait in the buffer until
+:func:`dvm_scheduler_wait` is called, so programs fed as a stream should keep
+the default `handoff` of 1.
+
+.. _priority:
+
+Priority scheduling
+-------------------
+
+By default the :attr:`Scheduler.runnable_queue` is FIFO: operations are
+executed in the order they become runnable. On a graph with a long chain of
+dependent operations and many short independent ones, each step of the chain
+waits behind all the independent operations queued before it, and the chain
+finishes long after the rest. The :attr:`Scheduler.priority` policy can give
+precedence to the operations with more work depending on them:
+
+``'fifo'``
+    the order in which operations become runnable, the default.
+``'depth'``
+    the number of operations on the longest path from the operation to the
+    end of the graph.
+``'cost'``
+    the estimated time of the longest path from the operation to the end of
+    the graph, adding up the :attr:`Scheduler.costs` of each operation type
+    (e.g. the mean execution times measured by :mod:`stats
+    <daffy.vm.stats>` on a previous run); types without an estimate cost the
+    mean of the others.
+
+The longest paths are only known once the graph is complete, so with a
+policy other than ``fifo`` the runnable operations are not queued as they
+are added but held until :func:`dvm_scheduler_wait`, which ranks all the
+operations that haven't finished yet, including the held ones a window
+:attr:`Scheduler.reclaim` has already removed from the table
+(:func:`op_priorities_set`), and queues them in a :class:`RunnableQueue`;
+operations becoming runnable afterwards are queued with the priority they
+were given then, and those never ranked with the lowest. Programs fed as an
+endless stream should use ``fifo``, as nothing is executed before the end of
+the stream. The ``serial`` executor runs each operation as soon as it is
+added and ignores the policy.
+
+.. _measuring:
+
+Measuring execution
+-------------------
+
+A scheduler can be given a :attr:`Scheduler.trace` recording when each
+operation is queued, executed and updated (see :mod:`trace
+<daffy.vm.trace>`), and :attr:`Scheduler.stats` aggregating the same times by
+operation type (see :mod:`stats <daffy.vm.stats>` and
+:func:`dvm_scheduler_stats`). When either is set, operations are executed by
+:func:`op_execute_measured` and updated by :func:`op_set_as_finished_measured`;
+otherwise the only cost is checking that both are ``None``.
 """
 
-from threading import Thread, currentThread
+from threading import Thread, Lock, Condition, currentThread
 from Queue import Queue
-from daffy.vm.optypes import dvm_operation_type_find
+from heapq import heappush, heappop
+from itertools import count
+from collections import OrderedDict, deque
+from multiprocessing import Pool
+from daffy.vm.optypes import dvm_operation_type_get
 from daffy.vm.operations import Operation, dvm_operation_exec
-from daffy.vm.ops import dvm_value_create
-from time import sleep
+from daffy.vm.operations import dvm_input_values_get, dvm_output_values_set
+from daffy.vm.operations import dvm_operation_exec_values
+from daffy.vm.operations import dvm_input_disconnect
+from daffy.vm.ops import dvm_value_create, dvm_value_is_literal, dvm_value_set
+from daffy.vm.resultcache import dvm_result_digest
+from daffy.vm.stats import dvm_stats_report
+from time import sleep, time
 
 import sys, logging
 logging.basicConfig(stream=sys.stderr, format='%(message)s')
@@ -113,12 +362,80 @@ class WrongArgumentError(Exception):
     """Wrong argument in operation creation"""
 
 
-#: number of :class:`Worker` threads
+class ExecutorNotFoundError(Exception):
+    """The requested executor is not supported by the :class:`Scheduler`"""
+
+
+class ConstantOperationError(Exception):
+    """The operation may have been folded into other operations, or the
+    operations depending on it reclaimed, and can't be changed"""
+
+
+class ReclaimPolicyError(Exception):
+    """The requested reclaim policy is not supported by the :class:`Scheduler`
+    """
+
+
+class CompletionModeError(Exception):
+    """The requested completion mode is not supported by the
+    :class:`Scheduler`"""
+
+
+class PriorityPolicyError(Exception):
+    """The requested priority policy is not supported by the
+    :class:`Scheduler`"""
+
+
+#: default number of :class:`Worker` threads (and worker processes)
 WORKERS = 4
 
+# executors
+THREADS   = 'threads'
+PROCESSES = 'processes'
+STEALING  = 'stealing'
+SERIAL    = 'serial'
+AUTO      = 'auto'
+
+#: executors supported by the :class:`Scheduler`
+EXECUTORS = (AUTO, SERIAL, THREADS, PROCESSES, STEALING)
+
+#: execution time (in seconds) of a single operation above which the ``auto``
+#: executor switches from ``serial`` to ``threads``
+AUTO_COST = 0.001
+
+# reclaim policies, see :attr:`Scheduler.reclaim`
+KEEP      = 'keep'
+ANONYMOUS = 'anonymous'
+
+# priority policies
+FIFO  = 'fifo'
+DEPTH = 'depth'
+COST  = 'cost'
+
+#: priority policies supported by the :class:`Scheduler`, see
+#: :attr:`Scheduler.priority`
+PRIORITIES = (FIFO, DEPTH, COST)
+
+# completion modes
+UPDATER = 'updater'
+WORKER  = 'worker'
+
+#: completion modes supported by the :class:`Scheduler`, see
+#: :attr:`Scheduler.completion`
+COMPLETIONS = (UPDATER, WORKER)
+
 # an empty object used to count operations in the ``waiting_counter`` queue
 TOKEN = None
 
+
+class Stop(object):
+    """The type of :data:`STOP`, queued like an :class:`Operation`"""
+    priority = None
+
+#: put in the queues of a scheduler to stop its threads, see
+#: :func:`dvm_scheduler_close`
+STOP = Stop()
+
 # scheduler phases constants used in logging
 SPACER = '..'
 ADDING    = 0
@@ -138,13 +455,136 @@ class Worker(Thread):
         self.scheduler = scheduler
 
     def run(self):
+        sched = self.scheduler
+        if sched.stats is not None:
+            sched.stats.worker(self.name)
+        if sched.handoff > 1:
+            return self.run_batched()
+        while True:
+            op = sched.runnable_queue.get()
+            if op is STOP:
+                # left in the queue for the other workers
+                sched.runnable_queue.put(STOP)
+                sched.runnable_queue.task_done()
+                return
+            log.debug('< %15s > %sexecuting in thread %s', op.name,
+                                    SPACER * EXECUTING, currentThread().name)
+            if sched.trace is None and sched.stats is None:
+                op_execute(op, sched)
+            else:
+                op_execute_measured(op, sched)
+            if sched.completion == WORKER:
+                op_complete((op, ), sched)
+            else:
+                sched.finished_queue.put(op)
+            sched.runnable_queue.task_done()
+
+    def run_batched(self):
+        """Take up to :attr:`Scheduler.handoff` operations at a time from the
+        :attr:`Scheduler.runnable_queue` (but no more than a fair share of the
+        queued ones), execute them and hand them over all together
+        """
+        sched = self.scheduler
+        while True:
+            ops = sched.runnable_queue.get_many(sched.handoff, sched.workers)
+            if STOP in ops:
+                sched.runnable_queue.put(STOP)
+                sched.runnable_queue.task_done(len(ops))
+                return
+            for op in ops:
+                log.debug('< %15s > %sexecuting in thread %s', op.name,
+                                            SPACER * EXECUTING, self.name)
+                if sched.trace is None and sched.stats is None:
+                    op_execute(op, sched)
+                else:
+                    op_execute_measured(op, sched)
+            if sched.completion == WORKER:
+                op_complete(ops, sched)
+            else:
+                sched.finished_queue.put_many(ops)
+            sched.runnable_queue.task_done(len(ops))
+
+
+class StealingWorker(Thread):
+    """A worker thread of the ``stealing`` executor, executing operations
+    from its own :attr:`deque` or, when that is empty, from the deques of the
+    other workers, and updating their dependencies itself
+    """
+    def __init__(self, scheduler, index):
+        Thread.__init__(self)
+
+        #: the :class:`Scheduler` object this thread belongs to
+        self.scheduler = scheduler
+
+        #: position of this thread in the scheduler's workers list
+        self.index = index
+
+        #: runnable operations owned by this thread; the owner pops the most
+        #: recent ones from the right, other threads steal the oldest ones
+        #: from the left
+        self.deque = deque()
+
+    def steal(self):
+        """Return an operation from this thread's deque or from another
+        worker's, or ``None`` if there are none
+        """
+        # deques are checked before popping, as raising IndexError on each
+        # empty one would make idle workers slow to scan them all; another
+        # thread can still empty a deque in between
+        if self.deque:
+            try:
+                return self.deque.pop()
+            except IndexError:
+                pass
+        workers = self.scheduler._workers
+        count = len(workers)
+        for i in xrange(self.index + 1, self.index + count):
+            victim = workers[i % count].deque
+            if victim:
+                try:
+                    return victim.popleft()
+                except IndexError:
+                    pass
+        return None
+
+    def next(self):
+        """Return the next operation to execute, waiting for one if there are
+        none
+        """
+        op = self.steal()
+        if op is not None:
+            return op
+        sched = self.scheduler
+        with sched._idle:
+            # operations are pushed before checking for sleepers, so an
+            # operation pushed after this point wakes this thread up
+            sched._sleepers += 1
+            op = self.steal()
+            while op is None:
+                sched._idle.wait()
+                op = self.steal()
+            sched._sleepers -= 1
+        return op
+
+    def run(self):
+        sched = self.scheduler
+        if sched.stats is not None:
+            sched.stats.worker(self.name)
         while True:
-            op = self.scheduler.runnable_queue.get()
-            log.debug('< %15s > %sexecuting in thread %s' % (
-                            op.name, SPACER * EXECUTING, currentThread().name))
-            dvm_operation_exec(op)
-            self.scheduler.finished_queue.put(op)
-            self.scheduler.runnable_queue.task_done()
+            op = self.next()
+            if op is STOP:
+                # left on this thread's deque for the other workers to steal
+                self.deque.append(STOP)
+                with sched._idle:
+                    sched._idle.notify_all()
+                return
+            log.debug('< %15s > %sexecuting in thread %s', op.name,
+                                            SPACER * EXECUTING, self.name)
+            if sched.trace is None and sched.stats is None:
+                op_execute(op, sched)
+            else:
+                op_execute_measured(op, sched)
+            op_complete((op, ), sched)
 
 
 class Updater(Thread):
@@ -159,14 +599,167 @@ class Updater(Thread):
 
     def run(self):
         sched = self.scheduler
+        if sched.handoff > 1:
+            return self.run_batched()
         while True:
-            sched.waiting_counter.get()
-            op = sched.finished_queue.get(timeout=5)
-            op_set_as_finished(op, sched)
-            dvm_scheduler_refresh(sched)
+            if sched.waiting_counter.get() is STOP:
+                return
+            op = sched.finished_queue.get()
+            if op is STOP:
+                return
+            with sched.lock:
+                if sched.trace is None and sched.stats is None:
+                    op_set_as_finished(op, sched)
+                else:
+                    op_set_as_finished_measured(op, sched)
             sched.finished_queue.task_done()
             sched.waiting_counter.task_done()
 
+    def run_batched(self):
+        """Drain all the operations in the :attr:`Scheduler.finished_queue`
+        at once, update their dependencies holding the lock once and queue
+        all the operations that became runnable together
+        """
+        sched = self.scheduler
+        while True:
+            ops = sched.finished_queue.get_many()
+            if STOP in ops:
+                return
+            # tokens are queued before the operations they count
+            sched.waiting_counter.get_many(len(ops))
+            with sched.lock:
+                for op in ops:
+                    if sched.trace is None and sched.stats is None:
+                        op_set_as_finished(op, sched)
+                    else:
+                        op_set_as_finished_measured(op, sched)
+                op_handoff(sched)
+            sched.finished_queue.task_done(len(ops))
+            sched.waiting_counter.task_done(len(ops))
+
+
+class BatchQueue(Queue):
+    """A :class:`Queue.Queue` that can also move several items at once,
+    taking its lock and notifying the waiting threads only once
+    """
+    def put_many(self, items):
+        """Put all the `items` in the queue"""
+        if not items:
+            return
+        with self.mutex:
+            for item in items:
+                self._put(item)
+            self.unfinished_tasks += len(items)
+            self.not_empty.notify(len(items))
+
+    def get_many(self, max_items=None, share=1):
+        """Wait for the queue not to be empty and remove and return a list of
+        up to `max_items` items (all the items if ``None``), and no more than
+        the number of items in the queue divided by `share`
+        """
+        with self.not_empty:
+            while not self._qsize():
+                self.not_empty.wait()
+            size = max(self._qsize() // share, 1)
+            if max_items is not None and max_items < size:
+                size = max_items
+            items = [self._get() for i in xrange(size)]
+            self.not_full.notify()
+            return items
+
+    def task_done(self, count=1):
+        """Indicate that `count` items taken from the queue have been
+        processed"""
+        with self.all_tasks_done:
+            unfinished = self.unfinished_tasks - count
+            if unfinished <= 0:
+                if unfinished < 0:
+                    raise ValueError('task_done() called too many times')
+                self.all_tasks_done.notify_all()
+            self.unfinished_tasks = unfinished
+
+
+class RunnableQueue(BatchQueue):
+    """A queue of runnable operations that returns first the ones with the
+    highest :attr:`Operation.priority`, and operations with the same priority
+    in the order they were put
+    """
+    def _init(self, maxsize):
+        self.queue = []
+        self._count = count()
+
+    def _qsize(self, len=len):
+        return len(self.queue)
+
+    def _put(self, op):
+        heappush(self.queue, (-(op.priority or 0), next(self._count), op))
+
+    def _get(self):
+        return heappop(self.queue)[2]
+
+
+# Operations table
+class OpsTable(object):
+    """The table of all operations fed to a :class:`Scheduler`
+
+    Operations are kept in insertion order and indexed by name, so that
+    lookups by name and membership tests don't need to scan the whole table.
+    Membership is tested by identity: an :class:`Operation` is in the table
+    only if it is the very object registered under its name.
+
+    An operation can also be registered under other names with
+    :meth:`alias`; iterating over the table yields each operation once.
+    """
+    def __init__(self):
+        self._ops = OrderedDict()
+        self._aliases = 0
+        self._alias_names = {}
+
+    def append(self, op):
+        """Add an operation at the end of the table"""
+        self._ops[op.name] = op
+
+    def alias(self, name, op):
+        """Register an operation already in the table under another name"""
+        self._ops[name] = op
+        self._aliases += 1
+        self._alias_names.setdefault(op.name, []).append(name)
+
+    def remove(self, op):
+        """Remove an operation from the table, with all its aliases"""
+        del self._ops[op.name]
+        for name in self._alias_names.pop(op.name, ()):
+            del self._ops[name]
+            self._aliases -= 1
+
+    def items(self):
+        """Iterate over all ``(name, operation)`` pairs, including aliases"""
+        return self._ops.iteritems()
+
+    def __reversed__(self):
+        ops = self._ops
+        return (ops[name] for name in reversed(ops) if ops[name].name == name)
+
+    def get(self, name, default=None):
+        """Return the operation registered as `name`, or `default`"""
+        return self._ops.get(name, default)
+
+    def has_name(self, name):
+        """Check if `name` is registered in the table"""
+        return name in self._ops
+
+    def __contains__(self, op):
+        return self._ops.get(op.name) is op
+
+    def __iter__(self):
+        return (op for name, op in self._ops.iteritems() if op.name == name)
+
+    def __len__(self):
+        return len(self._ops) - self._aliases
+
+    def __repr__(self):
+        return '<OpsTable: %i operations>' % len(self._ops)
+
 
 # Scheduler
 class Scheduler(object):
@@ -176,31 +769,169 @@ class Scheduler(object):
     .. seealso::
         :mod:`scheduler` for a detailed description
     """
-    def __init__(self, loglevel=logging.NOTSET):
+    def __init__(self, loglevel=logging.NOTSET, executor=AUTO,
+                        workers=WORKERS, fold=False, cse=False, cache=None,
+                        reclaim=KEEP, trace=None, stats=None, priority=FIFO,
+                        costs=None, completion=UPDATER, handoff=1):
         log.level = loglevel
+
+        if executor not in EXECUTORS:
+            raise ExecutorNotFoundError(executor)
+        if reclaim not in (KEEP, ANONYMOUS) and not (
+                            isinstance(reclaim, int) and reclaim >= 0):
+            raise ReclaimPolicyError(reclaim)
+        if priority not in PRIORITIES:
+            raise PriorityPolicyError(priority)
+        if completion not in COMPLETIONS:
+            raise CompletionModeError(completion)
+
+        #: how operations are executed, one of :data:`EXECUTORS`; the ``auto``
+        #: executor is replaced by ``serial`` or ``threads`` as appropriate
+        self.executor = executor
+
+        #: ``True`` if the executor is chosen by the scheduler
+        self.auto = executor == AUTO
+        if self.auto:
+            self.executor = SERIAL
+
+        #: number of :class:`Worker` threads (and of worker processes for the
+        #: ``processes`` executor)
+        self.workers = workers
+
+        #: if ``True`` operations with constant inputs are evaluated when they
+        #: are added to the table (see :ref:`constant folding <folding>`);
+        #: disabled by default
+        self.fold = fold
+
+        #: if ``True`` equivalent operations are created only once (see
+        #: :ref:`common subexpression elimination <cse>`); disabled by
+        #: default
+        self.cse = cse
+
+        #: pure operations in the table, keyed by :func:`op_cse_key`
+        self.csetable = {}
+
+        #: :class:`ResultCache <daffy.vm.resultcache.ResultCache>` used to
+        #: load the results of operations executed by previous runs, or
+        #: ``None``
+        self.cache = cache
+
+        #: which finished operations are removed from the table (see
+        #: :ref:`reclaiming operations <reclaim>`): ``'keep'``,
+        #: ``'anonymous'`` or the number of named operations that stay
+        #: addressable
+        self.reclaim = reclaim
+
+        #: number of operations whose output values have been released
+        self.reclaimed = 0
+
+        #: :class:`Tracer <daffy.vm.trace.Tracer>` recording the execution of
+        #: operations, or ``None``
+        self.trace = trace
+
+        #: :class:`Stats <daffy.vm.stats.Stats>` collecting execution
+        #: statistics, or ``None``
+        self.stats = stats
+
+        #: order in which runnable operations are executed by the
+        #: :class:`Worker` threads, one of :data:`PRIORITIES` (see
+        #: :ref:`priority scheduling <priority>`)
+        self.priority = priority
+
+        #: estimated execution time of the operations of each type, in
+        #: seconds, by operation type name, for the ``cost`` priority policy
+        self.costs = costs or {}
+
+        # runnable operations waiting to be ranked, when not using FIFO
+        self._deferred = []
+
+        #: which thread updates the dependencies of an operation executed by
+        #: a worker (see :ref:`completion <completion>`): ``'updater'`` or
+        #: ``'worker'``; the ``stealing`` executor always uses ``'worker'``
+        self.completion = executor == STEALING and WORKER or completion
+
+        #: maximum number of operations moved at a time between the threads
+        #: (see :ref:`batched hand-offs <handoff>`); ``1`` moves them one by
+        #: one
+        self.handoff = max(handoff, 1)
+
+        # runnable operations and tokens waiting to be handed off together,
+        # when handoff is greater than 1
+        self._batch = []
+        self._tokens = 0
+
+        # the named operations that are still addressable, for the window
+        # reclaim policy
+        self._window = deque()
         
-        #: this is the :class:`Scheduler`'s main data structure, a list of all
-        #: operations fed to it
-        self.opstable = []
+        #: this is the :class:`Scheduler`'s main data structure, an
+        #: :class:`OpsTable` of all operations fed to it
+        self.opstable = OpsTable()
         
+        #: lock protecting the :attr:`Operation.waiting_on` counters and
+        #: :attr:`Operation.blocking` lists of the operations in the table
+        self.lock = Lock()
+
         #: counter used by :func:`dvm_scheduler_wait` for thread syncronization
-        self.waiting_counter = Queue()
+        self.waiting_counter = BatchQueue()
         
         #: queue of operations that can be executed immediatly, as all their
         #: requirements are ready
-        self.runnable_queue = Queue()
+        self.runnable_queue = (priority == FIFO and BatchQueue() or
+                                                            RunnableQueue())
         
         #: queue of operations already executed by a :class:`Worker` thread and
         #: ready to be updated by the :class:`Updater` thread
-        self.finished_queue = Queue()
+        self.finished_queue = BatchQueue()
+
+        # operations waiting to be executed inline by the serial executor
+        self._serial_queue = deque()
+
+        # operations in the execution engine when they are completed by the
+        # workers, which count them instead of using the waiting_counter
+        # queue, and the condition notified when they have all finished
+        self._pending = 0
+        self._done = Condition(self.lock)
+
+        # idle stealing workers wait on this condition
+        self._idle = Condition()
+        self._sleepers = 0
 
-        self._updater = Updater(self)
-        self._updater.daemon = True
-        self._updater.start()
+        # the stealing worker receiving the next operation set as runnable
+        # by the thread feeding the scheduler
+        self._next = 0
 
+        # the pool must be created before starting any thread, as its
+        # processes are forked from this one
+        self._pool = None
+        if executor == PROCESSES:
+            self._pool = Pool(workers)
+
+        self._updater = None
         self._workers = []
-        for i in range(WORKERS):
+        if self.executor != SERIAL:
+            self._start_threads()
+
+    def _start_threads(self):
+        if self.executor == STEALING:
+            for i in range(self.workers):
+                w = StealingWorker(self, i)
+                w.name = 'Worker-%i' % i
+                w.daemon = True
+                self._workers.append(w)
+            for w in self._workers:
+                w.start()
+            return
+
+        if self.completion == UPDATER:
+            self._updater = Updater(self)
+            self._updater.name = 'Updater'
+            self._updater.daemon = True
+            self._updater.start()
+
+        for i in range(self.workers):
              w = Worker(self)
+             w.name = 'Worker-%i' % i
              w.daemon = True
              self._workers.append(w)
              w.start()
@@ -209,17 +940,14 @@ class Scheduler(object):
 # internal use
 def op_name_exists(name, scheduler):
     """Check if a name is already used in the :attr:`Scheduler.opstable`"""
-    for op in scheduler.opstable:
-        if op.name == name:
-            return True
-    return False
+    return scheduler.opstable.has_name(name)
 
 def op_get(name, scheduler):
     """Find and operation by name in the :attr:`Scheduler.opstable`"""
-    for op in scheduler.opstable:
-        if op.name == name:
-            return op
-    raise OperationNotFoundError(name)
+    op = scheduler.opstable.get(name)
+    if op is None:
+        raise OperationNotFoundError(name)
+    return op
 
 def op_is_runnable(op, scheduler):
     """Check if an :class:`Operation` object is runnable verifing its counter of
@@ -228,12 +956,43 @@ def op_is_runnable(op, scheduler):
 
 def op_append_to_table(op, scheduler, waiting=True):
     """Append an :class:`Operation` object to the :attr:`Scheduler.opstable`"""
-    log.debug('< %15s > %sadding to opstable' % (op.name, SPACER * ADDING))
+    log.debug('< %15s > %sadding to opstable', op.name, SPACER * ADDING)
     scheduler.opstable.append(op)
-    if waiting:
-        scheduler.waiting_counter.put(TOKEN)
-    else:
+    if not waiting:
         op_set_as_finished(op, scheduler)
+    else:
+        op_tokens_put(1, scheduler)
+
+def op_tokens_put(count, scheduler):
+    """Count `count` operations entering the execution engine, that
+    :func:`dvm_scheduler_wait` waits for; must be called holding the
+    :attr:`Scheduler.lock`
+    """
+    if scheduler.executor == SERIAL:
+        # the serial executor runs the operation before returning to the
+        # caller, so there is nothing to wait for
+        return
+    if scheduler.completion == WORKER:
+        scheduler._pending += count
+    elif scheduler.handoff > 1:
+        # queued by op_handoff, before the operations they count
+        scheduler._tokens += count
+    else:
+        for i in xrange(count):
+            scheduler.waiting_counter.put(TOKEN)
+
+def op_handoff(scheduler):
+    """Queue together the tokens and the runnable operations buffered when
+    :attr:`Scheduler.handoff` is greater than 1; must be called holding the
+    :attr:`Scheduler.lock`
+    """
+    if scheduler._tokens:
+        scheduler.waiting_counter.put_many([TOKEN] * scheduler._tokens)
+        scheduler._tokens = 0
+    if scheduler._batch:
+        batch = scheduler._batch
+        scheduler._batch = []
+        scheduler.runnable_queue.put_many(batch)
 
 def op_requirements_set(op, scheduler):
     """Loop over an :class:`Operation` object inputs and set its requirements"""
@@ -241,10 +1000,15 @@ def op_requirements_set(op, scheduler):
     for insock in op.inputs:
         if insock.op and insock.op not in scheduler.opstable:
             raise DependencyError
+        if insock.op:
+            insock.op.refs += 1
+            if scheduler.reclaim == KEEP:
+                insock.op.consumers.append(op)
         if insock.op and not insock.op.finished:
+            # one entry for each connected input, so that an operation reading
+            # two outputs of the same operation is released only once
             waiting += 1
-            if op not in insock.op.blocking:
-                insock.op.blocking.append(op)
+            insock.op.blocking.append(op)
     op.waiting_on = waiting
 
 def op_set_as_runnable(op, scheduler):
@@ -252,21 +1016,418 @@ def op_set_as_runnable(op, scheduler):
     :class:`Worker` threads will pick operations from this queue and execute
     them
     """
-    log.debug('< %15s > %ssetting as runnable' % (op.name, SPACER * RUNNING))
-    scheduler.runnable_queue.put(op)
+    log.debug('< %15s > %ssetting as runnable', op.name, SPACER * RUNNING)
+    op.queued = True
+    if scheduler.trace is not None:
+        scheduler.trace.enqueued(op, time())
+    if scheduler.stats is not None:
+        scheduler.stats.enqueued(op, time())
+    if scheduler.executor == SERIAL:
+        scheduler._serial_queue.append(op)
+    elif scheduler.executor == STEALING:
+        op_push(op, scheduler)
+    elif op.priority is None and scheduler.priority != FIFO:
+        # ranked and dispatched by dvm_scheduler_wait
+        scheduler._deferred.append(op)
+    elif scheduler.handoff > 1:
+        # queued by op_handoff
+        scheduler._batch.append(op)
+    else:
+        scheduler.runnable_queue.put(op)
+
+def op_push(op, scheduler):
+    """Push a runnable operation on the deque of a :class:`StealingWorker`:
+    the calling thread's own, if it is a worker that has just made the
+    operation runnable, or the next one in turn otherwise; then wake up an
+    idle worker, if any
+
+    A worker pushing a single operation on its own deque executes it next,
+    so no other worker is woken up for it
+    """
+    worker = currentThread()
+    if getattr(worker, 'scheduler', None) is scheduler and \
+                                        isinstance(worker, StealingWorker):
+        worker.deque.append(op)
+        if len(worker.deque) == 1:
+            return
+    else:
+        workers = scheduler._workers
+        scheduler._next = (scheduler._next + 1) % len(workers)
+        workers[scheduler._next].deque.append(op)
+    if scheduler._sleepers:
+        with scheduler._idle:
+            scheduler._idle.notify()
+
+def op_priorities_set(scheduler):
+    """Set the :attr:`Operation.priority` of all the operations that haven't
+    finished yet to the estimated cost of the longest path from the operation
+    to the end of the graph, following :attr:`Operation.blocking`
+
+    The operations in the table and the runnable ones waiting to be ranked,
+    that may have already been removed from the table by the
+    :attr:`Scheduler.reclaim` policy, are walked depth first along
+    :attr:`Operation.blocking`, without recursion, and each operation is
+    ranked once all those waiting for it have been.
+    """
+    costs = scheduler.costs
+    default = 1.0
+    if scheduler.priority == COST and costs:
+        default = sum(costs.values()) / len(costs)
+    ranked = set()
+    roots = [op for op in reversed(scheduler.opstable) if not op.finished]
+    roots.extend(scheduler._deferred)
+    for root in roots:
+        pending = [(root, False)]
+        while pending:
+            op, ready = pending.pop()
+            if not ready:
+                if op in ranked:
+                    continue
+                ranked.add(op)
+                pending.append((op, True))
+                for dep in op.blocking:
+                    if dep not in ranked:
+                        pending.append((dep, False))
+                continue
+            if scheduler.priority == COST:
+                cost = costs.get(op.typeinfo.name, default)
+            else:
+                cost = default
+            downstream = 0
+            for dep in op.blocking:
+                if dep.priority > downstream:
+                    downstream = dep.priority
+            op.priority = cost + downstream
+
+def op_dispatch_deferred(scheduler):
+    """Rank the operations in the table with :func:`op_priorities_set` and
+    queue the runnable ones that were waiting to be ranked
+    """
+    with scheduler.lock:
+        if not scheduler._deferred:
+            return
+        op_priorities_set(scheduler)
+        deferred = scheduler._deferred
+        scheduler._deferred = []
+        op_handoff(scheduler)
+        scheduler.runnable_queue.put_many(deferred)
+
+def op_run_serial(scheduler):
+    """Execute the operations set as runnable on the calling thread, for the
+    ``serial`` executor
+
+    With the ``auto`` executor, switch to ``threads`` as soon as an operation
+    takes longer than :data:`AUTO_COST` to execute.
+    """
+    queue = scheduler._serial_queue
+    measured = scheduler.trace is not None or scheduler.stats is not None
+    switch = False
+    while queue:
+        op = queue.popleft()
+        log.debug('< %15s > %sexecuting inline', op.name, SPACER * EXECUTING)
+        start = time()
+        if measured:
+            op_execute_measured(op, scheduler)
+        else:
+            op_execute(op, scheduler)
+        if scheduler.auto and time() - start > AUTO_COST:
+            switch = True
+        with scheduler.lock:
+            if measured:
+                op_set_as_finished_measured(op, scheduler)
+            else:
+                op_set_as_finished(op, scheduler)
+
+    # queued operations have no token in ``waiting_counter``, so they are all
+    # executed inline before starting the threads
+    if switch:
+        log.debug('switching to the threads executor')
+        scheduler.executor = THREADS
+        scheduler._start_threads()
+
+def op_fold(optype, name, args, scheduler):
+    """Evaluate an operation on the spot if all of its inputs are constant
+
+    Return the finished :class:`Operation` object, or ``None`` if the
+    operation can't be folded
+    """
+    if not optype.pure:
+        return None
+
+    inputs = []
+    for i, arg in enumerate(args):
+        if len(arg) == 2:
+            arg_name, arg_value = arg
+            if not dvm_value_is_literal(arg_value):
+                raise WrongArgumentError(arg_value)
+            target = dvm_value_create('_%s_arg_%i' % (name, i), arg_value)
+            inputs.append((arg_name, target, 'value'))
+        elif len(arg) == 3:
+            arg_name, target_name, attr = arg
+            target = op_get(target_name, scheduler)
+            if not target.constant:
+                return None
+            inputs.append((arg_name, target, attr))
+        else:
+            raise WrongArgumentError(arg)
+
+    log.debug('< %15s > %sfolding constant', name, SPACER * ADDING)
+    op = Operation(optype, name, inputs)
+    # keep the values, not the connections
+    for sock in op.inputs:
+        if sock.op:
+            sock.value = sock.source.value
+            dvm_input_disconnect(sock)
+    if not op_results_load(op, scheduler):
+        dvm_operation_exec(op)
+        op_results_store(op, scheduler)
+    op.constant = True
+    return op
+
+def op_cse_key(optype, args, scheduler):
+    """Return a key identifying the results of an operation, built from its
+    type and its arguments, or ``None`` if the arguments can't be used as key
+    (as with array literals)
+    """
+    key = []
+    for arg in sorted(args):
+        if len(arg) == 2:
+            arg_name, arg_value = arg
+            if isinstance(arg_value, list):
+                arg_value = tuple(arg_value)
+            elif not isinstance(arg_value, float):
+                return None
+            key.append((arg_name, arg_value))
+        elif len(arg) == 3:
+            arg_name, target_name, attr = arg
+            key.append((arg_name, op_get(target_name, scheduler), attr))
+        else:
+            raise WrongArgumentError(arg)
+    return (optype.name, tuple(key))
+
+def op_execute(op, scheduler):
+    """Execute an :class:`Operation` object with the executor selected for the
+    :class:`Scheduler`
+
+    If the scheduler has a :attr:`Scheduler.cache` holding the results of the
+    operation, they are loaded instead.
+    """
+    if op_results_load(op, scheduler):
+        return
+
+    if scheduler.executor == PROCESSES:
+        values = dvm_input_values_get(op)
+        outputs = scheduler._pool.apply(op_execute_values,
+                                                    (op.typeinfo, values))
+        dvm_output_values_set(op, outputs)
+    else:
+        dvm_operation_exec(op)
+    op_results_store(op, scheduler)
+
+def op_results_load(op, scheduler):
+    """Set the outputs of an operation from the :attr:`Scheduler.cache`,
+    return ``True`` if they were found
+    """
+    if scheduler.cache is None:
+        return False
+    digest = dvm_result_digest(op)
+    if digest is None:
+        return False
+    outputs = scheduler.cache.load(digest)
+    if outputs is None:
+        return False
+    log.debug('< %15s > %sloading cached results', op.name,
+                                                    SPACER * EXECUTING)
+    dvm_output_values_set(op, outputs)
+    return True
+
+def op_results_store(op, scheduler):
+    """Store the outputs of an executed operation in the
+    :attr:`Scheduler.cache`
+    """
+    if scheduler.cache is None:
+        return
+    digest = dvm_result_digest(op)
+    if digest is not None:
+        scheduler.cache.store(digest, [sock.value for sock in op.outputs])
+
+def op_execute_measured(op, scheduler):
+    """Execute an operation with :func:`op_execute`, reporting when it started
+    and finished to the :attr:`Scheduler.trace` and :attr:`Scheduler.stats`
+    """
+    start = time()
+    op_execute(op, scheduler)
+    end = time()
+    if scheduler.trace is not None:
+        scheduler.trace.executed(op, start, end)
+    if scheduler.stats is not None:
+        scheduler.stats.executed(op, start, end)
+
+def op_execute_values(optype, values):
+    """Execute an operation of type `optype` on the given input values and
+    return its output values. This runs in the worker processes of the
+    ``processes`` executor
+    """
+    outputs = dvm_operation_exec_values(optype, values)
+    # worker processes don't flush their output before being terminated
+    sys.stdout.flush()
+    return outputs
+
+def op_invalidate(op, scheduler):
+    """Mark as not finished all the operations depending on `op`, directly or
+    through other operations, set their requirements again and return them
+    """
+    dirty = []
+    seen = set([op])
+    pending = deque([op])
+    while pending:
+        source = pending.popleft()
+        for dep in source.consumers:
+            if dep not in seen:
+                seen.add(dep)
+                dirty.append(dep)
+                pending.append(dep)
+
+    for dep in dirty:
+        dep.finished = False
+        dep.queued = False
+        dep.waiting_on = 0
+        dep.digest = None
+    for dep in dirty:
+        for insock in dep.inputs:
+            if insock.op is not None and insock.op is not op and \
+                                                        insock.op in seen:
+                dep.waiting_on += 1
+                insock.op.blocking.append(dep)
+    return dirty
 
 def op_set_as_finished(op, scheduler):
     """Notify other operations depending on this one that it has finished
-    executing and its ouputs are ready for use
+    executing and its ouputs are ready for use, and set as runnable the ones
+    that are not waiting for anything else
     """
-    outputs = ', '.join(['%s=%s' % (o.name, o.value) for o in op.outputs])
-    log.debug('< %15s > %ssetting as finished (%s)' % (
-                                        op.name, SPACER * FINISHING, outputs))
+    if log.isEnabledFor(logging.DEBUG):
+        outputs = ', '.join(['%s=%s' % (o.name, o.value) for o in op.outputs])
+        log.debug('< %15s > %ssetting as finished (%s)', op.name,
+                                                SPACER * FINISHING, outputs)
     op.finished = True
-    log.debug('< %15s > %supdating dependencies' % (op.name, SPACER * UPDATING))
+    log.debug('< %15s > %supdating dependencies', op.name, SPACER * UPDATING)
     for i in range(len(op.blocking)):
         dep = op.blocking.pop()
         dep.waiting_on -= 1
+        if op_is_runnable(dep, scheduler):
+            op_set_as_runnable(dep, scheduler)
+
+    if scheduler.reclaim != KEEP:
+        for insock in op.inputs:
+            source = insock.op
+            if source is not None:
+                source.refs -= 1
+                if source.pins == 0:
+                    # removed from the table, keep the value read and drop
+                    # the reference
+                    insock.value = insock.source.value
+                    dvm_input_disconnect(insock)
+                if source.refs == 0 and source.pins == 0:
+                    op_release(source, scheduler)
+        if op.refs == 0 and op.pins == 0:
+            op_release(op, scheduler)
+
+def op_complete(ops, scheduler):
+    """Update the dependencies of operations on the worker thread that has
+    executed them, and count them out of the execution engine, for the
+    ``worker`` :attr:`Scheduler.completion` mode
+    """
+    with scheduler.lock:
+        for op in ops:
+            if scheduler.trace is None and scheduler.stats is None:
+                op_set_as_finished(op, scheduler)
+            else:
+                op_set_as_finished_measured(op, scheduler)
+        if scheduler._batch:
+            op_handoff(scheduler)
+        scheduler._pending -= len(ops)
+        if scheduler._pending == 0:
+            scheduler._done.notify_all()
+
+def op_set_as_finished_measured(op, scheduler):
+    """Call :func:`op_set_as_finished`, reporting when it started and finished
+    to the :attr:`Scheduler.trace` and :attr:`Scheduler.stats`
+    """
+    start = time()
+    op_set_as_finished(op, scheduler)
+    end = time()
+    if scheduler.trace is not None:
+        scheduler.trace.updated(op, start, end)
+    if scheduler.stats is not None:
+        scheduler.stats.updated(op, start, end)
+
+def op_names_update(op, args, scheduler):
+    """Update which operations stay addressable after `op` has been added to
+    the table with the arguments `args`, following the
+    :attr:`Scheduler.reclaim` policy
+    """
+    if scheduler.reclaim == KEEP:
+        return
+    # literals created for the inputs of `op` can't be used by any other
+    # operation
+    for insock in op.inputs:
+        if insock.op is not None and insock.op.name.startswith('_'):
+            op_unpin(insock.op, scheduler)
+    if scheduler.reclaim != ANONYMOUS and not op.name.startswith('_'):
+        op_window_refresh(args, scheduler)
+        op_window_push(op, scheduler)
+        op_window_trim(scheduler)
+        # the window holds the operation from now on
+        op_unpin(op, scheduler)
+
+def op_window_refresh(args, scheduler):
+    """Keep the operations referenced by `args` addressable, for the window
+    reclaim policy
+    """
+    for arg in args:
+        if len(arg) == 3:
+            op_window_push(op_get(arg[1], scheduler), scheduler)
+
+def op_window_push(op, scheduler):
+    """Make a named operation addressable until :attr:`Scheduler.reclaim`
+    more names have been added or referenced, for the window reclaim policy
+    """
+    op.pins += 1
+    scheduler._window.append(op)
+
+def op_window_trim(scheduler):
+    """Drop the oldest entries of the window of addressable operations, once
+    all the names used by an instruction have been pushed
+    """
+    window = scheduler._window
+    while len(window) > scheduler.reclaim:
+        op_unpin(window.popleft(), scheduler)
+
+def op_unpin(op, scheduler):
+    """Drop a reference keeping an operation addressable by name. When the
+    last one is dropped the operation is removed from the table, and its
+    outputs released if nothing is waiting to read them
+    """
+    op.pins -= 1
+    if op.pins > 0:
+        return
+    log.debug('< %15s > %sremoving from opstable', op.name, SPACER * ADDING)
+    scheduler.opstable.remove(op)
+    if op.csekey is not None:
+        del scheduler.csetable[op.csekey]
+    if op.finished and op.refs == 0:
+        op_release(op, scheduler)
+
+def op_release(op, scheduler):
+    """Release the output values of an operation removed from the table, and
+    its connections to other operations
+    """
+    for sock in op.outputs:
+        sock.value = None
+    for sock in op.inputs:
+        dvm_input_disconnect(sock)
+    scheduler.reclaimed += 1
 
 
 # API
@@ -276,10 +1437,16 @@ def dvm_scheduler_operation_add(type, name, args, scheduler):
     
     If all of its requirements are ready, append the operation to the
     :attr:`Scheduler.runnable_queue` straight away, otherwise it will be
-    scheduled as runnable by the :class:`Updater` thread with
-    :func:`dvm_scheduler_refresh`
+    scheduled as runnable by the :class:`Updater` thread when the last of its
+    requirements has finished (see :func:`op_set_as_finished`)
+
+    If :attr:`Scheduler.fold` is enabled and all the requirements are
+    constant, the operation is executed straight away (see :func:`op_fold`)
+
+    `type` is the name of a registered operation type, or an
+    :class:`OperationType <daffy.vm.operations.OperationType>` object
     """
-    optype = dvm_operation_type_find(type)
+    optype = dvm_operation_type_get(type)
     if op_name_exists(name, scheduler):
         raise OperationAlreadyExistsError(name)
 
@@ -288,16 +1455,43 @@ def dvm_scheduler_operation_add(type, name, args, scheduler):
     if type == 'value':
         if len(args) == 1 and len(args[0]) == 2:
             arg_name, value = args[0]
-            if isinstance(value, float):
+            if dvm_value_is_literal(value):
                 op = dvm_value_create(name, value)
                 # this operation doesn't need to go through the engine, so we
                 # put "waiting=False" and don't set is as "runnable"
-                op_append_to_table(op, scheduler, waiting=False)
+                with scheduler.lock:
+                    op_append_to_table(op, scheduler, waiting=False)
+                    op_names_update(op, args, scheduler)
             else:
                 raise WrongArgumentError(value)
         else:
             raise WrongArgumentError(args[0])
     else:
+        if scheduler.fold:
+            op = op_fold(optype, name, args, scheduler)
+            if op is not None:
+                # evaluated at add time, there is nothing to schedule
+                with scheduler.lock:
+                    op_append_to_table(op, scheduler, waiting=False)
+                    op_names_update(op, args, scheduler)
+                return
+
+        key = None
+        if scheduler.cse and optype.pure:
+            key = op_cse_key(optype, args, scheduler)
+            op = scheduler.csetable.get(key)
+            if op is not None:
+                log.debug('< %15s > %saliasing %s', name, SPACER * ADDING,
+                                                                    op.name)
+                with scheduler.lock:
+                    scheduler.opstable.alias(name, op)
+                    if isinstance(scheduler.reclaim, int):
+                        # the new name keeps the operation addressable too
+                        op_window_refresh(args, scheduler)
+                        op_window_push(op, scheduler)
+                        op_window_trim(scheduler)
+                return
+
         for i, arg in enumerate(args):
             if len(arg) == 2:
                 arg_name, arg_value = arg
@@ -315,28 +1509,140 @@ def dvm_scheduler_operation_add(type, name, args, scheduler):
                 raise WrongArgumentError(arg)
 
         op = Operation(optype, name, inputs)
-        op_append_to_table(op, scheduler)
-        op_requirements_set(op, scheduler)
+        if key is not None:
+            scheduler.csetable[key] = op
+            op.csekey = key
+        with scheduler.lock:
+            op_append_to_table(op, scheduler)
+            op_requirements_set(op, scheduler)
+            op_names_update(op, args, scheduler)
+
+            # if all requirements are ready we set it as "runnable" stright
+            # away otherwise it will be set as "runnable" by the Updater
+            if op_is_runnable(op, scheduler):
+                op_set_as_runnable(op, scheduler)
+            if len(scheduler._batch) >= scheduler.handoff:
+                op_handoff(scheduler)
 
-        # if all requirements are ready we set it as "runnable" stright away
-        # otherwise it will be set as "runnable" by dvm_scheduler_refresh
-        if op_is_runnable(op, scheduler):
-            op_set_as_runnable(op, scheduler)
+        if scheduler.executor == SERIAL:
+            op_run_serial(scheduler)
 
 def dvm_scheduler_refresh(scheduler):
     """Find which operations in the :attr:`Scheduler.opstable` can be run and
-    append them to the :attr:`Scheduler.runnable_queue`"""
-    for op in scheduler.opstable:
-        if not op.finished and op_is_runnable(op, scheduler):
-            op_set_as_runnable(op, scheduler)
+    append them to the :attr:`Scheduler.runnable_queue`
+
+    Operations are set as runnable as soon as their requirements are ready, so
+    this full scan of the table is not needed during normal execution.
+    Operations that have already been queued are skipped.
+    """
+    with scheduler.lock:
+        for op in scheduler.opstable:
+            if (not op.finished and not op.queued and
+                                            op_is_runnable(op, scheduler)):
+                op_set_as_runnable(op, scheduler)
+        op_handoff(scheduler)
+
+def dvm_scheduler_value_set(name, value, scheduler):
+    """Change the literal of a `value` operation already in the
+    :attr:`Scheduler.opstable` and execute again the operations depending on
+    it, returning how many they are
+
+    Operations that have already been added are waited for before changing
+    the value; call :func:`dvm_scheduler_wait` to wait for the new results.
+    Raise :exc:`ConstantOperationError` if :attr:`Scheduler.fold` is enabled,
+    or if operations are reclaimed.
+
+    .. seealso::
+        :ref:`incremental updates <incremental>`
+    """
+    if scheduler.fold or scheduler.reclaim != KEEP:
+        raise ConstantOperationError(name)
+    op = op_get(name, scheduler)
+    if op.typeinfo.name != 'value' or not dvm_value_is_literal(value):
+        raise WrongArgumentError(name)
+
+    dvm_scheduler_wait(scheduler)
+    with scheduler.lock:
+        dvm_value_set(op, value)
+        op.digest = None
+        dirty = op_invalidate(op, scheduler)
+        op_tokens_put(len(dirty), scheduler)
+        for dep in dirty:
+            if op_is_runnable(dep, scheduler):
+                op_set_as_runnable(dep, scheduler)
+        op_handoff(scheduler)
+
+    if scheduler.executor == SERIAL:
+        op_run_serial(scheduler)
+    return len(dirty)
 
 def dvm_scheduler_wait(scheduler):
     """Wait for all operations to execute joining the scheduler's
     ``waiting_counter`` queue
     
+    With a :attr:`Scheduler.priority` other than ``fifo``, the runnable
+    operations are ranked and queued first (see :func:`op_dispatch_deferred`)
+    
     .. seealso::
         :mod:`scheduler` for a detaild description of thread syncronization
     """
-    scheduler.waiting_counter.join()
+    if scheduler._tokens or scheduler._batch:
+        with scheduler.lock:
+            op_handoff(scheduler)
+    if scheduler._deferred:
+        op_dispatch_deferred(scheduler)
+    if scheduler.completion == WORKER:
+        with scheduler.lock:
+            while scheduler._pending:
+                scheduler._done.wait()
+    else:
+        scheduler.waiting_counter.join()
     log.debug('all operations have finished')
 
+def dvm_scheduler_close(scheduler):
+    """Release the resources held by a scheduler that is no longer used:
+    the :class:`Worker` (or :class:`StealingWorker`) and :class:`Updater`
+    threads, and then the worker processes of the ``processes`` executor,
+    are stopped and waited for
+
+    Call :func:`dvm_scheduler_wait` first, as no operation can be executed
+    once the scheduler is closed: the threads are stopped by :data:`STOP`,
+    after the operations already queued, and the operations still waiting
+    are dropped. Closing a scheduler twice does nothing.
+    """
+    workers = scheduler._workers
+    if workers:
+        if scheduler.executor == STEALING:
+            workers[0].deque.append(STOP)
+            with scheduler._idle:
+                scheduler._idle.notify_all()
+        else:
+            scheduler.runnable_queue.put(STOP)
+        for worker in workers:
+            worker.join()
+        scheduler._workers = []
+
+    updater = scheduler._updater
+    if updater is not None:
+        # the updater waits on either queue
+        scheduler.waiting_counter.put(STOP)
+        scheduler.finished_queue.put(STOP)
+        updater.join()
+        scheduler._updater = None
+
+    pool = scheduler._pool
+    if pool is not None:
+        scheduler._pool = None
+        pool.close()
+        pool.join()
+
+def dvm_scheduler_stats(scheduler):
+    """Return the execution statistics collected by the scheduler's
+    :attr:`Scheduler.stats`, as returned by
+    :func:`dvm_stats_report() <daffy.vm.stats.dvm_stats_report>`, or ``None``
+    if the scheduler doesn't collect them
+    """
+    if scheduler.stats is None:
+        return None
+    return dvm_stats_report(scheduler.stats)
+
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Daffy.
+#
+# Daffy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Daffy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Daffy.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Original Copyright (c) 2010, Lorenzo Pierfederici <lpierfederici@gmail.com>
+# Contributor(s): 
+#
+"""Execution statistics
+
+A :class:`Stats` object attached to a :class:`Scheduler
+<daffy.vm.scheduler.Scheduler>` collects, for each operation type, how long
+its operations take to execute and how long they wait in the
+:attr:`runnable_queue <daffy.vm.scheduler.Scheduler.runnable_queue>` before
+a thread picks them up, along with the time each thread spends executing
+operations and the time spent updating dependencies (by the :class:`Updater
+<daffy.vm.scheduler.Updater>` thread, or inline by the ``serial`` executor).
+
+:func:`dvm_stats_report` turns them into a dictionary that can be saved as
+JSON, and :func:`dvm_stats_table` into a table: comparing the execution times
+with the waits and the dependency updates shows whether the time goes into
+the operations themselves or into the scheduling overhead.
+
+Execution times are measured around
+:func:`op_execute <daffy.vm.scheduler.op_execute>`, so they include loading
+and storing cached results; operations evaluated by :ref:`constant folding
+<folding>` never go through the queue and are not counted.
+"""
+
+import math
+from threading import currentThread
+
+
+class Stats(object):
+    """Execution statistics of the operations run by a scheduler
+
+    The scheduler passes times in seconds since the epoch, as returned by
+    :func:`time.time`.
+    """
+    def __init__(self):
+        #: lists of execution times, in seconds, by operation type name
+        self.exec_times = {}
+
+        #: lists of times spent in the queue, in seconds, by operation type
+        #: name
+        self.wait_times = {}
+
+        #: seconds spent executing operations, by thread name
+        self.busy = {}
+
+        #: seconds spent updating the dependencies of finished operations
+        self.update_busy = 0.0
+
+        #: number of finished operations whose dependencies were updated
+        self.updates = 0
+
+        #: time the first operation was set as runnable, or ``None``
+        self.first = None
+
+        #: time the last operation was executed or updated, or ``None``
+        self.last = None
+
+        # time queued operations were set as runnable, by operation name
+        self._queued = {}
+
+    def worker(self, name):
+        """Record a worker thread, so that it is reported even if it never
+        executes anything
+        """
+        self.busy.setdefault(name, 0.0)
+
+    def enqueued(self, op, t):
+        """Record that `op` has been set as runnable at time `t`"""
+        self._queued[op.name] = t
+        if self.first is None:
+            self.first = t
+
+    def executed(self, op, start, end):
+        """Record that `op` has been executed on the calling thread, from
+        time `start` to time `end`
+        """
+        name = op.typeinfo.name
+        self.exec_times.setdefault(name, []).append(end - start)
+        queued = self._queued.pop(op.name, None)
+        if queued is not None:
+            self.wait_times.setdefault(name, []).append(start - queued)
+        thread = currentThread().name
+        self.busy[thread] = self.busy.get(thread, 0.0) + end - start
+        if self.last is None or end > self.last:
+            self.last = end
+
+    def updated(self, op, start, end):
+        """Record that the dependencies of `op` have been updated, from time
+        `start` to time `end`
+        """
+        self.update_busy += end - start
+        self.updates += 1
+        if self.last is None or end > self.last:
+            self.last = end
+
+
+# Internal functions
+def percentile(values, q):
+    """Return the `q` percentile (between 0 and 1) of a sorted list of
+    values, using the nearest rank
+    """
+    if not values:
+        return 0.0
+    rank = int(math.ceil(q * len(values))) - 1
+    return values[min(max(rank, 0), len(values) - 1)]
+
+def times_summary(times):
+    """Return the count, total, mean, median and 99th percentile of a list of
+    times
+    """
+    times = sorted(times)
+    total = sum(times)
+    return {
+        'count': len(times),
+        'total_s': total,
+        'mean_s': times and total / len(times) or 0.0,
+        'p50_s': percentile(times, 0.5),
+        'p99_s': percentile(times, 0.99),
+    }
+
+
+# API functions
+def dvm_stats_report(stats):
+    """Return the statistics collected by `stats` as a dictionary::
+
+        {'wall_s': <seconds from the first operation queued to the last one
+                   finished>,
+         'exec_s': <total execution time>,
+         'optypes': {<optype name>: {'count', 'total_s', 'mean_s', 'p50_s',
+                                     'p99_s', 'wait_total_s', 'wait_mean_s',
+                                     'wait_p50_s', 'wait_p99_s'}},
+         'threads': {<thread name>: {'busy_s', 'utilization'}},
+         'updates': {'count', 'busy_s', 'utilization'}}
+
+    utilization is the fraction of the wall time spent busy
+    """
+    wall = 0.0
+    if stats.first is not None and stats.last is not None:
+        wall = stats.last - stats.first
+    optypes = {}
+    for name, times in stats.exec_times.items():
+        summary = times_summary(times)
+        wait = times_summary(stats.wait_times.get(name, []))
+        for key in ('total_s', 'mean_s', 'p50_s', 'p99_s'):
+            summary['wait_' + key] = wait[key]
+        optypes[name] = summary
+    threads = {}
+    for name, busy in stats.busy.items():
+        threads[name] = {'busy_s': busy,
+                         'utilization': wall and busy / wall or 0.0}
+    return {
+        'wall_s': wall,
+        'exec_s': sum(t['total_s'] for t in optypes.values()),
+        'optypes': optypes,
+        'threads': threads,
+        'updates': {'count': stats.updates,
+                    'busy_s': stats.update_busy,
+                    'utilization': wall and stats.update_busy / wall or 0.0},
+    }
+
+def dvm_stats_table(report):
+    """Return a report from :func:`dvm_stats_report` formatted as text tables,
+    with times in microseconds
+    """
+    lines = ['%-12s %8s %12s %10s %10s %10s %10s %10s' % ('optype', 'count',
+                'total us', 'mean us', 'p50 us', 'p99 us', 'wait mean',
+                'wait p99')]
+    for name, s in sorted(report['optypes'].items(),
+                          key=lambda item: -item[1]['total_s']):
+        lines.append('%-12s %8i %12.0f %10.1f %10.1f %10.1f %10.1f %10.1f' % (
+                        name, s['count'], s['total_s'] * 1e6,
+                        s['mean_s'] * 1e6, s['p50_s'] * 1e6, s['p99_s'] * 1e6,
+                        s['wait_mean_s'] * 1e6, s['wait_p99_s'] * 1e6))
+    lines.append('')
+    lines.append('%-12s %12s %12s' % ('thread', 'busy us', 'utilization'))
+    for name, t in sorted(report['threads'].items()):
+        lines.append('%-12s %12.0f %11.1f%%' % (name, t['busy_s'] * 1e6,
+                                                t['utilization'] * 100))
+    updates = report['updates']
+    lines.append('%-12s %12.0f %11.1f%%' % ('(updates)',
+                                            updates['busy_s'] * 1e6,
+                                            updates['utilization'] * 100))
+    lines.append('')
+    lines.append('wall time %.0f us, executing %.0f us, updating %.0f us' % (
+                    report['wall_s'] * 1e6, report['exec_s'] * 1e6,
+                    updates['busy_s'] * 1e6))
+    return '\n'.join(lines)
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Daffy.
+#
+# Daffy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Daffy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Daffy.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Original Copyright (c) 2010, Lorenzo Pierfederici <lpierfederici@gmail.com>
+# Contributor(s): 
+#
+"""Execution traces
+
+A :class:`Tracer` attached to a :class:`Scheduler
+<daffy.vm.scheduler.Scheduler>` records when each operation is queued, when
+it starts and finishes executing and on which thread, and how long the
+:class:`Updater <daffy.vm.scheduler.Updater>` thread takes to process it once
+it has finished. :func:`dvm_trace_write` saves the events in the Chrome trace
+event format, which can be loaded in ``chrome://tracing`` or in Perfetto to
+see how well the workers are kept busy.
+
+Each operation produces:
+
+* an instant event on the thread that set it as runnable, and a flow arrow to
+  the start of its execution;
+* a complete event on the thread that executed it, named after the operation
+  and with its type as category; the time it spent in the queue is stored in
+  its arguments;
+* a complete event on the :class:`Updater <daffy.vm.scheduler.Updater>`
+  thread, for the ``threads`` and ``processes`` executors.
+
+The scheduler only checks whether its :attr:`Scheduler.trace
+<daffy.vm.scheduler.Scheduler.trace>` is ``None`` when tracing is disabled,
+so traces can be left out of production runs at no cost.
+"""
+
+import os, json
+from threading import Lock, currentThread
+from time import time
+
+
+class Tracer(object):
+    """Trace events of the operations executed by a scheduler
+
+    The scheduler passes times in seconds since the epoch, as returned by
+    :func:`time.time`; events are recorded with timestamps in microseconds
+    from the creation of the tracer.
+    """
+    def __init__(self):
+        #: list of recorded events, as dictionaries
+        self.events = []
+
+        #: time the tracer was created, in seconds since the epoch
+        self.start = time()
+
+        # process id used for all events
+        self._pid = os.getpid()
+
+        # numeric ids of the threads seen so far, by thread name
+        self._tids = {}
+
+        # timestamp and flow id of queued operations, by operation name
+        self._queued = {}
+
+        # last flow id assigned
+        self._flows = 0
+
+        # list.append is atomic, but assigning thread and flow ids isn't
+        self._lock = Lock()
+
+    def ts(self, t):
+        """Return the timestamp of time `t`, in microseconds"""
+        return (t - self.start) * 1e6
+
+    def tid(self):
+        """Return the numeric id of the calling thread, recording its name
+        the first time it is seen
+        """
+        name = currentThread().name
+        tid = self._tids.get(name)
+        if tid is None:
+            with self._lock:
+                tid = self._tids.get(name)
+                if tid is None:
+                    tid = self._tids[name] = len(self._tids) + 1
+                    self.events.append({'ph': 'M', 'name': 'thread_name',
+                                        'pid': self._pid, 'tid': tid,
+                                        'args': {'name': name}})
+        return tid
+
+    def enqueued(self, op, t):
+        """Record that `op` has been set as runnable at time `t`"""
+        ts = self.ts(t)
+        tid = self.tid()
+        with self._lock:
+            self._flows += 1
+            flow = self._flows
+        self._queued[op.name] = (ts, flow)
+        self.events.append({'ph': 'i', 's': 't', 'name': op.name,
+                            'cat': 'queue', 'ts': ts, 'pid': self._pid,
+                            'tid': tid})
+        self.events.append({'ph': 's', 'name': 'queue', 'cat': 'queue',
+                            'id': flow, 'ts': ts, 'pid': self._pid,
+                            'tid': tid})
+
+    def executed(self, op, start, end):
+        """Record that `op` has been executed on the calling thread, from
+        time `start` to time `end`
+        """
+        start = self.ts(start)
+        end = self.ts(end)
+        tid = self.tid()
+        args = {}
+        queued = self._queued.pop(op.name, None)
+        if queued is not None:
+            ts, flow = queued
+            args['queued_us'] = start - ts
+            self.events.append({'ph': 'f', 'bp': 'e', 'name': 'queue',
+                                'cat': 'queue', 'id': flow, 'ts': start,
+                                'pid': self._pid, 'tid': tid})
+        self.events.append({'ph': 'X', 'name': op.name,
+                            'cat': op.typeinfo.name, 'ts': start,
+                            'dur': end - start, 'pid': self._pid, 'tid': tid,
+                            'args': args})
+
+    def updated(self, op, start, end):
+        """Record that the dependencies of `op` have been updated on the
+        calling thread, from time `start` to time `end`
+        """
+        self.events.append({'ph': 'X', 'name': op.name, 'cat': 'update',
+                            'ts': self.ts(start), 'dur': (end - start) * 1e6,
+                            'pid': self._pid, 'tid': self.tid()})
+
+
+# API functions
+def dvm_trace_write(tracer, filename):
+    """Write the events recorded by `tracer` to `filename`, in the Chrome trace
+    event format
+    """
+    with open(filename, 'w') as f:
+        json.dump({'traceEvents': tracer.events,
+                   'displayTimeUnit': 'ms'}, f)
@@ -5,10 +5,11 @@ except ImportError:
     from ez_setup import use_setuptools
     use_setuptools()
     from setuptools import setup, find_packages
+from daffy import __version__
 
 setup(
     name='daffy',
-    version='0.1',
+    version=__version__,
     zip_safe=True,
     description='Runtime environment for Daffy: a dataflow programming language',
     author='Lorenzo Pierfederici',
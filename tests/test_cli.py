@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Daffy.
+#
+# Daffy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Daffy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Daffy.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Original Copyright (c) 2010, Lorenzo Pierfederici <lpierfederici@gmail.com>
+# Contributor(s):
+#
+"""Tests of the :mod:`daffy.cli` module::
+
+    Usage: python -m unittest discover -s tests
+
+:mod:`daffy.cli` parses the command line when it is imported, so each test
+calls :func:`daffy.cli.main` in a new interpreter, as the ``daffy`` console
+script does, running `SCRIPT` with the arguments to test.
+"""
+
+import os, sys, json, shutil, tempfile, unittest, subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+#: imports :mod:`daffy.cli` with the arguments given to the script, records
+#: the schedulers closed by :func:`daffy.cli.main` and prints, as JSON, the
+#: value it returned, how many schedulers it closed and how many worker
+#: processes are still alive
+SCRIPT = """
+import sys, json
+from multiprocessing import active_children
+sys.argv[0] = 'daffy'
+import daffy.cli as cli
+
+closed = []
+close = cli.dvm_scheduler_close
+def recorder(scheduler):
+    closed.append(scheduler)
+    close(scheduler)
+cli.dvm_scheduler_close = recorder
+
+retval = cli.main()
+print(json.dumps([retval, len(closed), len(active_children())]))
+"""
+
+
+def main_run(*args):
+    """Run :func:`daffy.cli.main` with the given command line arguments and
+    return the process exit status, its output and what `SCRIPT` printed
+    """
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    process = subprocess.Popen([sys.executable, '-c', SCRIPT] + list(args),
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               cwd=ROOT, env=env)
+    out, err = process.communicate()
+    lines = out.splitlines()
+    report = None
+    if lines and lines[-1].startswith('['):
+        report = json.loads(lines.pop())
+    return process.returncode, '\n'.join(lines), err, report
+
+
+class CloseTest(unittest.TestCase):
+    def test_main_closes_scheduler(self):
+        status, out, err, report = main_run('-e', 'processes', '-j', '2',
+                                            '-c', '$x: add(a=1, b=2)')
+        self.assertEqual(status, 0, err)
+        retval, closed, children = report
+        self.assertEqual(closed, 1)
+        self.assertEqual(children, 0)
+
+
+class ErrorsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_evicted_name(self):
+        filename = os.path.join(self.tmpdir, 'program.dfy')
+        with open(filename, 'w') as f:
+            f.write('$a: value(value=1)\n'
+                    '$b: add(a=$a.value, b=2)\n'
+                    '$c: add(a=$b.result, b=1)\n'
+                    '$d: add(a=$a.value, b=1)\n')
+        for executor in ('threads', 'processes', 'stealing'):
+            status, out, err, report = main_run('--reclaim=1', '-e', executor,
+                                                filename)
+            self.assertEqual(status, 0, err)
+            self.assertEqual(out, "daffy: can't run program: "
+                                  "OperationNotFoundError: a")
+            self.assertEqual(err, '')
+            retval, closed, children = report
+            self.assertEqual(retval, 1)
+            self.assertEqual(children, 0)
+
+    def test_arrays_errors(self):
+        filename = os.path.join(self.tmpdir, 'program.dfy')
+        for line, error in (('$a: add(a=$x.value, b=1)',
+                             'OperationAlreadyExistsError: a'),
+                            ('$b: frob(a=$x.value, b=1)',
+                             'OperationTypeNotFoundError: frob')):
+            with open(filename, 'w') as f:
+                f.write('$x: value(value=1)\n$a: add(a=$x.value, b=2)\n' +
+                        line + '\n')
+            status, out, err, report = main_run('--arrays', filename)
+            self.assertEqual(err, '')
+            self.assertEqual(out, "daffy: can't run file '%s': %s" % (
+                                                            filename, error))
+
+
+class OutputTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_main_writes_trace(self):
+        filename = os.path.join(self.tmpdir, 'trace.json')
+        status, out, err, report = main_run('--trace', filename,
+                                            '-c', '$x: add(a=1, b=2)')
+        self.assertEqual(status, 0, err)
+        with open(filename) as f:
+            trace = json.load(f)
+        executed = [event['name'] for event in trace['traceEvents']
+                    if event['ph'] == 'X' and event['cat'] == 'add']
+        self.assertEqual(executed, ['x'])
+
+    def test_main_writes_profile(self):
+        filename = os.path.join(self.tmpdir, 'profile.json')
+        status, out, err, report = main_run('--profile',
+                                            '--profile-json', filename,
+                                            '-c', '$x: add(a=1, b=2)')
+        self.assertEqual(status, 0, err)
+        self.assertIn('optype', err)
+        with open(filename) as f:
+            profile = json.load(f)
+        self.assertEqual(profile['optypes']['add']['count'], 1)
+
+
+class OptionsTest(unittest.TestCase):
+    def test_arrays_rejects_scheduler_options(self):
+        for option in (['-b', 'params.csv'], ['-e', 'threads'],
+                       ['--trace', 'trace.json'], ['--profile'],
+                       ['--cache-dir', 'cache'], ['--reclaim', '5']):
+            status, out, err, report = main_run(*(['--arrays'] + option +
+                                                  ['program.dfy']))
+            self.assertEqual(status, 2, option)
+            self.assertIn("can't be used with --arrays", err)
+
+    def test_file_options_need_a_file(self):
+        status, out, err, report = main_run('-b', 'params.csv',
+                                            '-c', '$x: add(a=1, b=2)')
+        self.assertEqual(status, 2)
+        self.assertIn('--batch can only be used to run a file', err)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Daffy.
+#
+# Daffy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Daffy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Daffy.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Original Copyright (c) 2010, Lorenzo Pierfederici <lpierfederici@gmail.com>
+# Contributor(s):
+#
+"""Tests of the :mod:`daffy.vm.codegen` module::
+
+    Usage: python -m unittest discover -s tests
+"""
+
+import sys, unittest
+from cStringIO import StringIO
+from daffy.vm.scheduler import Scheduler, THREADS
+from daffy.vm.scheduler import dvm_scheduler_operation_add
+from daffy.vm.codegen import dvm_graph_compile
+
+
+class CompileTest(unittest.TestCase):
+    def setUp(self):
+        # with no workers nothing is executed, the graph is only built
+        self.scheduler = Scheduler(executor=THREADS, workers=0)
+        self.stdout = sys.stdout
+        sys.stdout = StringIO()
+
+    def tearDown(self):
+        sys.stdout = self.stdout
+
+    def add(self, type, name, args):
+        dvm_scheduler_operation_add(type, name, args, self.scheduler)
+
+    def test_operation_without_outputs(self):
+        self.add('value', 'x', [('value', 1.0)])
+        self.add('add', 'y', [('a', 'x', 'value'), ('b', 2.0)])
+        self.add('print', 'p', [('value', 'y', 'result')])
+
+        graph = dvm_graph_compile(self.scheduler)
+        results = graph(x=5.0)
+        self.assertEqual(results['y.result'], 7.0)
+        self.assertEqual(sys.stdout.getvalue(), '7.0\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
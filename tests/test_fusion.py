@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Daffy.
+#
+# Daffy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Daffy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Daffy.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Original Copyright (c) 2010, Lorenzo Pierfederici <lpierfederici@gmail.com>
+# Contributor(s):
+#
+"""Tests of the :mod:`daffy.vm.fusion` module::
+
+    Usage: python -m unittest discover -s tests
+"""
+
+import sys, unittest
+from daffy.vm.optypes import optypes
+from daffy.vm.scheduler import Scheduler, SERIAL, op_get
+from daffy.vm.interpreter import dvm_instructions_run
+from daffy.vm.fusion import MAX_GROUP, dvm_instructions_fuse
+
+
+def chain(size):
+    """Return the instructions of a chain of `size` operations"""
+    instructions = [('value', 'n0', [('value', 1.0)])]
+    for i in xrange(1, size):
+        instructions.append(('add', 'n%i' % i, [('a', 'n%i' % (i - 1),
+                                                 'result' if i > 1 else
+                                                 'value'), ('b', 1.0)]))
+    return instructions
+
+
+class FuseTest(unittest.TestCase):
+    def test_long_chain(self):
+        size = sys.getrecursionlimit() * 2
+        types = len(optypes)
+        fused = dvm_instructions_fuse(chain(size))
+        # the value and the groups of MAX_GROUP operations
+        self.assertEqual(len(fused), 1 + -(-(size - 1) // MAX_GROUP))
+        self.assertEqual(len(optypes), types)
+
+        scheduler = Scheduler()
+        dvm_instructions_run(fused, scheduler)
+        last = op_get('n%i' % (size - 1), scheduler)
+        self.assertEqual(last.outputs[0].value, float(size))
+
+    def test_same_shape_same_type(self):
+        fused = dvm_instructions_fuse(chain(MAX_GROUP * 3 + 1))
+        self.assertEqual(len(set(type for type, name, args in fused[1:])), 1)
+        self.assertTrue(len(fused[1][0].name) < 32)
+
+    def test_errors(self):
+        instructions = [('value', 'a', [('value', 1.0)]),
+                        ('div', 'b', [('a', 'a', 'value'), ('b', 0.0)]),
+                        ('add', 'c', [('a', 'b', 'result'), ('b', 1.0)]),
+                        ('add', 'd', [('x', 'c', 'result'), ('b', 1.0)])]
+        fused = dvm_instructions_fuse(instructions)
+        # the instruction with an unknown input is left alone
+        self.assertEqual(fused[-1], instructions[-1])
+        self.assertEqual(len(fused), 3)
+
+        # the division by zero is raised by the fused kernel
+        self.assertRaises(ZeroDivisionError, dvm_instructions_run,
+                          fused[:2], Scheduler(executor=SERIAL))
+
+
+if __name__ == '__main__':
+    unittest.main()
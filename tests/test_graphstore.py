@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Daffy.
+#
+# Daffy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Daffy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Daffy.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Original Copyright (c) 2010, Lorenzo Pierfederici <lpierfederici@gmail.com>
+# Contributor(s):
+#
+"""Tests of the :mod:`daffy.vm.graphstore` module::
+
+    Usage: python -m unittest discover -s tests
+"""
+
+import unittest
+from daffy.vm.graphstore import numpy, dvm_graphstore_load
+from daffy.vm.graphstore import dvm_graphstore_run, dvm_graphstore_value
+from daffy.vm.scheduler import OperationAlreadyExistsError
+
+
+@unittest.skipIf(numpy is None, 'array-backed graphs need NumPy')
+class LoadTest(unittest.TestCase):
+    def test_load_and_run(self):
+        store, slots = dvm_graphstore_load([
+                ('value', 'a', [('value', 1.0)]),
+                ('add', 'b', [('a', 'a', 'value'), ('b', 2.0)]),
+                ('mul', 'c', [('a', 'b', 'result'), ('b', 'b', 'result')])])
+        dvm_graphstore_run(store)
+        self.assertEqual(dvm_graphstore_value(store, slots['c.result']), 9.0)
+
+    def test_name_defined_twice(self):
+        instructions = [('value', 'a', [('value', 1.0)]),
+                        ('add', 'b', [('a', 'a', 'value'), ('b', 2.0)]),
+                        ('add', 'b', [('a', 'a', 'value'), ('b', 3.0)])]
+        self.assertRaises(OperationAlreadyExistsError, dvm_graphstore_load,
+                          instructions)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Daffy.
+#
+# Daffy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Daffy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Daffy.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Original Copyright (c) 2010, Lorenzo Pierfederici <lpierfederici@gmail.com>
+# Contributor(s):
+#
+"""Tests of the :mod:`daffy.vm.operations` module::
+
+    Usage: python -m unittest discover -s tests
+"""
+
+import unittest
+from daffy.vm.operations import OperationType, InputSocketType
+from daffy.vm.operations import OutputSocketType, MemoCache
+from daffy.vm.operations import dvm_input_value_get, dvm_output_socket
+from daffy.vm.operations import dvm_operation_exec_values
+from daffy.vm.operations import dvm_operation_memo_stats
+from daffy.vm.operations import dvm_operation_memo_clear
+
+
+class MemoCacheTest(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = MemoCache(2)
+        cache.put(('a',), [1])
+        cache.put(('b',), [2])
+        self.assertEqual(cache.get(('a',)), [1])
+        # 'b' is now the least recently used
+        cache.put(('c',), [3])
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get(('b',)))
+        self.assertEqual(cache.get(('a',)), [1])
+        self.assertEqual(cache.get(('c',)), [3])
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+
+
+class MemoizeTest(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+        def execfunc(op):
+            self.calls.append(op)
+            value = dvm_input_value_get(op, 'a') * 2
+            dvm_output_socket(op, 'result').value = value
+        self.optype = OperationType('double', [InputSocketType('a', 0.0)],
+                                    [OutputSocketType('result')],
+                                    execfunc, pure=True, memoize=2)
+
+    def tearDown(self):
+        dvm_operation_memo_clear()
+
+    def test_hit_skips_execfunc(self):
+        self.assertEqual(dvm_operation_exec_values(self.optype, [3.0]), [6.0])
+        self.assertEqual(dvm_operation_exec_values(self.optype, [3.0]), [6.0])
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(dvm_operation_memo_stats(), {'double': (1, 1)})
+
+        self.assertEqual(dvm_operation_exec_values(self.optype, [4.0]), [8.0])
+        self.assertEqual(len(self.calls), 2)
+
+    def test_unhashable_values_arent_cached(self):
+        self.assertEqual(dvm_operation_exec_values(self.optype, [[1]]),
+                         [[1, 1]])
+        self.assertEqual(dvm_operation_exec_values(self.optype, [[1]]),
+                         [[1, 1]])
+        self.assertEqual(len(self.calls), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
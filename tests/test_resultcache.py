@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Daffy.
+#
+# Daffy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Daffy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Daffy.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Original Copyright (c) 2010, Lorenzo Pierfederici <lpierfederici@gmail.com>
+# Contributor(s):
+#
+"""Tests of the :mod:`daffy.vm.resultcache` module::
+
+    Usage: python -m unittest discover -s tests
+"""
+
+import shutil, tempfile, unittest
+from daffy.vm.resultcache import ResultCache
+
+DIGEST = '0123456789abcdef0123456789abcdef01234567'
+
+
+class LoadTest(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.cache = ResultCache(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_store_and_load(self):
+        self.assertIsNone(self.cache.load(DIGEST))
+        self.cache.store(DIGEST, [1.0, 2.0])
+        self.assertEqual(self.cache.load(DIGEST), [1.0, 2.0])
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_damaged_files_are_misses(self):
+        self.cache.store(DIGEST, [1.0, 2.0])
+        filename = self.cache._filename(DIGEST)
+        with open(filename, 'rb') as f:
+            data = f.read()
+        # truncated, empty, not a pickle, a missing class, a bad memo
+        for damaged in (data[:len(data) // 2], data[:1], '', 'garbage',
+                        'cnot_a_module\nthing\n.',
+                        '\x80\x02]q\x00(K\x01h\x05e.'):
+            with open(filename, 'wb') as f:
+                f.write(damaged)
+            self.assertIsNone(self.cache.load(DIGEST), repr(damaged))
+        self.assertEqual(self.cache.misses, 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
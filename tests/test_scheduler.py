@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Daffy.
+#
+# Daffy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Daffy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Daffy.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Original Copyright (c) 2010, Lorenzo Pierfederici <lpierfederici@gmail.com>
+# Contributor(s):
+#
+"""Tests of the :mod:`daffy.vm.scheduler` module::
+
+    Usage: python -m unittest discover -s tests
+"""
+
+import gc, unittest
+from random import Random
+from threading import enumerate as threads
+from multiprocessing import active_children
+from daffy.vm.scheduler import Scheduler, PROCESSES, THREADS, SERIAL
+from daffy.vm.scheduler import FIFO, DEPTH, COST
+from daffy.vm.scheduler import STEALING, ANONYMOUS
+from daffy.vm.scheduler import UPDATER, WORKER
+from daffy.vm.scheduler import dvm_scheduler_operation_add, dvm_scheduler_wait
+from daffy.vm.scheduler import dvm_scheduler_close, op_get
+from daffy.vm.scheduler import dvm_scheduler_value_set, dvm_scheduler_refresh
+from daffy.vm.scheduler import op_set_as_finished, OperationNotFoundError
+from daffy.vm.operations import Operation, dvm_operation_exec
+from daffy.vm.trace import Tracer
+
+
+class CloseTest(unittest.TestCase):
+    def setUp(self):
+        self.before = active_children()
+
+    def test_close_stops_worker_processes(self):
+        scheduler = Scheduler(executor=PROCESSES, workers=2, fold=False)
+        children = [p for p in active_children() if p not in self.before]
+        self.assertEqual(len(children), 2)
+
+        dvm_scheduler_operation_add('add', 'x', [('a', 1.0), ('b', 2.0)],
+                                    scheduler)
+        dvm_scheduler_wait(scheduler)
+        self.assertEqual(op_get('x', scheduler).outputs[0].value, 3.0)
+
+        dvm_scheduler_close(scheduler)
+        self.assertFalse([p for p in children if p.is_alive()])
+        # closing twice does nothing
+        dvm_scheduler_close(scheduler)
+
+    def test_close_stops_threads(self):
+        before = threads()
+        for executor, completion, handoff in ((THREADS, UPDATER, 1),
+                                              (THREADS, UPDATER, 8),
+                                              (THREADS, WORKER, 1),
+                                              (STEALING, WORKER, 1)):
+            scheduler = Scheduler(executor=executor, workers=3,
+                                  completion=completion, handoff=handoff)
+            dvm_scheduler_operation_add('add', 'x', [('a', 1.0), ('b', 2.0)],
+                                        scheduler)
+            dvm_scheduler_wait(scheduler)
+            self.assertNotEqual(threads(), before)
+
+            dvm_scheduler_close(scheduler)
+            self.assertEqual(threads(), before)
+            dvm_scheduler_close(scheduler)
+
+    def test_close_without_pool(self):
+        scheduler = Scheduler(fold=False)
+        dvm_scheduler_close(scheduler)
+        self.assertEqual(active_children(), self.before)
+
+
+class DependenciesTest(unittest.TestCase):
+    def test_finishing_releases_dependents(self):
+        # with no workers nothing is executed, operations are finished here
+        scheduler = Scheduler(executor=THREADS, workers=0)
+        dvm_scheduler_operation_add('add', 'p', [('a', 1.0), ('b', 2.0)],
+                                    scheduler)
+        # reads two outputs of the same operation
+        dvm_scheduler_operation_add('add', 'q', [('a', 'p', 'result'),
+                                                 ('b', 'p', 'result')],
+                                    scheduler)
+        p, q = op_get('p', scheduler), op_get('q', scheduler)
+        self.assertTrue(p.queued)
+        self.assertEqual(q.waiting_on, 2)
+        self.assertEqual(p.blocking, [q, q])
+        self.assertEqual(scheduler.runnable_queue.qsize(), 1)
+
+        dvm_operation_exec(p)
+        with scheduler.lock:
+            op_set_as_finished(p, scheduler)
+        self.assertEqual(q.waiting_on, 0)
+        self.assertEqual(p.blocking, [])
+        self.assertTrue(q.queued)
+        # queued once, and not again by a full scan of the table
+        self.assertEqual(scheduler.runnable_queue.qsize(), 2)
+        dvm_scheduler_refresh(scheduler)
+        self.assertEqual(scheduler.runnable_queue.qsize(), 2)
+        dvm_scheduler_close(scheduler)
+
+
+class FoldTest(unittest.TestCase):
+    def test_default_scheduler_doesnt_fold(self):
+        scheduler = Scheduler()
+        dvm_scheduler_operation_add('value', 'x', [('value', 1.0)], scheduler)
+        dvm_scheduler_operation_add('add', 'y', [('a', 'x', 'value'),
+                                                 ('b', 2.0)], scheduler)
+        dvm_scheduler_wait(scheduler)
+        self.assertFalse(op_get('y', scheduler).constant)
+
+        self.assertEqual(dvm_scheduler_value_set('x', 5.0, scheduler), 1)
+        dvm_scheduler_wait(scheduler)
+        self.assertEqual(op_get('y', scheduler).outputs[0].value, 7.0)
+
+
+class ValueSetTest(unittest.TestCase):
+    def test_only_dependents_run_again(self):
+        scheduler = Scheduler(executor=THREADS)
+        add = lambda type, name, args: dvm_scheduler_operation_add(
+                                                type, name, args, scheduler)
+        add('value', 'x', [('value', 1.0)])
+        add('value', 'w', [('value', 10.0)])
+        add('add', 'y', [('a', 'x', 'value'), ('b', 2.0)])
+        add('mul', 'y2', [('a', 'y', 'result'), ('b', 'y', 'result')])
+        add('add', 'z', [('a', 'w', 'value'), ('b', 2.0)])
+        dvm_scheduler_wait(scheduler)
+        self.assertEqual(op_get('y2', scheduler).outputs[0].value, 9.0)
+
+        # an operation executed again would overwrite the marker
+        z = op_get('z', scheduler)
+        z.outputs[0].value = 'not executed'
+        self.assertEqual(dvm_scheduler_value_set('x', 2.0, scheduler), 2)
+        dvm_scheduler_wait(scheduler)
+        self.assertEqual(op_get('y2', scheduler).outputs[0].value, 16.0)
+        self.assertEqual(z.outputs[0].value, 'not executed')
+        dvm_scheduler_close(scheduler)
+
+
+class CSETest(unittest.TestCase):
+    def add_twice(self, scheduler):
+        dvm_scheduler_operation_add('value', 'x', [('value', 1.0)], scheduler)
+        for name in ('y', 'z'):
+            dvm_scheduler_operation_add('add', name, [('a', 'x', 'value'),
+                                                      ('b', 2.0)], scheduler)
+        dvm_scheduler_wait(scheduler)
+        return op_get('y', scheduler), op_get('z', scheduler)
+
+    def test_default_scheduler_doesnt_merge(self):
+        y, z = self.add_twice(Scheduler(executor=SERIAL))
+        self.assertIsNot(y, z)
+        self.assertEqual(z.outputs[0].value, 3.0)
+
+    def test_merge(self):
+        y, z = self.add_twice(Scheduler(executor=SERIAL, cse=True))
+        self.assertIs(y, z)
+        self.assertEqual(z.outputs[0].value, 3.0)
+
+
+def live_operations():
+    """Return the number of :class:`Operation` objects alive"""
+    gc.collect()
+    return len([o for o in gc.get_objects() if isinstance(o, Operation)])
+
+
+class ReclaimTest(unittest.TestCase):
+    def stream(self, scheduler, size):
+        dvm_scheduler_operation_add('value', 'p', [('value', 1.0)], scheduler)
+        for i in xrange(size):
+            dvm_scheduler_operation_add('add', 'n%i' % i,
+                                        [('a', 'p', 'value'),
+                                         ('b', float(i))], scheduler)
+        dvm_scheduler_wait(scheduler)
+
+    def test_anonymous_frees_literals(self):
+        before = live_operations()
+        scheduler = Scheduler(executor=SERIAL, reclaim=ANONYMOUS, cse=False)
+        self.stream(scheduler, 1000)
+        self.assertEqual(scheduler.reclaimed, 1000)
+        # only the named operations are left
+        self.assertEqual(live_operations() - before, 1001)
+        self.assertEqual(op_get('n999', scheduler).outputs[0].value, 1000.0)
+
+    def test_window_bounds_table(self):
+        before = live_operations()
+        scheduler = Scheduler(executor=SERIAL, reclaim=4, cse=False)
+        dvm_scheduler_operation_add('value', 'p', [('value', 1.0)], scheduler)
+        dvm_scheduler_operation_add('add', 'n0', [('a', 'p', 'value'),
+                                                  ('b', 0.0)], scheduler)
+        for i in xrange(1, 1000):
+            dvm_scheduler_operation_add('add', 'n%i' % i,
+                                        [('a', 'p', 'value'),
+                                         ('b', 'n%i' % (i - 1), 'result')],
+                                        scheduler)
+            self.assertTrue(len(scheduler.opstable) <= 4)
+        dvm_scheduler_wait(scheduler)
+        self.assertEqual(op_get('n999', scheduler).outputs[0].value, 1000.0)
+        self.assertTrue(live_operations() - before <= 4)
+        # names out of the window can't be referenced anymore
+        self.assertRaises(OperationNotFoundError, op_get, 'n0', scheduler)
+        self.assertRaises(OperationNotFoundError, dvm_scheduler_operation_add,
+                          'add', 'm', [('a', 'n0', 'result'), ('b', 1.0)],
+                          scheduler)
+
+
+def random_program(seed, size=300):
+    """Return the instructions of a random graph of `size` operations, each
+    reading up to two of the operations before it
+    """
+    rand = Random(seed)
+    instructions = [('value', 'v%i' % i, [('value', float(i))])
+                    for i in xrange(4)]
+    names = [name for optype, name, args in instructions]
+    for i in xrange(size):
+        optype = rand.choice(('add', 'sub', 'mul'))
+        args = []
+        for input in ('a', 'b'):
+            if optype == 'mul' and input == 'b':
+                # keep the values bounded
+                args.append((input, rand.uniform(0.5, 1.5)))
+                continue
+            source = rand.choice(names)
+            args.append((input, source, 'value' if source[0] == 'v'
+                                                 else 'result'))
+        instructions.append((optype, 'n%i' % i, args))
+        names.append('n%i' % i)
+    return instructions
+
+def program_run(instructions, **options):
+    """Run `instructions` on a new scheduler and return the output values of
+    all the operations, by name
+    """
+    scheduler = Scheduler(**options)
+    for optype, name, args in instructions:
+        dvm_scheduler_operation_add(optype, name, args, scheduler)
+    dvm_scheduler_wait(scheduler)
+    values = dict((name, op_get(name, scheduler).outputs[0].value)
+                  for optype, name, args in instructions)
+    dvm_scheduler_close(scheduler)
+    return values
+
+
+class ExecutorsTest(unittest.TestCase):
+    def setUp(self):
+        self.programs = [random_program(seed) for seed in xrange(3)]
+        self.expected = [program_run(instructions, executor=SERIAL)
+                         for instructions in self.programs]
+
+    def assertMatchSerial(self, **options):
+        for instructions, expected in zip(self.programs, self.expected):
+            self.assertEqual(program_run(instructions, **options), expected,
+                             options)
+
+    def test_stealing(self):
+        self.assertMatchSerial(executor=STEALING, workers=4)
+
+    def test_worker_completion(self):
+        self.assertMatchSerial(executor=THREADS, workers=4, completion=WORKER)
+
+    def test_handoff(self):
+        for completion in (UPDATER, WORKER):
+            self.assertMatchSerial(executor=THREADS, workers=4,
+                                   completion=completion, handoff=8)
+
+
+class PriorityTest(unittest.TestCase):
+    def test_rank_reclaimed_operations(self):
+        # the window removes the held operations from the table before they
+        # are ranked
+        scheduler = Scheduler(executor=THREADS, priority=DEPTH, reclaim=1,
+                              cse=False)
+        dvm_scheduler_operation_add('value', 'n0', [('value', 1.0)],
+                                    scheduler)
+        for i in xrange(1, 100):
+            dvm_scheduler_operation_add('add', 'n%i' % i,
+                                        [('a', 'n%i' % (i - 1),
+                                          'result' if i > 1 else 'value'),
+                                         ('b', 1.0)], scheduler)
+        dvm_scheduler_wait(scheduler)
+        self.assertEqual(op_get('n99', scheduler).outputs[0].value, 100.0)
+
+    def executed(self, priority, instructions, costs=None):
+        """Run `instructions` on a single worker and return the names of the
+        operations executed, in order
+        """
+        tracer = Tracer()
+        scheduler = Scheduler(executor=THREADS, workers=1, completion=WORKER,
+                              priority=priority, costs=costs, trace=tracer)
+        for optype, name, args in instructions:
+            dvm_scheduler_operation_add(optype, name, args, scheduler)
+        dvm_scheduler_wait(scheduler)
+        dvm_scheduler_close(scheduler)
+        return [event['name'] for event in tracer.events
+                if event['ph'] == 'X' and event['cat'] in ('add', 'mul')]
+
+    def test_depth_runs_longest_chain_first(self):
+        instructions = [('add', 's%i' % i, [('a', 1.0), ('b', 2.0)])
+                        for i in xrange(5)]
+        instructions.append(('add', 'c0', [('a', 1.0), ('b', 1.0)]))
+        for i in xrange(1, 6):
+            instructions.append(('add', 'c%i' % i,
+                                 [('a', 'c%i' % (i - 1), 'result'),
+                                  ('b', 1.0)]))
+        chain = ['c%i' % i for i in xrange(6)]
+        shorts = ['s%i' % i for i in xrange(5)]
+        self.assertEqual(self.executed(FIFO, instructions)[:5], shorts)
+        # the last step of the chain ties with the shorts queued before it
+        self.assertEqual(self.executed(DEPTH, instructions),
+                         chain[:5] + shorts + chain[5:])
+
+    def test_cost_runs_most_expensive_path_first(self):
+        instructions = [('add', 'a0', [('a', 1.0), ('b', 1.0)]),
+                        ('add', 'a1', [('a', 'a0', 'result'), ('b', 1.0)]),
+                        ('add', 'a2', [('a', 'a1', 'result'), ('b', 1.0)]),
+                        ('mul', 'm', [('a', 2.0), ('b', 3.0)])]
+        self.assertEqual(self.executed(DEPTH, instructions),
+                         ['a0', 'a1', 'm', 'a2'])
+        self.assertEqual(self.executed(COST, instructions,
+                                       {'mul': 10.0, 'add': 1.0}),
+                         ['m', 'a0', 'a1', 'a2'])
+
+
+if __name__ == '__main__':
+    unittest.main()